@@ -0,0 +1,290 @@
+from .async_session import get_async_session, request, AsyncResponse
+from .entries import EntryList, count_entries, diff_entries
+from typing import List, Set, Dict, Tuple, Optional
+
+class AsyncManifest:
+    """Manages source data file manifests with ADE Notify API using asyncio, counterpart of the Manifest class."""
+    __base_url: str = None
+    __created: str = None
+    __format: str = None
+    __id: str = None
+    __latest_response: AsyncResponse = None
+    __manifest_entries: EntryList = None
+    __manifest_entry_dicts: Tuple[EntryList, List[dict]] = None # EntryList and the entry dicts of manifest_entries decoded from it.
+    __known_entries: EntryList = None # Server entries as last fetched, created or synced, None when changed otherwise.
+    __modified: str = None
+    __notify_api_key: str = None
+    __notify_api_key_secret: str = None
+    __source_entity_name: str = None
+    __source_system_name: str = None
+    __state: str = None
+
+    batch: int = None
+    columns: List[str] = None
+    compression: str = None
+    delim: str = None
+    fullscanned: bool = None
+    skiph: int = None
+
+    def __init__(self, base_url: str, source_system_name: str, source_entity_name: str, format: str, notify_api_key: str, notify_api_key_secret: str):
+        """Class constructor.
+
+        Args:
+            base_url (str): ADE Notify API base url, e.g. https://external-api.{environment}.datahub.{tenant}.saas.agiledataengine.com:443/notify-api.
+            source_system_name (str): Source system name defined in ADE source entity.
+            source_entity_name (str): ADE source entity name.
+            format (str): Source file format.
+            notify_api_key (str): ADE Notify API key.
+            notify_api_key_secret (str): ADE Notify API key secret.
+
+        """
+        self.__base_url = base_url
+        self.__source_system_name = source_system_name
+        self.__source_entity_name = source_entity_name
+        self.__format = format
+        self.__notify_api_key = notify_api_key
+        self.__notify_api_key_secret = notify_api_key_secret
+
+    async def __api_caller(self, http_method: str, request_url: str, request_body: object = None, endpoint: str = None):
+        """Handles ADE Notify API calls.
+
+        Args:
+            http_method (str): Supported values: "get", "post" or "put".
+            request_url (str): Request url.
+            request_body (object, optional): Request body, if expected by ADE Notify API.
+            endpoint (str, optional): Endpoint name recorded in metrics.
+
+        Returns:
+            AsyncResponse object.
+
+        Raises:
+            All exceptions if request fails after retries.
+
+        """
+        # Session is looked up on each call as aiohttp sessions are bound to the running event loop.
+        session = get_async_session(self.__base_url, self.__notify_api_key, self.__notify_api_key_secret)
+        response = await request(session, http_method, request_url, request_body, endpoint)
+        self.__latest_response = response
+        return response
+
+    def __manifests_url(self):
+        """Returns manifests url of the source entity."""
+        return "{0}/tenants/local/installations/local/environments/local/source-systems/{1}/source-entities/{2}/manifests"\
+            .format(self.__base_url, self.__source_system_name, self.__source_entity_name)
+
+    def __set_attributes(self, response_body: dict):
+        """Sets object attribute values from a manifest response body."""
+        self.batch = response_body['batch']
+        self.columns = response_body['columns']
+        self.compression = response_body['compression']
+        self.__created = response_body['created']
+        self.delim = response_body['delim']
+        self.__format = response_body['format']
+        self.fullscanned = response_body['fullscanned']
+        self.__id = response_body['id']
+        self.__modified = response_body['modified']
+        self.skiph = response_body['skiph']
+        self.__state = response_body['state']
+
+    """Getters for private attributes."""
+    @property
+    def base_url(self):
+        return self.__base_url
+    @property
+    def created(self):
+        return self.__created
+    @property
+    def format(self):
+        return self.__format
+    @property
+    def id(self):
+        return self.__id
+    @property
+    def latest_response(self):
+        return self.__latest_response
+    @property
+    def manifest_entries(self):
+        # List of entry dicts decoded from entry_list on first access.
+        if (self.__manifest_entries == None):
+            return None
+        if (self.__manifest_entry_dicts == None or self.__manifest_entry_dicts[0] is not self.__manifest_entries):
+            self.__manifest_entry_dicts = (self.__manifest_entries, self.__manifest_entries.to_list())
+        return self.__manifest_entry_dicts[1]
+    @property
+    def entry_list(self):
+        return self.__manifest_entries
+    @property
+    def modified(self):
+        return self.__modified
+    @property
+    def source_entity_name(self):
+        return self.__source_entity_name
+    @property
+    def source_system_name(self):
+        return self.__source_system_name
+    @property
+    def state(self):
+        return self.__state
+
+    async def create(self):
+        """Creates new manifest in ADE Notify API, sets object attribute values from response."""
+        request_body = {}
+        request_body['format'] = self.__format
+
+        # Set optional manifest attributes if defined.
+        if self.batch != None:
+            request_body['batch'] = self.batch
+        if self.columns != None:
+            request_body['columns'] = self.columns
+        if self.compression != None:
+            request_body['compression'] = self.compression
+        if self.delim != None:
+            request_body['delim'] = self.delim
+        if self.fullscanned != None:
+            request_body['fullscanned'] = self.fullscanned
+        if self.skiph != None:
+            request_body['skiph'] = self.skiph
+
+        response = await self.__api_caller("post", self.__manifests_url(), request_body, endpoint="create")
+        self.__set_attributes(response.json())
+        self.__known_entries = EntryList()
+
+    async def fetch_manifest(self, id: str = None):
+        """Gets manifest from ADE Notify API, updates object attribute values.
+
+        Args:
+            id (str, optional): Manifest id.
+
+        Raises:
+            ValueError if manifest id is not set.
+
+        """
+        if (id != None):
+            self.__id = id
+
+        if (self.__id == None):
+            raise ValueError("Manifest id = None. Create or get manifest before notifying.")
+
+        response = await self.__api_caller("get", "{0}/{1}".format(self.__manifests_url(), self.__id), endpoint="fetch_manifest")
+        self.__set_attributes(response.json())
+
+    async def fetch_manifest_entries(self):
+        """Gets manifest entries from Notify API, sets object attribute values.
+
+        Raises:
+            ValueError if manifest id is not set.
+
+        """
+        if (self.__id == None):
+            raise ValueError("Manifest id = None. Create or get manifest before notifying.")
+
+        response = await self.__api_caller("get", "{0}/{1}/entries".format(self.__manifests_url(), self.__id), endpoint="fetch_manifest_entries")
+        self.__manifest_entries = EntryList.from_json(response.content) # Decoded lazily on first access.
+        self.__known_entries = self.__manifest_entries
+
+    async def count_manifest_entries(self):
+        """Gets the number of manifest entries from Notify API without decoding or storing the entries.
+
+        Returns:
+            Int number of entries.
+
+        Raises:
+            ValueError if manifest id is not set.
+
+        """
+        if (self.__id == None):
+            raise ValueError("Manifest id = None. Create or get manifest before counting entries.")
+
+        response = await self.__api_caller("get", "{0}/{1}/entries".format(self.__manifests_url(), self.__id), endpoint="fetch_manifest_entries")
+        return count_entries(response.content)
+
+    async def notify(self, id: str = None):
+        """Notifies manifest in Notify API.
+
+        Args:
+            id (str, optional): Manifest id.
+
+        Raises:
+            ValueError if manifest id is not set.
+
+        """
+        if (id != None):
+            self.__id = id
+
+        if (self.__id == None):
+            raise ValueError("Manifest id = None. Create or get manifest before notifying.")
+
+        await self.__api_caller("post", "{0}/{1}/notify".format(self.__manifests_url(), self.__id), endpoint="notify")
+
+    async def add_entry(self, source_file: str, batch: int = None, content_length: int = None):
+        """Appends single entry to manifest in Notify API.
+
+        Args:
+            source_file (str): Source file url.
+            batch (int, optional): Batch number.
+            content_length (int, optional): Content length.
+
+        """
+        if (self.__id == None):
+            await self.create()
+
+        request_body = {}
+        request_body['sourceFile'] = source_file
+
+        # Set optional manifest entry attributes if defined.
+        if (batch != None):
+            request_body['batch'] = batch
+        if (content_length != None):
+            request_body['contentLength'] = content_length
+
+        self.__known_entries = None
+        await self.__api_caller("post", "{0}/{1}/entries".format(self.__manifests_url(), self.__id), request_body, endpoint="add_entry")
+
+    async def add_entries(self, entries: List[dict]):
+        """Adds/overwrites multiple entries to manifest in Notify API.
+
+        Args:
+            entries (list[dict]): List of manifest entry dictionaries.
+
+        """
+        if (self.__id == None):
+            await self.create()
+
+        self.__known_entries = None
+        await self.__api_caller("put", "{0}/{1}/entries".format(self.__manifests_url(), self.__id), entries, endpoint="add_entries")
+
+    async def sync_entries(self, entries: List[dict], replace: bool = False, refresh: bool = False, max_posts: int = 100, request_cost: int = 4096):
+        """Brings the manifest entries in Notify API to the given entries with the fewest bytes sent, see Manifest.sync_entries.
+
+        Args:
+            entries (list[dict]): Desired manifest entry dictionaries.
+            replace (bool, optional): Remove entries missing from the given entries. By default entries are only added or changed.
+            refresh (bool, optional): Fetch the current entries even if known.
+            max_posts (int, optional): Max number of POST requests, more added entries are sent with a PUT.
+            request_cost (int, optional): Cost of a request in request body bytes used to choose between POSTs and a PUT.
+
+        Returns:
+            EntryDiff object with the added, changed and removed entries and the method used ("post", "put" or None).
+
+        """
+        if (self.__id == None):
+            await self.create()
+
+        if (self.__known_entries == None or refresh):
+            await self.fetch_manifest_entries()
+
+        diff = diff_entries(self.__known_entries, entries, replace)
+        diff.method = diff.plan(max_posts, request_cost)
+        request_url = "{0}/{1}/entries".format(self.__manifests_url(), self.__id)
+
+        # Entries are refetched on the next sync if a request fails, as some POSTs may have succeeded.
+        self.__known_entries = None
+
+        if (diff.method == 'post'):
+            for entry in diff.added:
+                await self.__api_caller("post", request_url, entry, endpoint="add_entry")
+        elif (diff.method == 'put'):
+            await self.__api_caller("put", request_url, diff.entries, endpoint="add_entries")
+
+        self.__manifest_entries = self.__known_entries = EntryList(diff.entries)
+        return diff
@@ -0,0 +1,205 @@
+import asyncio
+import logging
+from .async_manifest import AsyncManifest
+from .async_session import get_async_session, request
+from .config import SourceConfig
+from .metrics import measured
+from typing import List, Set, Dict, Tuple, Optional, Awaitable, Iterable
+
+@measured('search_manifests')
+async def search_manifests(source_system_name: str, source_entity_name: str, base_url: str, notify_api_key: str, notify_api_key_secret: str, state: str):
+    """Searches manifests from ADE Notify API, asyncio counterpart of notifier.search_manifests.
+
+    Args:
+        source_system_name (str): Source system name defined in ADE source entity.
+        source_entity_name (str): ADE source entity name.
+        state (str): Manifest state, supported values: "OPEN", "NOTIFIED", "FAILED", "ARCHIVED".
+        base_url (str): ADE Notify API base url, e.g. https://external-api.{environment}.datahub.{tenant}.saas.agiledataengine.com:443/notify-api.
+        notify_api_key (str): ADE Notify API key.
+        notify_api_key_secret (str): ADE Notify API key secret.
+
+    Returns:
+        List [dict] of manifests ordered by created time.
+
+    """
+    session = get_async_session(base_url, notify_api_key, notify_api_key_secret)
+    request_url = "{0}/tenants/local/installations/local/environments/local/source-systems/{1}/source-entities/{2}/manifests"\
+            .format(base_url, source_system_name, source_entity_name)
+
+    if state != "":
+        request_url += "?state={0}".format(state.upper())
+
+    response = await request(session, "get", request_url, endpoint="search_manifests")
+    manifests = response.json()
+
+    if manifests != []:
+        # Ordering manifests by created time
+        manifests = (sorted(manifests, key = lambda i: i['created']))
+
+    return manifests
+
+def _new_manifest(config: SourceConfig, base_url: str, notify_api_key: str, notify_api_key_secret: str):
+    """Initializes an AsyncManifest object with mandatory and configured optional attributes of the data source."""
+    manifest = AsyncManifest(
+        base_url = base_url,
+        source_system_name = config.ade_source_system,
+        source_entity_name = config.ade_source_entity,
+        format = config.format,
+        notify_api_key = notify_api_key,
+        notify_api_key_secret = notify_api_key_secret
+    )
+
+    for name, value in config.manifest_template.items():
+        setattr(manifest, name, value)
+
+    return manifest
+
+@measured('add_to_manifest')
+async def add_to_manifest(file_url: str, source: object, base_url: str, notify_api_key: str, notify_api_key_secret: str):
+    """Adds the given file_url to a manifest for the given configured data source, asyncio counterpart of notifier.add_to_manifest.
+
+    Args:
+        file_url (str): Source file url.
+        source (object): Data source configuration JSON object or SourceConfig. See notifier documentation for format & required attributes.
+        base_url (str): ADE Notify API base url, e.g. https://external-api.{environment}.datahub.{tenant}.saas.agiledataengine.com:443/notify-api.
+        notify_api_key (str): ADE Notify API key.
+        notify_api_key_secret (str): ADE Notify API key secret.
+
+    Returns:
+        AsyncManifest object.
+
+    """
+    config = SourceConfig.of(source)
+    single_file_manifest = config.single_file_manifest
+    open_manifest_ids = []
+
+    # Search open manifests for data source if not single_file_manifest
+    if(not single_file_manifest):
+        open_manifests = await search_manifests(
+            source_system_name = config.ade_source_system,
+            source_entity_name = config.ade_source_entity,
+            base_url = base_url,
+            notify_api_key = notify_api_key,
+            notify_api_key_secret = notify_api_key_secret,
+            state = "OPEN"
+        )
+        open_manifest_ids = [open_manifest['id'] for open_manifest in open_manifests]
+        logging.info('Open manifests: {0}'.format(open_manifest_ids))
+
+    manifest = _new_manifest(config, base_url, notify_api_key, notify_api_key_secret)
+
+    if (open_manifest_ids == []):
+        # Create a new manifest if open manifests are not found.
+        await manifest.create()
+        logging.info('Manifest created: {0}'.format(manifest.id))
+    elif (config.max_files_in_manifest != None):
+        await manifest.fetch_manifest(open_manifest_ids[-1])
+
+        if (await manifest.count_manifest_entries() >= config.max_files_in_manifest):
+            logging.info('Max files in manifest reached. Creating a new manifest')
+            # Create a new manifest if current manifest has already reached max files limit
+            await manifest.create()
+            logging.info('Manifest created: {0}'.format(manifest.id))
+        else:
+            logging.info('Using open manifest: {0}'.format(manifest.id))
+    else:
+        # Use latest existing manifest if open manifests are found.
+        await manifest.fetch_manifest(open_manifest_ids[-1])
+        logging.info('Using open manifest: {0}'.format(manifest.id))
+
+    # Modify manifest entry file url if configured.
+    entry_path = config.entry_path(file_url)
+
+    batch = None
+    if (config.batch_pattern != None):
+        # Parse entry specific batch number from file name if configured.
+        try:
+            batch = config.parse_batch(file_url)
+            logging.info('Batch: {0}'.format(batch))
+        except Exception as e:
+            logging.warning('Batch parsing failed:\n{0}'.format(e))
+
+    # Add entry to manifest.
+    try:
+        await manifest.add_entry(entry_path, batch)
+    except Exception as e:
+        # Retry with a new manifest if e.g. an uncontrolled parallel execution has closed the manifest
+        logging.warning('Adding entry to manifest failed, retrying with a new manifest.')
+        await manifest.create()
+        logging.info('Manifest created: {0}'.format(manifest.id))
+        await manifest.add_entry(entry_path, batch)
+
+    logging.info('Added entry: {0}'.format(entry_path))
+
+    # Notify manifest if single_file_manifest = true
+    if (single_file_manifest):
+        logging.info('Single_file_manifest set as true, notifying.')
+        await manifest.notify()
+        logging.info('Notified manifest: {0}.'.format(manifest.id))
+
+    return manifest
+
+@measured('notify_manifests')
+async def notify_manifests(source: object, base_url: str, notify_api_key: str, notify_api_key_secret: str, skip_empty: bool = True):
+    """Notifies all open manifests for the given configured data source, asyncio counterpart of notifier.notify_manifests.
+
+    Args:
+        source (object): Data source configuration JSON object or SourceConfig. See notifier documentation for format & required attributes.
+        base_url (str): ADE Notify API base url, e.g. https://external-api.{environment}.datahub.{tenant}.saas.agiledataengine.com:443/notify-api.
+        notify_api_key (str): ADE Notify API key.
+        notify_api_key_secret (str): ADE Notify API key secret.
+        skip_empty (bool, optional): Leave open manifests without entries unnotified, see notifier.notify_manifests.
+
+    Returns:
+        List of AsyncManifest objects, one per notified manifest.
+
+    """
+    config = SourceConfig.of(source)
+
+    open_manifests = await search_manifests(
+        source_system_name = config.ade_source_system,
+        source_entity_name = config.ade_source_entity,
+        base_url = base_url,
+        notify_api_key = notify_api_key,
+        notify_api_key_secret = notify_api_key_secret,
+        state = "OPEN"
+    )
+
+    manifests = []
+
+    if (open_manifests == []):
+        # Warning if open manifests not found.
+        logging.warning('Open manifests for source {0} not found when attempting to notify.'.format(config.id))
+
+    # Notify all open manifests for data source in created order.
+    for open_manifest in open_manifests:
+        manifest = _new_manifest(config, base_url, notify_api_key, notify_api_key_secret)
+        await manifest.fetch_manifest(open_manifest['id'])
+        if (skip_empty and await manifest.count_manifest_entries() == 0):
+            logging.info('Manifest {0} has no entries, not notified.'.format(manifest.id))
+            continue
+        await manifest.notify()
+        logging.info('Notified manifest: {0}.'.format(manifest.id))
+        manifests.append(manifest)
+
+    return manifests
+
+async def gather_bounded(aws: Iterable[Awaitable], concurrency: int = 10, return_exceptions: bool = False):
+    """Runs awaitables concurrently with at most the given number in flight at a time, e.g. add_to_manifest calls for hundreds of sources.
+
+    Args:
+        aws (iterable): Awaitables, e.g. coroutines returned by add_to_manifest or notify_manifests.
+        concurrency (int, optional): Max number of awaitables running at a time.
+        return_exceptions (bool, optional): Return exceptions as results instead of raising the first one, see asyncio.gather.
+
+    Returns:
+        List of results in the order of the given awaitables.
+
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*[bounded(aw) for aw in aws], return_exceptions=return_exceptions)
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import time
+from .metrics import ApiCall, record_call
+from typing import List, Set, Dict, Tuple, Optional
+
+try:
+    import aiohttp
+except ImportError: # aiohttp is an optional dependency, install with: pip install adenotifier[async]
+    aiohttp = None
+
+DEFAULT_LIMIT: int = 100
+DEFAULT_LIMIT_PER_HOST: int = 10
+DEFAULT_RETRY_TOTAL: int = 3
+DEFAULT_BACKOFF_FACTOR: float = 2
+DEFAULT_STATUS_FORCELIST: List[int] = [401, 404, 429, 500, 502, 503, 504]
+
+_sessions: Dict[Tuple[object, str, str], object] = {}
+_settings: dict = {
+    'limit': DEFAULT_LIMIT,
+    'limit_per_host': DEFAULT_LIMIT_PER_HOST,
+    'retry_total': DEFAULT_RETRY_TOTAL,
+    'backoff_factor': DEFAULT_BACKOFF_FACTOR,
+    'status_forcelist': DEFAULT_STATUS_FORCELIST
+}
+
+def configure_async_sessions(limit: int = None, limit_per_host: int = None, retry_total: int = None, backoff_factor: float = None, status_forcelist: List[int] = None):
+    """Sets connection pool and retry settings for asyncio ADE Notify API sessions created after the call.
+
+    Args:
+        limit (int, optional): Max number of simultaneous connections per session.
+        limit_per_host (int, optional): Max number of simultaneous connections to the Notify API host.
+        retry_total (int, optional): Number of retries for failed requests.
+        backoff_factor (float, optional): Exponential backoff factor in seconds between retries.
+        status_forcelist (list[int], optional): HTTP status codes that are retried.
+
+    """
+    if (limit != None):
+        _settings['limit'] = limit
+    if (limit_per_host != None):
+        _settings['limit_per_host'] = limit_per_host
+    if (retry_total != None):
+        _settings['retry_total'] = retry_total
+    if (backoff_factor != None):
+        _settings['backoff_factor'] = backoff_factor
+    if (status_forcelist != None):
+        _settings['status_forcelist'] = status_forcelist
+
+def get_async_session(base_url: str, notify_api_key: str, notify_api_key_secret: str):
+    """Returns a pooled aiohttp session for the given ADE Notify API base url and key in the running event loop, creating one on first use.
+
+    Args:
+        base_url (str): ADE Notify API base url.
+        notify_api_key (str): ADE Notify API key.
+        notify_api_key_secret (str): ADE Notify API key secret.
+
+    Returns:
+        aiohttp.ClientSession object.
+
+    Raises:
+        ImportError if aiohttp is not installed.
+
+    """
+    if (aiohttp == None):
+        raise ImportError("The asyncio client requires aiohttp, install with: pip install adenotifier[async]")
+
+    key = (asyncio.get_running_loop(), base_url, notify_api_key)
+    session = _sessions.get(key)
+
+    if (session == None or session.closed):
+        session = aiohttp.ClientSession(
+            auth = aiohttp.BasicAuth(notify_api_key, notify_api_key_secret),
+            headers = {"Content-Type": "application/json"},
+            connector = aiohttp.TCPConnector(limit=_settings['limit'], limit_per_host=_settings['limit_per_host'])
+        )
+        _sessions[key] = session
+
+    return session
+
+async def close_async_sessions():
+    """Closes all pooled aiohttp sessions of the running event loop."""
+    loop = asyncio.get_running_loop()
+
+    for key in [key for key in _sessions if key[0] is loop]:
+        await _sessions.pop(key).close()
+
+class AsyncResponse:
+    """Read ADE Notify API response, counterpart of requests.Response for the asyncio client."""
+    status_code: int = None
+    headers: dict = None
+    content: bytes = None
+    url: str = None
+
+    def __init__(self, status_code: int, headers: dict, content: bytes, url: str):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.url = url
+
+    def json(self):
+        return json.loads(self.content)
+
+async def request(session, http_method: str, request_url: str, request_body: object = None, endpoint: str = None):
+    """Sends a request with the configured retry policy and reads the response.
+
+    Args:
+        session (aiohttp.ClientSession): Session returned by get_async_session().
+        http_method (str): Supported values: "get", "post" or "put".
+        request_url (str): Request url.
+        request_body (object, optional): Request body, if expected by ADE Notify API.
+        endpoint (str, optional): Endpoint name recorded in metrics, see metrics.ENDPOINT_TEMPLATES.
+
+    Returns:
+        AsyncResponse object.
+
+    Raises:
+        aiohttp.ClientResponseError if request fails after retries, other exceptions as is.
+
+    """
+    data = json.dumps(request_body)
+    attempt = 0
+    start = time.monotonic()
+
+    while True:
+        try:
+            async with session.request(http_method.upper(), request_url, data=data) as response:
+                content = await response.read()
+                if (response.status in _settings['status_forcelist'] and attempt < _settings['retry_total']):
+                    raise _RetryableStatus()
+                record_call(ApiCall(endpoint, http_method, response.status, attempt, time.monotonic() - start, len(data), len(content)))
+                response.raise_for_status()
+                return AsyncResponse(response.status, dict(response.headers), content, str(response.url))
+        except (_RetryableStatus, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            if (attempt >= _settings['retry_total']):
+                record_call(ApiCall(endpoint, http_method, None, attempt, time.monotonic() - start, len(data), 0, e))
+                raise
+            attempt += 1
+            await asyncio.sleep(_settings['backoff_factor'] * (2 ** (attempt - 1)))
+
+class _RetryableStatus(Exception):
+    """Raised internally for responses with a retried HTTP status code."""
@@ -0,0 +1,180 @@
+import logging
+import threading
+import time
+from .config import SourceConfig
+from .enrich import ContentLengthEnricher
+from .notifier import create_entries
+from typing import List, Set, Dict, Tuple, Optional
+
+class ManifestBuffer:
+    """Buffers file urls per data source and adds them to manifests in bulk.
+
+    File urls are collected per source and flushed as one Manifest.add_entries call per manifest when max_size
+    file urls are buffered for a source or when the oldest buffered file url is older than max_wait seconds.
+    Each flush creates new manifests, split by max_files_in_manifest if configured in the data source.
+
+    Usage:
+        with ManifestBuffer(base_url, notify_api_key, notify_api_key_secret, max_size = 500, max_wait = 30) as buffer:
+            for event in events:
+                buffer.add(event['url'], source)
+    """
+    __base_url: str = None
+    __notify_api_key: str = None
+    __notify_api_key_secret: str = None
+    __lock: threading.RLock = None
+    __pending: Dict[str, dict] = None
+    __stopped: threading.Event = None
+    __timer: threading.Thread = None
+
+    max_size: int = None
+    max_wait: float = None
+    notify: bool = None
+    enricher: ContentLengthEnricher = None
+
+    def __init__(self, base_url: str, notify_api_key: str, notify_api_key_secret: str, max_size: int = 1000, max_wait: float = 10, notify: bool = False, enricher: ContentLengthEnricher = None):
+        """Class constructor.
+
+        Args:
+            base_url (str): ADE Notify API base url, e.g. https://external-api.{environment}.datahub.{tenant}.saas.agiledataengine.com:443/notify-api.
+            notify_api_key (str): ADE Notify API key.
+            notify_api_key_secret (str): ADE Notify API key secret.
+            max_size (int, optional): Number of buffered file urls per source that triggers a flush.
+            max_wait (float, optional): Max age in seconds of buffered file urls before they are flushed by a background thread. Set to None to flush on size or explicitly only.
+            notify (bool, optional): Notify manifests after flushing.
+            enricher (ContentLengthEnricher, optional): Sets the content length of entries from storage metadata when flushing.
+
+        """
+        self.__base_url = base_url
+        self.__notify_api_key = notify_api_key
+        self.__notify_api_key_secret = notify_api_key_secret
+        self.__lock = threading.RLock()
+        self.__pending = {}
+        self.__stopped = threading.Event()
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.notify = notify
+        self.enricher = enricher
+
+        if (max_wait != None):
+            self.__timer = threading.Thread(target=self.__flush_expired, name='ManifestBuffer', daemon=True)
+            self.__timer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __flush_expired(self):
+        """Background thread flushing sources whose oldest buffered file url has reached max_wait."""
+        while (not self.__stopped.wait(min(self.max_wait, 1))):
+            now = time.monotonic()
+            with self.__lock:
+                expired = [source_id for source_id, pending in self.__pending.items() if now - pending['since'] >= self.max_wait]
+            for source_id in expired:
+                try:
+                    self.flush(source_id)
+                except Exception as e:
+                    # Entries are kept in the buffer and retried on the next window.
+                    logging.warning('Flushing source {0} failed:\n{1}'.format(source_id, e))
+
+    def add(self, file_url: str, source: object):
+        """Buffers the given file url for the given data source, flushes the source if max_size is reached.
+
+        Args:
+            file_url (str): Source file url.
+            source (object): Data source configuration JSON object or SourceConfig. See notifier documentation for format & required attributes.
+
+        Returns:
+            List of Manifest objects if the source was flushed, otherwise an empty list.
+
+        """
+        config = SourceConfig.of(source)
+
+        with self.__lock:
+            if (config.id not in self.__pending):
+                self.__pending[config.id] = {'source': config, 'file_urls': [], 'since': time.monotonic()}
+            pending = self.__pending[config.id]
+            pending['file_urls'].append(file_url)
+            full = len(pending['file_urls']) >= self.max_size
+
+        if (full):
+            return self.flush(config.id)
+
+        return []
+
+    def flush(self, source_id: str = None):
+        """Adds buffered file urls to new manifests in bulk.
+
+        Args:
+            source_id (str, optional): Data source id to flush, by default all sources are flushed.
+
+        Returns:
+            List of Manifest objects.
+
+        Raises:
+            All exceptions if adding entries fails, the file urls of the failed manifest and the ones not yet flushed are kept in the buffer.
+
+        """
+        with self.__lock:
+            if (source_id != None):
+                source_ids = [source_id] if source_id in self.__pending else []
+            else:
+                source_ids = list(self.__pending)
+            flushed = [self.__pending.pop(id) for id in source_ids]
+
+        manifests = []
+
+        for index, pending in enumerate(flushed):
+            try:
+                manifests.extend(self.__flush_source(pending))
+            except Exception:
+                # Return unflushed file urls to the buffer.
+                with self.__lock:
+                    for unflushed in flushed[index:]:
+                        self.__requeue(unflushed)
+                raise
+
+        return manifests
+
+    def __flush_source(self, pending: dict):
+        """Adds buffered file urls of a single source to new manifests, removing flushed file urls from pending."""
+        config = pending['source']
+        max_files = config.max_files_in_manifest or len(pending['file_urls'])
+        manifests = []
+
+        while (pending['file_urls'] != []):
+            file_urls = pending['file_urls'][:max_files]
+
+            manifest = config.new_manifest(self.__base_url, self.__notify_api_key, self.__notify_api_key_secret)
+            manifest.create()
+            manifest.add_entries(create_entries(file_urls, config, self.enricher))
+            logging.info('Added {0} entries to manifest: {1}'.format(len(file_urls), manifest.id))
+
+            del pending['file_urls'][:max_files]
+
+            if (self.notify):
+                manifest.notify()
+                logging.info('Notified manifest: {0}.'.format(manifest.id))
+
+            manifests.append(manifest)
+
+        return manifests
+
+    def __requeue(self, pending: dict):
+        """Returns unflushed file urls to the front of the buffer, expects __lock to be held by the caller."""
+        if (pending['file_urls'] == []):
+            return
+
+        source_id = pending['source'].id
+        pending['since'] = time.monotonic() # Retry after a full window.
+        if (source_id in self.__pending):
+            pending['file_urls'].extend(self.__pending[source_id]['file_urls'])
+        self.__pending[source_id] = pending
+
+    def close(self):
+        """Stops the background thread and flushes all buffered file urls."""
+        self.__stopped.set()
+        if (self.__timer != None):
+            self.__timer.join()
+        self.flush()
@@ -0,0 +1,181 @@
+import collections
+import threading
+import time
+from typing import List, Set, Dict, Tuple, Optional
+
+class ManifestStateCache:
+    """Caches the current open manifest id and entry count per data source to skip manifest searches on the hot path.
+
+    Entries expire after ttl seconds, after which the open manifest is searched from ADE Notify API again.
+    Cache instances are thread-safe and can be shared between calls, e.g. as a module-level object in a serverless function.
+    """
+    __lock: threading.Lock = None
+    __states: Dict[Tuple[str, str, str], dict] = None
+
+    ttl: float = None
+
+    def __init__(self, ttl: float = 60):
+        """Class constructor.
+
+        Args:
+            ttl (float, optional): Time to live of cached manifest states in seconds.
+
+        """
+        self.__lock = threading.Lock()
+        self.__states = {}
+        self.ttl = ttl
+
+    def get(self, base_url: str, source_system_name: str, source_entity_name: str):
+        """Returns the cached open manifest state of the given source entity.
+
+        Args:
+            base_url (str): ADE Notify API base url.
+            source_system_name (str): Source system name defined in ADE source entity.
+            source_entity_name (str): ADE source entity name.
+
+        Returns:
+            Tuple (manifest id, entry count) or None if not cached or expired. Entry count is None if not known.
+
+        """
+        key = (base_url, source_system_name, source_entity_name)
+
+        with self.__lock:
+            state = self.__states.get(key)
+            if (state == None):
+                return None
+            if (time.monotonic() >= state['expires']):
+                del self.__states[key]
+                return None
+            return (state['id'], state['entry_count'])
+
+    def set(self, base_url: str, source_system_name: str, source_entity_name: str, manifest_id: str, entry_count: int = None):
+        """Sets the open manifest state of the given source entity.
+
+        Args:
+            base_url (str): ADE Notify API base url.
+            source_system_name (str): Source system name defined in ADE source entity.
+            source_entity_name (str): ADE source entity name.
+            manifest_id (str): Open manifest id.
+            entry_count (int, optional): Number of entries in the manifest, if known.
+
+        """
+        with self.__lock:
+            self.__states[(base_url, source_system_name, source_entity_name)] = {
+                'id': manifest_id,
+                'entry_count': entry_count,
+                'expires': time.monotonic() + self.ttl
+            }
+
+    def increment(self, base_url: str, source_system_name: str, source_entity_name: str, manifest_id: str, count: int = 1):
+        """Increments the cached entry count after entries have been added to the given manifest.
+
+        Args:
+            base_url (str): ADE Notify API base url.
+            source_system_name (str): Source system name defined in ADE source entity.
+            source_entity_name (str): ADE source entity name.
+            manifest_id (str): Manifest id the entries were added to. Nothing is done if it is not the cached manifest.
+            count (int, optional): Number of added entries.
+
+        """
+        with self.__lock:
+            state = self.__states.get((base_url, source_system_name, source_entity_name))
+            if (state != None and state['id'] == manifest_id and state['entry_count'] != None):
+                state['entry_count'] += count
+
+    def invalidate(self, base_url: str, source_system_name: str, source_entity_name: str):
+        """Removes the cached state of the given source entity, e.g. after its manifests have been notified.
+
+        Args:
+            base_url (str): ADE Notify API base url.
+            source_system_name (str): Source system name defined in ADE source entity.
+            source_entity_name (str): ADE source entity name.
+
+        """
+        with self.__lock:
+            self.__states.pop((base_url, source_system_name, source_entity_name), None)
+
+    def clear(self):
+        """Removes all cached states."""
+        with self.__lock:
+            self.__states.clear()
+
+class CachedResponse:
+    """Response body cached with its HTTP validators."""
+    etag: str = None
+    last_modified: str = None
+    content: bytes = None
+
+    def __init__(self, etag: str, last_modified: str, content: bytes):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content = content
+
+class ResponseCache:
+    """LRU cache of ADE Notify API GET responses by url and query parameters, used for conditional requests with
+    If-None-Match and If-Modified-Since. Only responses with an ETag or Last-Modified header are cached.
+
+    Cache instances are thread-safe and can be shared between calls and watchers.
+    """
+    __lock: threading.Lock = None
+    __responses: collections.OrderedDict = None
+
+    max_size: int = None
+
+    def __init__(self, max_size: int = 1000):
+        """Class constructor.
+
+        Args:
+            max_size (int, optional): Max number of cached responses.
+
+        """
+        self.__lock = threading.Lock()
+        self.__responses = collections.OrderedDict()
+        self.max_size = max_size
+
+    def __len__(self):
+        return len(self.__responses)
+
+    def get(self, request_url: str, params: dict = None):
+        """Returns the cached response of the given url and query parameters.
+
+        Returns:
+            CachedResponse object or None if not cached.
+
+        """
+        key = _response_key(request_url, params)
+
+        with self.__lock:
+            response = self.__responses.get(key)
+            if (response != None):
+                self.__responses.move_to_end(key)
+            return response
+
+    def set(self, request_url: str, params: dict, etag: str, last_modified: str, content: bytes):
+        """Caches a response, or removes the cached response if it has no validators.
+
+        Args:
+            request_url (str): Request url.
+            params (dict): Query parameters.
+            etag (str): ETag header value.
+            last_modified (str): Last-Modified header value.
+            content (bytes): Response body.
+
+        """
+        key = _response_key(request_url, params)
+
+        with self.__lock:
+            if (etag == None and last_modified == None):
+                self.__responses.pop(key, None)
+                return
+            self.__responses[key] = CachedResponse(etag, last_modified, content)
+            self.__responses.move_to_end(key)
+            while (len(self.__responses) > self.max_size):
+                self.__responses.popitem(last=False)
+
+    def clear(self):
+        """Removes all cached responses."""
+        with self.__lock:
+            self.__responses.clear()
+
+def _response_key(request_url: str, params: dict):
+    return (request_url, tuple(sorted((params or {}).items())))
@@ -0,0 +1,365 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from .config import SourceConfig, load_sources
+from .notifier import NotifyResult, add_entries_to_manifests, notify_sources
+from .router import SourceRouter
+from .session import configure_rate_limits, configure_sessions
+from typing import List, Set, Dict, Tuple, Optional, Iterable, TextIO
+
+DEFAULT_CHUNK_SIZE: int = 10000
+
+def parse_file_url(line: str, field: int = None, prefix: str = None):
+    """Returns the file url of a listing line, or None for an empty line.
+
+    Args:
+        line (str): Listing line, e.g. a file url or a line of storage ls output.
+        field (int, optional): Index of the whitespace separated field holding the file path, e.g. -1 for the last field. By default the whole line.
+        prefix (str, optional): Prefix added to the file path, e.g. the bucket url when the listing contains object keys only.
+
+    Returns:
+        Str file url or None.
+
+    """
+    line = line.strip()
+    if (line == ''):
+        return None
+
+    if (field != None):
+        fields = line.split()
+        # Lines without the field, e.g. "PRE folder/" lines or headers, are skipped.
+        if (field >= len(fields) or -field > len(fields)):
+            return None
+        line = fields[field]
+
+    return prefix + line if prefix != None else line
+
+class BulkLoader:
+    """Adds file urls from a listing to new manifests in chunks, streaming the listing without keeping it in memory.
+
+    File urls are routed to data sources and buffered per source until a chunk of chunk_size file urls is full. Chunks are
+    added to new manifests by a pool of max_workers threads, with at most 2 * max_workers chunks in flight, and notified.
+
+    Progress is recorded in a checkpoint file as the number of listing lines whose file urls have all been added, so that
+    an interrupted load is resumed from that line. Chunks completed after the checkpoint are added again on resume. The
+    lines held back by buffered file urls are bounded by flushing all buffers every checkpoint_interval lines.
+    """
+    __executor: ThreadPoolExecutor = None
+    __buffers: Dict[str, Tuple[int, List[str], SourceConfig]] = None
+    __in_flight: Dict[Future, Tuple[int, int]] = None
+    __line: int = None
+    __checkpoint_line: int = None
+    __started: float = None
+    __reported: float = None
+
+    base_url: str = None
+    notify_api_key: str = None
+    notify_api_key_secret: str = None
+    router: SourceRouter = None
+    source: SourceConfig = None
+    chunk_size: int = None
+    max_workers: int = None
+    notify: bool = None
+    checkpoint_path: str = None
+    checkpoint_interval: int = None
+    progress_interval: float = None
+    progress: TextIO = None
+    unrouted: TextIO = None
+    files: int = None
+    manifests: int = None
+    unrouted_files: int = None
+
+    def __init__(self, base_url: str, notify_api_key: str, notify_api_key_secret: str, router: SourceRouter = None, source: object = None,
+                 chunk_size: int = None, max_workers: int = 4, notify: bool = True, checkpoint_path: str = None, checkpoint_interval: int = 100000,
+                 progress_interval: float = 10, progress: TextIO = None, unrouted: TextIO = None):
+        """Class constructor.
+
+        Args:
+            base_url (str): ADE Notify API base url.
+            notify_api_key (str): ADE Notify API key.
+            notify_api_key_secret (str): ADE Notify API key secret.
+            router (SourceRouter, optional): Routes file urls to data sources. Either router or source is required.
+            source (object, optional): Data source configuration JSON object or SourceConfig all file urls are added to.
+            chunk_size (int, optional): Max number of file urls per manifest, by default max_files_in_manifest of the data source or 10000.
+            max_workers (int, optional): Number of chunks added in parallel.
+            notify (bool, optional): Notify manifests after adding the entries.
+            checkpoint_path (str, optional): Checkpoint JSON file path.
+            checkpoint_interval (int, optional): Max number of listing lines read after the checkpoint before all buffers are flushed.
+            progress_interval (float, optional): Seconds between progress lines.
+            progress (TextIO, optional): Stream progress lines are written to, e.g. sys.stderr. No progress output by default.
+            unrouted (TextIO, optional): Stream file urls without a matching data source are written to.
+
+        """
+        if (router == None and source == None):
+            raise ValueError('Either router or source is required.')
+
+        self.base_url = base_url
+        self.notify_api_key = notify_api_key
+        self.notify_api_key_secret = notify_api_key_secret
+        self.router = router
+        self.source = SourceConfig.of(source) if source != None else None
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.notify = notify
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.progress_interval = progress_interval
+        self.progress = progress
+        self.unrouted = unrouted
+
+    def read_checkpoint(self):
+        """Returns the listing line to resume from, 0 if there is no checkpoint."""
+        if (self.checkpoint_path == None or not os.path.exists(self.checkpoint_path)):
+            return 0
+
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as file:
+            return json.load(file)['line']
+
+    def __write_checkpoint(self):
+        """Records the first listing line with file urls not yet added."""
+        starts = [buffer[0] for buffer in self.__buffers.values()] + [start for start, count in self.__in_flight.values()]
+        line = min(starts) if starts != [] else self.__line
+
+        if (self.checkpoint_path == None or line == self.__checkpoint_line):
+            return
+
+        temp_path = self.checkpoint_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({'line': line, 'files': self.files, 'manifests': self.manifests}, file)
+        os.replace(temp_path, self.checkpoint_path)
+        self.__checkpoint_line = line
+
+    def __chunk_size(self, config: SourceConfig):
+        if (self.chunk_size != None):
+            return self.chunk_size
+        return config.max_files_in_manifest if config.max_files_in_manifest != None else DEFAULT_CHUNK_SIZE
+
+    def __add_chunk(self, config: SourceConfig, file_urls: List[str]):
+        entries = [{'sourceFile': file_url} for file_url in file_urls]
+        return add_entries_to_manifests(entries, config, self.base_url, self.notify_api_key, self.notify_api_key_secret,
+                                        max_files=len(entries), max_workers=1, notify=self.notify)
+
+    def __submit(self, source_id: str):
+        """Submits the buffered file urls of a data source, waiting while the max number of chunks is in flight."""
+        while (len(self.__in_flight) >= 2 * self.max_workers):
+            self.__collect(wait(self.__in_flight, return_when=FIRST_COMPLETED).done)
+
+        start, file_urls, config = self.__buffers.pop(source_id)
+        self.__in_flight[self.__executor.submit(self.__add_chunk, config, file_urls)] = (start, len(file_urls))
+
+    def __collect(self, done: Iterable[Future] = None, raise_errors: bool = True):
+        """Records the given or all completed chunks and writes the checkpoint.
+
+        Raises:
+            The error of a failed chunk if raise_errors is True.
+
+        """
+        done = [future for future in (done if done != None else self.__in_flight) if future.done()]
+        errors = []
+
+        for future in done:
+            if (future.exception() != None):
+                # A failed chunk is kept in flight, so that the checkpoint stays before it.
+                errors.append(future.exception())
+                continue
+            start, count = self.__in_flight.pop(future)
+            self.files += count
+            self.manifests += len(future.result())
+
+        if (done != []):
+            self.__write_checkpoint()
+
+        if (errors != [] and raise_errors):
+            raise errors[0]
+
+    def __report(self, final: bool = False):
+        now = time.monotonic()
+        if (self.progress == None or (not final and now - self.__reported < self.progress_interval)):
+            return
+
+        elapsed = now - self.__started
+        self.progress.write('{0}: {1} lines read, {2} files added to {3} manifests ({4:.0f} files/s), {5} unrouted, {6} chunks in flight\n'.format(
+            'Done' if final else 'Progress', self.__line, self.files, self.manifests, self.files / elapsed if elapsed > 0 else 0,
+            self.unrouted_files, len(self.__in_flight)))
+        self.progress.flush()
+        self.__reported = now
+
+    def flush(self):
+        """Submits the buffered file urls of all data sources."""
+        for source_id in list(self.__buffers):
+            self.__submit(source_id)
+
+    def load(self, lines: Iterable[str], field: int = None, prefix: str = None):
+        """Adds the file urls of the given listing lines to manifests, resuming from the checkpoint if any.
+
+        Args:
+            lines (iterable[str]): Listing lines, e.g. an open file or sys.stdin.
+            field (int, optional): Index of the file path field of a line, see parse_file_url.
+            prefix (str, optional): Prefix added to the file paths, see parse_file_url.
+
+        Returns:
+            Int number of files added.
+
+        Raises:
+            The error of the first failed chunk, after the chunks in flight have finished and the checkpoint has been written.
+
+        """
+        resume_line = self.read_checkpoint()
+        if (resume_line > 0):
+            logging.info('Resuming from checkpoint at line {0}.'.format(resume_line))
+
+        self.__buffers = {}
+        self.__in_flight = {}
+        self.__line = 0
+        self.__checkpoint_line = resume_line
+        self.__started = self.__reported = time.monotonic()
+        self.files = 0
+        self.manifests = 0
+        self.unrouted_files = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='adenotifier-load') as executor:
+            self.__executor = executor
+            try:
+                for line in lines:
+                    line_number = self.__line
+                    self.__line += 1
+                    if (line_number < resume_line):
+                        continue
+
+                    file_url = parse_file_url(line, field, prefix)
+                    if (file_url == None):
+                        continue
+
+                    config = self.source if self.source != None else self.router.route(file_url)
+                    if (config == None):
+                        self.unrouted_files += 1
+                        if (self.unrouted != None):
+                            self.unrouted.write(file_url + '\n')
+                        continue
+
+                    buffer = self.__buffers.get(config.id)
+                    if (buffer == None):
+                        buffer = self.__buffers[config.id] = (line_number, [], config)
+                    buffer[1].append(file_url)
+
+                    if (len(buffer[1]) >= self.__chunk_size(config)):
+                        self.__submit(config.id)
+
+                    if (self.__line % 1000 == 0):
+                        self.__collect()
+                        # Flush sources with few files, so that they do not hold the checkpoint back.
+                        if (self.__buffers and self.__line - min(buffer[0] for buffer in self.__buffers.values()) >= self.checkpoint_interval):
+                            self.flush()
+                        self.__report()
+
+                self.flush()
+            finally:
+                # Chunks in flight are finished and recorded also when the load fails or is interrupted.
+                pending = [future for future in self.__in_flight if not future.done()]
+                while (pending != []):
+                    self.__collect(wait(pending, return_when=FIRST_COMPLETED).done, raise_errors=False)
+                    self.__report()
+                    pending = [future for future in self.__in_flight if not future.done()]
+                self.__collect(raise_errors=False)
+
+            self.__collect()
+
+        self.__report(final=True)
+        return self.files
+
+def _add(args: argparse.Namespace):
+    sources = load_sources(args.sources)
+    router = SourceRouter(sources.values()) if args.source == None else None
+    source = sources[args.source] if args.source != None else None
+    unrouted = open(args.unrouted, 'a', encoding='utf-8') if args.unrouted != None else None
+
+    loader = BulkLoader(args.base_url, args.api_key, args.api_key_secret, router=router, source=source, chunk_size=args.chunk_size,
+                        max_workers=args.workers, notify=not args.no_notify, checkpoint_path=args.checkpoint, checkpoint_interval=args.checkpoint_interval,
+                        progress_interval=args.progress_interval, progress=sys.stderr if not args.quiet else None, unrouted=unrouted)
+    try:
+        if (args.input == '-'):
+            loader.load(sys.stdin, args.field, args.prefix)
+        else:
+            with open(args.input, 'r', encoding='utf-8') as file:
+                loader.load(file, args.field, args.prefix)
+    finally:
+        if (unrouted != None):
+            unrouted.close()
+
+    return 0
+
+def _notify(args: argparse.Namespace):
+    sources = load_sources(args.sources)
+    selected = [sources[source_id] for source_id in args.source] if args.source != None else list(sources.values())
+
+    report = notify_sources(selected, args.base_url, args.api_key, args.api_key_secret, max_workers=args.workers)
+
+    for result in report.results:
+        if (result.status != NotifyResult.NOTIFIED or not args.quiet):
+            sys.stderr.write('{0} {1} {2}{3}\n'.format(result.source_id, result.manifest.id if result.manifest != None else '-', result.status,
+                ': {0}'.format(result.error) if result.error != None else ''))
+
+    return 0 if report.ok else 1
+
+def main(argv: List[str] = None):
+    """Runs the adenotifier command line interface.
+
+    Args:
+        argv (list[str], optional): Command line arguments, by default sys.argv[1:].
+
+    Returns:
+        Int exit code.
+
+    """
+    parser = argparse.ArgumentParser(prog='adenotifier', description='Bulk ADE Notify API manifest operations.')
+    parser.add_argument('--base-url', default=os.environ.get('ADE_NOTIFY_API_BASE_URL'), help='ADE Notify API base url, default $ADE_NOTIFY_API_BASE_URL.')
+    parser.add_argument('--api-key', default=os.environ.get('ADE_NOTIFY_API_KEY'), help='ADE Notify API key, default $ADE_NOTIFY_API_KEY.')
+    parser.add_argument('--api-key-secret', default=os.environ.get('ADE_NOTIFY_API_KEY_SECRET'), help='ADE Notify API key secret, default $ADE_NOTIFY_API_KEY_SECRET.')
+    parser.add_argument('--max-rps', type=float, default=None, help='Max ADE Notify API requests per second.')
+    parser.add_argument('--workers', type=int, default=4, help='Number of parallel workers.')
+    parser.add_argument('--quiet', action='store_true', help='No progress output.')
+    parser.add_argument('--log-level', default='WARNING', help='Logging level, e.g. INFO.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    add_parser = subparsers.add_parser('add', help='Add file urls from a listing to new manifests.')
+    add_parser.add_argument('input', nargs='?', default='-', help='Listing file with a file url per line, default stdin.')
+    add_parser.add_argument('--sources', required=True, help='Data source configuration JSON file.')
+    add_parser.add_argument('--source', help='Add all file urls to the data source with the given id instead of routing them by file_url_prefix.')
+    add_parser.add_argument('--field', type=int, default=None, help='Index of the whitespace separated field holding the file path, e.g. -1 for storage ls output.')
+    add_parser.add_argument('--prefix', default=None, help='Prefix added to the file paths, e.g. s3://bucket/ for object keys.')
+    add_parser.add_argument('--chunk-size', type=int, default=None, help='Max files per manifest, default max_files_in_manifest of the data source or 10000.')
+    add_parser.add_argument('--no-notify', action='store_true', help='Leave manifests open.')
+    add_parser.add_argument('--checkpoint', default=None, help='Checkpoint file to resume an interrupted load from.')
+    add_parser.add_argument('--checkpoint-interval', type=int, default=100000, help='Max listing lines between checkpoints.')
+    add_parser.add_argument('--progress-interval', type=float, default=10, help='Seconds between progress lines.')
+    add_parser.add_argument('--unrouted', default=None, help='File the file urls without a matching data source are appended to.')
+    add_parser.set_defaults(run=_add)
+
+    notify_parser = subparsers.add_parser('notify', help='Notify open manifests of data sources.')
+    notify_parser.add_argument('--sources', required=True, help='Data source configuration JSON file.')
+    notify_parser.add_argument('--source', action='append', help='Id of a data source to notify, can be repeated. Default all data sources.')
+    notify_parser.set_defaults(run=_notify)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format='%(asctime)s %(levelname)s %(message)s')
+
+    for name, variable in (('base_url', 'ADE_NOTIFY_API_BASE_URL'), ('api_key', 'ADE_NOTIFY_API_KEY'), ('api_key_secret', 'ADE_NOTIFY_API_KEY_SECRET')):
+        if (getattr(args, name) == None):
+            parser.error('--{0} or ${1} is required.'.format(name.replace('_', '-'), variable))
+
+    configure_sessions(pool_maxsize=max(10, args.workers))
+    if (args.max_rps != None):
+        configure_rate_limits(args.base_url, rate=args.max_rps)
+
+    try:
+        return args.run(args)
+    except KeyboardInterrupt:
+        sys.stderr.write('Interrupted.\n')
+        return 130
+    except Exception as e:
+        logging.error(e)
+        return 1
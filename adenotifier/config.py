@@ -0,0 +1,206 @@
+import json
+import re
+from .manifest import Manifest
+from typing import List, Set, Dict, Tuple, Optional, Pattern
+
+MANIFEST_PARAMETERS: List[str] = ['columns', 'compression', 'delim', 'fullscanned', 'skiph']
+
+class SourceConfig:
+    """Data source configuration validated once, with the batch regular expression compiled and manifest parameters prebuilt.
+
+    Accepted by all notifier functions in place of a data source configuration JSON object. Supports read access by key
+    like the JSON object, e.g. config['attributes'], so it can be used where a JSON object is expected.
+    """
+    __source: dict = None
+
+    id: str = None
+    ade_source_system: str = None
+    ade_source_entity: str = None
+    format: str = None
+    single_file_manifest: bool = None
+    max_files_in_manifest: int = None
+    path_replace: str = None
+    path_replace_with: str = None
+    batch_pattern: Pattern = None
+    manifest_template: dict = None
+    file_url_prefixes: List[str] = None
+
+    def __init__(self, source: dict):
+        """Class constructor.
+
+        Args:
+            source (dict): Data source configuration JSON object. See notifier documentation for format & required attributes.
+
+        Raises:
+            ValueError if the configuration is not valid.
+
+        """
+        try:
+            attributes = source['attributes']
+            manifest_parameters = source['manifest_parameters']
+            self.id = source['id']
+            self.ade_source_system = attributes['ade_source_system']
+            self.ade_source_entity = attributes['ade_source_entity']
+            self.format = manifest_parameters['format']
+        except (KeyError, TypeError) as e:
+            raise ValueError('Mandatory data source attribute missing: {0}'.format(e))
+
+        self.__source = source
+        self.single_file_manifest = bool(attributes.get('single_file_manifest', False))
+        self.max_files_in_manifest = attributes.get('max_files_in_manifest')
+
+        if (self.max_files_in_manifest != None and (not isinstance(self.max_files_in_manifest, int) or self.max_files_in_manifest < 1)):
+            raise ValueError('Data source {0}: max_files_in_manifest must be a positive integer.'.format(self.id))
+
+        if ('path_replace' in attributes and 'path_replace_with' in attributes):
+            self.path_replace = attributes['path_replace']
+            self.path_replace_with = attributes['path_replace_with']
+
+        if ('batch_from_file_path_regex' in attributes):
+            try:
+                self.batch_pattern = re.compile(attributes['batch_from_file_path_regex'])
+            except re.error as e:
+                raise ValueError('Data source {0}: invalid batch_from_file_path_regex: {1}'.format(self.id, e))
+
+        # File url prefixes used for routing file urls to the data source.
+        prefixes = attributes.get('file_url_prefix', [])
+        self.file_url_prefixes = [prefixes] if isinstance(prefixes, str) else list(prefixes)
+
+        # Optional manifest attributes set to new Manifest objects.
+        self.manifest_template = {name: manifest_parameters[name] for name in MANIFEST_PARAMETERS if name in manifest_parameters}
+
+    @classmethod
+    def of(cls, source: object):
+        """Returns the given source as a SourceConfig, validating and compiling a JSON object if needed.
+
+        Args:
+            source (object): SourceConfig or data source configuration JSON object.
+
+        Returns:
+            SourceConfig object.
+
+        """
+        if (isinstance(source, cls)):
+            return source
+        return cls(source)
+
+    def __getitem__(self, key: str):
+        return self.__source[key]
+
+    def __contains__(self, key: str):
+        return key in self.__source
+
+    def get(self, key: str, default: object = None):
+        return self.__source.get(key, default)
+
+    def __repr__(self):
+        return 'SourceConfig(id={0!r})'.format(self.id)
+
+    @property
+    def source(self):
+        return self.__source
+
+    def entry_path(self, file_url: str):
+        """Returns the manifest entry path for the given file url with path replacement applied if configured.
+
+        Args:
+            file_url (str): Source file url.
+
+        Returns:
+            Str entry path.
+
+        """
+        if (self.path_replace != None):
+            return file_url.replace(self.path_replace, self.path_replace_with)
+        return file_url
+
+    def parse_batch(self, file_url: str):
+        """Parses batch number from the given file url with the compiled batch_from_file_path_regex.
+
+        Args:
+            file_url (str): Source file url.
+
+        Returns:
+            Int batch number or None if batch_from_file_path_regex is not configured.
+
+        Raises:
+            Exceptions if the file url does not match or the batch is not an integer.
+
+        """
+        if (self.batch_pattern == None):
+            return None
+
+        result = self.batch_pattern.search(file_url)
+        if (result == None):
+            raise ValueError('File url {0} does not match batch_from_file_path_regex.'.format(file_url))
+
+        return int(''.join(result.groups()))
+
+    def new_manifest(self, base_url: str, notify_api_key: str, notify_api_key_secret: str, id: str = None):
+        """Initializes a Manifest object with the configured manifest parameters.
+
+        Args:
+            base_url (str): ADE Notify API base url, e.g. https://external-api.{environment}.datahub.{tenant}.saas.agiledataengine.com:443/notify-api.
+            notify_api_key (str): ADE Notify API key.
+            notify_api_key_secret (str): ADE Notify API key secret.
+            id (str, optional): Id of an existing manifest, which is not fetched from ADE Notify API.
+
+        Returns:
+            Manifest object, not yet created in ADE Notify API if id is not given.
+
+        """
+        manifest = Manifest(
+            base_url = base_url,
+            source_system_name = self.ade_source_system,
+            source_entity_name = self.ade_source_entity,
+            format = self.format,
+            notify_api_key = notify_api_key,
+            notify_api_key_secret = notify_api_key_secret,
+            id = id
+        )
+
+        for name, value in self.manifest_template.items():
+            setattr(manifest, name, value)
+
+        return manifest
+
+def load_sources(path: str):
+    """Loads data source configurations from a JSON file containing a list of data source configuration JSON objects.
+
+    Args:
+        path (str): JSON file path.
+
+    Returns:
+        Dict [str, SourceConfig] of data sources by id.
+
+    Raises:
+        ValueError if a configuration is not valid or data source ids are not unique.
+
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        sources = json.load(file)
+
+    return build_registry(sources)
+
+def build_registry(sources: List[object]):
+    """Builds a registry of data source configurations by id.
+
+    Args:
+        sources (list[object]): Data source configuration JSON objects or SourceConfig objects.
+
+    Returns:
+        Dict [str, SourceConfig] of data sources by id.
+
+    Raises:
+        ValueError if a configuration is not valid or data source ids are not unique.
+
+    """
+    registry = {}
+
+    for source in sources:
+        config = SourceConfig.of(source)
+        if (config.id in registry):
+            raise ValueError('Duplicate data source id: {0}'.format(config.id))
+        registry[config.id] = config
+
+    return registry
@@ -0,0 +1,456 @@
+import collections
+import hashlib
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from .config import SourceConfig
+from typing import List, Set, Dict, Tuple, Optional, Iterable
+
+class DedupStore:
+    """Interface of persistent stores of seen dedup keys backing a DedupIndex."""
+
+    def add(self, key: str):
+        """Adds a key.
+
+        Args:
+            key (str): Dedup key.
+
+        Returns:
+            True if the key was not seen before.
+
+        """
+        raise NotImplementedError()
+
+    def add_many(self, keys: Iterable[str]):
+        """Adds keys, e.g. when seeding the index."""
+        for key in keys:
+            self.add(key)
+
+    def contains(self, key: str):
+        """Returns True if the key has been added."""
+        raise NotImplementedError()
+
+    def discard(self, key: str):
+        """Removes a key if supported by the store."""
+        pass
+
+    def close(self):
+        """Persists and closes the store."""
+        pass
+
+class SQLiteDedupStore(DedupStore):
+    """Exact persistent store of seen keys in a SQLite database."""
+    __connection: sqlite3.Connection = None
+    __lock: threading.Lock = None
+
+    path: str = None
+
+    def __init__(self, path: str):
+        """Class constructor.
+
+        Args:
+            path (str): SQLite database file path, created if it does not exist.
+
+        """
+        self.path = path
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute("PRAGMA synchronous=NORMAL")
+        self.__connection.execute("CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY) WITHOUT ROWID")
+
+    def add(self, key: str):
+        with self.__lock:
+            return self.__connection.execute("INSERT OR IGNORE INTO seen (key) VALUES (?)", (key,)).rowcount > 0
+
+    def add_many(self, keys: Iterable[str]):
+        with self.__lock:
+            self.__connection.execute("BEGIN")
+            self.__connection.executemany("INSERT OR IGNORE INTO seen (key) VALUES (?)", ((key,) for key in keys))
+            self.__connection.execute("COMMIT")
+
+    def contains(self, key: str):
+        with self.__lock:
+            return self.__connection.execute("SELECT 1 FROM seen WHERE key = ?", (key,)).fetchone() != None
+
+    def discard(self, key: str):
+        with self.__lock:
+            self.__connection.execute("DELETE FROM seen WHERE key = ?", (key,))
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
+
+class BloomDedupStore(DedupStore):
+    """Compact persistent store of seen keys in a Bloom filter file, using about 1.44 * log2(1 / error_rate) bits per key at capacity,
+    e.g. about 3.6 bytes per key and 3.6 MB in total at the defaults.
+
+    A Bloom filter may report an unseen key as seen with the probability of error_rate, in which case a new file would be
+    dropped as a duplicate. Keep error_rate low, or use SQLiteDedupStore where an exact index is required. Keys cannot be
+    removed, DedupIndex adds keys to the store only after their files have been added to a manifest.
+
+    The bits set by a key are written to the file before add() and add_many() return, so that added keys survive a crash of
+    the process, as in SQLiteDedupStore. flush() and close() also sync the file to disk, to keep the keys in operating system
+    crashes and power loss. Bits are only ever set, so a write interrupted by a crash cannot lose keys added before it.
+    """
+    __bits: bytearray = None
+    __file: object = None
+    __lock: threading.Lock = None
+
+    path: str = None
+    size: int = None
+    hashes: int = None
+    count: int = None
+
+    def __init__(self, path: str, capacity: int = 1000000, error_rate: float = 1e-6):
+        """Class constructor. An existing filter file is loaded, capacity and error_rate are used for new files only.
+
+        Args:
+            path (str): Filter file path, created if it does not exist.
+            capacity (int, optional): Expected number of keys. Beyond it, the error rate grows quickly.
+            error_rate (float, optional): False positive probability at capacity.
+
+        """
+        self.path = path
+        self.__lock = threading.Lock()
+
+        if (os.path.exists(path)):
+            with open(path, 'rb') as file:
+                header = file.read(24)
+                self.size = int.from_bytes(header[0:8], 'big')
+                self.hashes = int.from_bytes(header[8:16], 'big')
+                self.count = int.from_bytes(header[16:24], 'big')
+                self.__bits = bytearray(file.read())
+        else:
+            self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+            self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+            self.count = 0
+            self.__bits = bytearray((self.size + 7) // 8)
+            with open(path, 'wb') as file:
+                file.write(self.__header())
+                file.truncate(24 + len(self.__bits))
+
+        self.__file = open(path, 'r+b')
+
+    def __header(self):
+        return self.size.to_bytes(8, 'big') + self.hashes.to_bytes(8, 'big') + self.count.to_bytes(8, 'big')
+
+    def __positions(self, key: str):
+        """Returns the bit positions of a key with double hashing."""
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], 'big')
+        b = int.from_bytes(digest[8:], 'big') | 1
+        return [(a + i * b) % self.size for i in range(self.hashes)]
+
+    def __set(self, key: str, changed: Set[int]):
+        """Sets the bits of a key, collecting the indexes of changed bytes. Expects __lock to be held.
+
+        Returns:
+            True if the key was not seen before.
+
+        """
+        new = False
+        for position in self.__positions(key):
+            mask = 1 << (position & 7)
+            if (not self.__bits[position >> 3] & mask):
+                self.__bits[position >> 3] |= mask
+                changed.add(position >> 3)
+                new = True
+        if (new):
+            self.count += 1
+        return new
+
+    def __write(self, changed: Set[int]):
+        """Writes the changed bytes and the header to the file. Expects __lock to be held."""
+        if (changed == set()):
+            return
+        if (len(changed) * 64 > len(self.__bits)):
+            # Writing the whole filter is cheaper than a seek per byte, e.g. when seeding.
+            self.__file.seek(24)
+            self.__file.write(self.__bits)
+        else:
+            for index in sorted(changed):
+                self.__file.seek(24 + index)
+                self.__file.write(self.__bits[index:index + 1])
+        self.__file.seek(0)
+        self.__file.write(self.__header())
+        self.__file.flush()
+
+    def add(self, key: str):
+        with self.__lock:
+            changed = set()
+            new = self.__set(key, changed)
+            self.__write(changed)
+            return new
+
+    def add_many(self, keys: Iterable[str]):
+        with self.__lock:
+            changed = set()
+            for key in keys:
+                self.__set(key, changed)
+            self.__write(changed)
+
+    def contains(self, key: str):
+        positions = self.__positions(key)
+        with self.__lock:
+            return all(self.__bits[position >> 3] & (1 << (position & 7)) for position in positions)
+
+    def flush(self):
+        """Syncs the filter file to disk."""
+        with self.__lock:
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+
+    def close(self):
+        self.flush()
+        with self.__lock:
+            self.__file.close()
+
+class DedupIndex:
+    """Client-side index of source files already added to manifests, used to drop duplicate file events before any API call.
+
+    Keys are entry paths after path_replace, per source system and entity. Recently seen keys are kept in an in-memory LRU
+    of max_size keys, backed by an optional persistent store for keys evicted from it and for keys seen by earlier runs.
+    The index can be seeded with the entries of open manifests, so that files added before the index was created are known.
+
+    Adding a file is two-phase: add() or filter() reserves new files, and commit() records them after they have been added
+    to a manifest, or discard() releases them if adding failed, so that a retried event is not dropped. A duplicate of a
+    reserved file waits until the reservation is committed (and is dropped) or discarded (and is reserved in turn).
+    """
+    __lock: threading.Lock = None
+    __recent: collections.OrderedDict = None
+    __pending: Dict[str, threading.Event] = None
+    __seeded: Set[Tuple[str, str, str]] = None
+
+    max_size: int = None
+    store: DedupStore = None
+    wait_timeout: float = None
+
+    def __init__(self, max_size: int = 100000, store: DedupStore = None, wait_timeout: float = 300):
+        """Class constructor.
+
+        Args:
+            max_size (int, optional): Max number of keys kept in the in-memory LRU.
+            store (DedupStore, optional): Persistent store, e.g. SQLiteDedupStore or BloomDedupStore.
+            wait_timeout (float, optional): Max seconds a duplicate waits for the reservation of another call.
+
+        """
+        self.max_size = max_size
+        self.store = store
+        self.wait_timeout = wait_timeout
+        self.__lock = threading.Lock()
+        self.__recent = collections.OrderedDict()
+        self.__pending = {}
+        self.__seeded = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def key(source: object, file_url: str):
+        """Returns the dedup key of a file url of a data source.
+
+        Args:
+            source (object): Data source configuration JSON object or SourceConfig.
+            file_url (str): Source file url.
+
+        Returns:
+            Str key.
+
+        """
+        config = SourceConfig.of(source)
+        return '{0}/{1}|{2}'.format(config.ade_source_system, config.ade_source_entity, config.entry_path(file_url))
+
+    def __remember(self, key: str):
+        """Adds a key to the LRU, evicting the least recently seen keys. Expects __lock to be held."""
+        self.__recent[key] = None
+        self.__recent.move_to_end(key)
+        while (len(self.__recent) > self.max_size):
+            self.__recent.popitem(last=False)
+
+    def __reserve(self, keys: List[str]):
+        """Reserves unique keys not seen before.
+
+        Reservations are made only when none of the keys is reserved by another call, so that a call never waits while
+        holding reservations, which could deadlock two calls waiting for each other.
+
+        Returns:
+            List [bool] of True for reserved keys and False for seen keys.
+
+        Raises:
+            TimeoutError if a key stays reserved by another call for wait_timeout seconds.
+
+        """
+        deadline = time.monotonic() + self.wait_timeout
+
+        while True:
+            with self.__lock:
+                busy = [self.__pending[key] for key in keys if key in self.__pending]
+                if (busy == []):
+                    reserved = []
+                    for key in keys:
+                        if (key in self.__recent):
+                            self.__recent.move_to_end(key)
+                            reserved.append(False)
+                        else:
+                            self.__pending[key] = threading.Event()
+                            reserved.append(True)
+                    break
+
+            for event in busy:
+                if (not event.wait(max(deadline - time.monotonic(), 0))):
+                    raise TimeoutError('File is being added by another call for more than {0} seconds.'.format(self.wait_timeout))
+
+        if (self.store != None):
+            seen = [key for key, new in zip(keys, reserved) if new and self.store.contains(key)]
+            if (seen != []):
+                self.__release(seen, True)
+                seen = set(seen)
+                reserved = [new and key not in seen for key, new in zip(keys, reserved)]
+
+        return reserved
+
+    def __release(self, keys: Iterable[str], seen: bool):
+        """Ends reservations of keys, recording them as seen or not, and wakes up calls waiting for them."""
+        with self.__lock:
+            events = [self.__pending.pop(key, None) for key in keys]
+            if (seen):
+                for key in keys:
+                    self.__remember(key)
+        for event in events:
+            if (event != None):
+                event.set()
+
+    def add(self, source: object, file_url: str):
+        """Reserves a file url of a data source unless already seen. Call commit() after adding it to a manifest, or discard() if adding failed.
+
+        Args:
+            source (object): Data source configuration JSON object or SourceConfig.
+            file_url (str): Source file url.
+
+        Returns:
+            True if the file url was not seen before and is reserved, False if it is a duplicate.
+
+        Raises:
+            TimeoutError if the file url stays reserved by another call for wait_timeout seconds.
+
+        """
+        return self.__reserve([self.key(source, file_url)])[0]
+
+    def commit(self, source: object, file_url: str):
+        """Records a reserved file url as seen after it has been added to a manifest."""
+        self.commit_many([file_url], source)
+
+    def commit_many(self, file_urls: Iterable[str], source: object):
+        """Records reserved file urls of a data source as seen after they have been added to manifests. The store has written them when this returns."""
+        config = SourceConfig.of(source)
+        keys = [self.key(config, file_url) for file_url in file_urls]
+        if (self.store != None):
+            self.store.add_many(keys)
+        self.__release(keys, True)
+
+    def discard(self, source: object, file_url: str):
+        """Releases a reserved file url when adding it to a manifest failed, so that a retried event is not dropped. A file url
+        already recorded as seen is forgotten, and removed from the store if supported by it.
+
+        Args:
+            source (object): Data source configuration JSON object or SourceConfig.
+            file_url (str): Source file url.
+
+        """
+        self.discard_many([file_url], source)
+
+    def discard_many(self, file_urls: Iterable[str], source: object):
+        """Releases reserved file urls of a data source when adding them failed, see discard."""
+        config = SourceConfig.of(source)
+        keys = [self.key(config, file_url) for file_url in file_urls]
+
+        with self.__lock:
+            recorded = [key for key in keys if key not in self.__pending]
+            for key in recorded:
+                self.__recent.pop(key, None)
+
+        if (self.store != None):
+            for key in recorded:
+                self.store.discard(key)
+
+        self.__release(keys, False)
+
+    def filter(self, file_urls: Iterable[str], source: object):
+        """Reserves file urls of a data source and returns the ones not seen before, in order. Call commit_many() with the
+        returned file urls after adding them to manifests, or discard_many() if adding failed.
+
+        Args:
+            file_urls (iterable[str]): Source file urls.
+            source (object): Data source configuration JSON object or SourceConfig.
+
+        Returns:
+            List [str] of new file urls, without duplicates.
+
+        Raises:
+            TimeoutError if a file url stays reserved by another call for wait_timeout seconds.
+
+        """
+        config = SourceConfig.of(source)
+        keys = {}
+        for file_url in file_urls:
+            keys.setdefault(self.key(config, file_url), file_url)
+
+        reserved = self.__reserve(list(keys))
+        return [file_url for file_url, new in zip(keys.values(), reserved) if new]
+
+    def seed(self, source: object, base_url: str, notify_api_key: str, notify_api_key_secret: str, force: bool = False):
+        """Records the entries of the open manifests of a data source, once per source unless forced.
+
+        Args:
+            source (object): Data source configuration JSON object or SourceConfig.
+            base_url (str): ADE Notify API base url.
+            notify_api_key (str): ADE Notify API key.
+            notify_api_key_secret (str): ADE Notify API key secret.
+            force (bool, optional): Seed again even if the source has already been seeded.
+
+        Returns:
+            Int number of seeded entries.
+
+        """
+        from .notifier import iter_manifests # Imported here, notifier imports this module.
+
+        config = SourceConfig.of(source)
+        seed_key = (base_url, config.ade_source_system, config.ade_source_entity)
+
+        with self.__lock:
+            if (seed_key in self.__seeded and not force):
+                return 0
+            self.__seeded.add(seed_key)
+
+        count = 0
+        try:
+            for open_manifest in iter_manifests(config.ade_source_system, config.ade_source_entity, base_url, notify_api_key, notify_api_key_secret, "OPEN"):
+                manifest = config.new_manifest(base_url, notify_api_key, notify_api_key_secret, id = open_manifest['id'])
+                manifest.fetch_manifest_entries()
+                # Entry paths are already rewritten, so keys are built without path_replace.
+                keys = ['{0}/{1}|{2}'.format(config.ade_source_system, config.ade_source_entity, source_file) for source_file in manifest.entry_list.source_files()]
+                with self.__lock:
+                    for key in keys:
+                        self.__remember(key)
+                if (self.store != None):
+                    self.store.add_many(keys)
+                count += len(keys)
+        except Exception:
+            with self.__lock:
+                self.__seeded.discard(seed_key)
+            raise
+
+        logging.info('Seeded dedup index with {0} entries of source {1}.'.format(count, config.id))
+        return count
+
+    def close(self):
+        """Persists and closes the store."""
+        if (self.store != None):
+            self.store.close()
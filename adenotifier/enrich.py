@@ -0,0 +1,265 @@
+import collections
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlsplit
+from typing import List, Set, Dict, Tuple, Optional, Iterable, TYPE_CHECKING
+
+if (TYPE_CHECKING):
+    import requests
+
+class StorageBackend:
+    """Interface of storage metadata lookups used by ContentLengthEnricher. Implementations must be thread-safe."""
+
+    def content_length(self, file_url: str):
+        """Returns the size of a file.
+
+        Args:
+            file_url (str): Source file url.
+
+        Returns:
+            Int content length in bytes, or None if the file does not exist.
+
+        """
+        raise NotImplementedError()
+
+class LocalFileBackend(StorageBackend):
+    """Storage backend for files on the local filesystem, e.g. for testing enrichment against a local copy of the files."""
+    roots: Dict[str, str] = None
+
+    def __init__(self, roots: Dict[str, str] = None):
+        """Class constructor.
+
+        Args:
+            roots (dict, optional): Local directories by file url prefix, e.g. {"s3://bucket/": "/data/bucket/"}. File urls without
+                a matching prefix are read as file:// urls or local paths.
+
+        """
+        self.roots = roots or {}
+
+    def path(self, file_url: str):
+        """Returns the local path of a file url."""
+        for prefix, root in self.roots.items():
+            if (file_url.startswith(prefix)):
+                return os.path.join(root, *file_url[len(prefix):].split('/'))
+
+        if (file_url.startswith('file://')):
+            return unquote(urlsplit(file_url).path)
+
+        return file_url
+
+    def content_length(self, file_url: str):
+        try:
+            return os.stat(self.path(file_url)).st_size
+        except FileNotFoundError:
+            return None
+
+class HttpBackend(StorageBackend):
+    """Storage backend sending HTTP HEAD requests, e.g. for public or pre-signed https file urls."""
+    __session: 'requests.Session' = None
+
+    timeout: float = None
+
+    def __init__(self, session: 'requests.Session' = None, timeout: float = 10, pool_maxsize: int = 32):
+        """Class constructor.
+
+        Args:
+            session (requests.Session, optional): Session with storage credentials. By default a new pooled session.
+            timeout (float, optional): Request timeout in seconds.
+            pool_maxsize (int, optional): Max number of connections kept open per host of the default session.
+
+        """
+        if (session == None):
+            import requests
+            import requests.adapters
+
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_maxsize)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+
+        self.__session = session
+        self.timeout = timeout
+
+    def content_length(self, file_url: str):
+        response = self.__session.head(file_url, timeout=self.timeout, allow_redirects=True)
+        if (response.status_code == 404):
+            return None
+        response.raise_for_status()
+        content_length = response.headers.get('Content-Length')
+        return int(content_length) if content_length != None else None
+
+class S3Backend(StorageBackend):
+    """Storage backend for s3://bucket/key file urls, taking a boto3 S3 client, e.g. boto3.client('s3')."""
+    client: object = None
+
+    def __init__(self, client: object):
+        self.client = client
+
+    def content_length(self, file_url: str):
+        url = urlsplit(file_url)
+        try:
+            return self.client.head_object(Bucket=url.netloc, Key=unquote(url.path.lstrip('/')))['ContentLength']
+        except Exception as e:
+            # botocore ClientError of a missing object, checked by attributes to avoid importing botocore.
+            if (str(getattr(e, 'response', {}).get('Error', {}).get('Code')) in ('404', 'NoSuchKey', 'NotFound')):
+                return None
+            raise
+
+class AzureBlobBackend(StorageBackend):
+    """Storage backend for https://{account}.blob.core.windows.net/{container}/{blob} file urls, taking an azure-storage-blob
+    BlobServiceClient of the storage account."""
+    client: object = None
+
+    def __init__(self, client: object):
+        self.client = client
+
+    def content_length(self, file_url: str):
+        container, blob = unquote(urlsplit(file_url).path).lstrip('/').split('/', 1)
+        try:
+            return self.client.get_blob_client(container, blob).get_blob_properties().size
+        except Exception as e:
+            # azure.core ResourceNotFoundError, checked by name to avoid importing azure-core.
+            if (type(e).__name__ == 'ResourceNotFoundError'):
+                return None
+            raise
+
+class ContentLengthEnricher:
+    """Fills the contentLength of manifest entries with storage metadata lookups.
+
+    Lookups of a batch of entries are made in parallel by a pool of max_workers threads, and sizes are cached per file url
+    in an LRU of cache_size urls, so that repeated and retried file urls are not looked up again. Missing files and failed
+    lookups are logged and left without contentLength, and are not cached.
+    """
+    __lock: threading.Lock = None
+    __cache: collections.OrderedDict = None
+    __executor: ThreadPoolExecutor = None
+
+    backend: StorageBackend = None
+    max_workers: int = None
+    cache_size: int = None
+
+    def __init__(self, backend: StorageBackend, max_workers: int = 16, cache_size: int = 100000):
+        """Class constructor.
+
+        Args:
+            backend (StorageBackend): Storage metadata backend, e.g. S3Backend, AzureBlobBackend, HttpBackend or LocalFileBackend.
+            max_workers (int, optional): Max number of concurrent lookups.
+            cache_size (int, optional): Max number of cached file url sizes.
+
+        """
+        self.backend = backend
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self.__lock = threading.Lock()
+        self.__cache = collections.OrderedDict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __cached(self, file_url: str):
+        with self.__lock:
+            content_length = self.__cache.get(file_url)
+            if (content_length != None):
+                self.__cache.move_to_end(file_url)
+            return content_length
+
+    def __lookup(self, file_url: str):
+        """Looks up and caches the size of a file, returning None if the file is missing or the lookup fails."""
+        try:
+            content_length = self.backend.content_length(file_url)
+        except Exception as e:
+            logging.warning('Content length lookup failed for {0}:\n{1}'.format(file_url, e))
+            return None
+
+        if (content_length == None):
+            logging.warning('Content length not found for {0}.'.format(file_url))
+            return None
+
+        with self.__lock:
+            self.__cache[file_url] = content_length
+            self.__cache.move_to_end(file_url)
+            while (len(self.__cache) > self.cache_size):
+                self.__cache.popitem(last=False)
+
+        return content_length
+
+    def content_length(self, file_url: str):
+        """Returns the size of a file from the cache or the storage backend.
+
+        Args:
+            file_url (str): Source file url.
+
+        Returns:
+            Int content length in bytes, or None if the file is missing or the lookup failed.
+
+        """
+        content_length = self.__cached(file_url)
+        return content_length if content_length != None else self.__lookup(file_url)
+
+    def content_lengths(self, file_urls: Iterable[str]):
+        """Returns the sizes of files, looking up uncached file urls in parallel.
+
+        Args:
+            file_urls (iterable[str]): Source file urls.
+
+        Returns:
+            Dict [str, int] of content lengths by file url, None for missing files and failed lookups.
+
+        """
+        content_lengths = {}
+        for file_url in file_urls:
+            if (file_url not in content_lengths):
+                content_lengths[file_url] = self.__cached(file_url)
+
+        missing = [file_url for file_url, content_length in content_lengths.items() if content_length == None]
+
+        if (len(missing) == 1):
+            content_lengths[missing[0]] = self.__lookup(missing[0])
+        elif (missing != []):
+            with self.__lock:
+                if (self.__executor == None):
+                    self.__executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='adenotifier-enrich')
+            content_lengths.update(zip(missing, self.__executor.map(self.__lookup, missing)))
+
+        return content_lengths
+
+    def enrich(self, entries: List[dict]):
+        """Sets contentLength of the given manifest entries in place, for entries without it. Call before path replacement,
+        so that sourceFile is the storage url of the file.
+
+        Args:
+            entries (list[dict]): Manifest entries.
+
+        Returns:
+            Int number of entries left without contentLength.
+
+        """
+        entries = [entry for entry in entries if entry.get('contentLength') == None]
+        content_lengths = self.content_lengths(entry['sourceFile'] for entry in entries)
+        missing = 0
+
+        for entry in entries:
+            content_length = content_lengths[entry['sourceFile']]
+            if (content_length != None):
+                entry['contentLength'] = content_length
+            else:
+                missing += 1
+
+        return missing
+
+    def clear(self):
+        """Removes all cached sizes."""
+        with self.__lock:
+            self.__cache.clear()
+
+    def close(self):
+        """Stops the lookup threads."""
+        with self.__lock:
+            executor, self.__executor = self.__executor, None
+        if (executor != None):
+            executor.shutdown()
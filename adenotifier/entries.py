@@ -0,0 +1,305 @@
+import array
+import collections.abc
+import json
+import re
+from typing import List, Set, Dict, Tuple, Optional, Iterable
+
+_NONE: int = -2 ** 63 # Marks a missing batch or contentLength in the integer columns.
+_SOURCE_FILE_KEY = re.compile(rb'"sourceFile"\s*:')
+
+class ManifestEntry(collections.abc.Mapping):
+    """Manifest entry decoded from an EntryList, a read-only mapping with the keys and values of the entry JSON object, e.g. entry['sourceFile']."""
+    __slots__ = ('sourceFile', 'batch', 'contentLength', 'extra')
+
+    def __init__(self, sourceFile: str, batch: int = None, contentLength: int = None, extra: dict = None):
+        self.sourceFile = sourceFile
+        self.batch = batch
+        self.contentLength = contentLength
+        self.extra = extra
+
+    def __getitem__(self, key: str):
+        if (key in ManifestEntry.__slots__[:3]):
+            value = getattr(self, key)
+            if (value != None):
+                return value
+        # Keys with a null value or not fitting the columns are kept in extra.
+        if (self.extra != None and key in self.extra):
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key: object):
+        if (key in ManifestEntry.__slots__[:3] and getattr(self, key) != None):
+            return True
+        return self.extra != None and key in self.extra
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return 1 + (self.batch != None) + (self.contentLength != None) + (len(self.extra) if self.extra != None else 0)
+
+    def __eq__(self, other: object):
+        if (isinstance(other, collections.abc.Mapping)):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return 'ManifestEntry({0!r})'.format(self.to_dict())
+
+    def to_dict(self):
+        """Returns the entry as a manifest entry JSON object."""
+        entry = {'sourceFile': self.sourceFile}
+        if (self.batch != None):
+            entry['batch'] = self.batch
+        if (self.contentLength != None):
+            entry['contentLength'] = self.contentLength
+        if (self.extra != None):
+            entry.update(self.extra)
+        return entry
+
+class EntryList(collections.abc.Sequence):
+    """Compact read-only sequence of manifest entries, e.g. from a fetch_manifest_entries response.
+
+    Entries are stored in columns: source file urls as one UTF-8 byte string with an offset array, and batch and contentLength
+    as integer arrays, which takes a fraction of the memory of a list of dicts. The raw response is decoded lazily on the first
+    access of the entries, and len() of an undecoded list counts the entries from the raw response without decoding them.
+    ManifestEntry objects are created on access, keep them only as long as needed. Use to_list() where a list of dicts is
+    required, e.g. for json.dumps.
+    """
+    __raw: bytes = None
+    __count: int = None
+    __source_files: bytes = None
+    __offsets: array.array = None
+    __batches: array.array = None
+    __content_lengths: array.array = None
+    __extras: Dict[int, dict] = None
+
+    def __init__(self, entries: List[dict] = None):
+        """Class constructor.
+
+        Args:
+            entries (list[dict], optional): Manifest entry JSON objects.
+
+        """
+        self.__decode(entries if entries != None else [])
+
+    @classmethod
+    def from_json(cls, raw: bytes):
+        """Returns an EntryList decoding the given JSON array lazily.
+
+        Args:
+            raw (bytes): UTF-8 encoded JSON array of manifest entries, e.g. requests.Response.content.
+
+        Returns:
+            EntryList object.
+
+        """
+        entries = cls.__new__(cls)
+        entries.__raw = raw
+        return entries
+
+    def __decode(self, entries: List[dict] = None, raw: bytes = None):
+        """Stores the given entry JSON objects or the entries of the given JSON array in columns."""
+        source_files = bytearray()
+        offsets = array.array('Q', [0])
+        batches = array.array('q')
+        content_lengths = array.array('q')
+        extras = {}
+
+        def append(entry: dict):
+            source_files.extend(entry['sourceFile'].encode('utf-8'))
+            offsets.append(len(source_files))
+            batch = entry.get('batch')
+            content_length = entry.get('contentLength')
+            batch = batch if _fits(batch) else None
+            content_length = content_length if _fits(content_length) else None
+            batches.append(batch if batch != None else _NONE)
+            content_lengths.append(content_length if content_length != None else _NONE)
+            if (len(entry) > 1 + (batch != None) + (content_length != None)):
+                # Other attributes and values not fitting the columns are kept as is.
+                extras[len(batches) - 1] = {key: value for key, value in entry.items()
+                    if key != 'sourceFile' and not (key == 'batch' and batch != None) and not (key == 'contentLength' and content_length != None)}
+
+        if (raw != None):
+            # Entries are stored as they are decoded, so that the decoded array only holds None values instead of dicts.
+            json.loads(raw, object_hook=lambda entry: append(entry) if 'sourceFile' in entry else entry)
+        else:
+            for entry in entries:
+                append(entry)
+
+        self.__source_files = bytes(source_files)
+        self.__offsets = offsets
+        self.__batches = batches
+        self.__content_lengths = content_lengths
+        self.__extras = extras
+        self.__count = len(batches)
+        self.__raw = None
+
+    def __decoded(self):
+        """Decodes the raw response on first access."""
+        if (self.__raw != None):
+            self.__decode(raw=self.__raw)
+
+    def __len__(self):
+        if (self.__count == None):
+            self.__count = count_entries(self.__raw)
+        return self.__count
+
+    def __getitem__(self, index: int):
+        self.__decoded()
+        if (isinstance(index, slice)):
+            return [self[i] for i in range(*index.indices(self.__count))]
+        if (index < 0):
+            index += self.__count
+        if (index < 0 or index >= self.__count):
+            raise IndexError('Entry index out of range.')
+
+        batch = self.__batches[index]
+        content_length = self.__content_lengths[index]
+        return ManifestEntry(
+            self.__source_files[self.__offsets[index]:self.__offsets[index + 1]].decode('utf-8'),
+            batch if batch != _NONE else None,
+            content_length if content_length != _NONE else None,
+            self.__extras.get(index)
+        )
+
+    def __iter__(self):
+        self.__decoded()
+        for index in range(self.__count):
+            yield self[index]
+
+    def __eq__(self, other: object):
+        if (not isinstance(other, (list, EntryList))):
+            return NotImplemented
+        return self.to_list() == [entry.to_dict() if isinstance(entry, ManifestEntry) else entry for entry in other]
+
+    def __repr__(self):
+        return 'EntryList(count={0})'.format(len(self))
+
+    @property
+    def decoded(self):
+        return self.__raw == None
+
+    def source_files(self):
+        """Returns an iterator of the source file urls without creating entry objects."""
+        self.__decoded()
+        source_files, offsets = self.__source_files, self.__offsets
+        for index in range(self.__count):
+            yield source_files[offsets[index]:offsets[index + 1]].decode('utf-8')
+
+    def to_list(self):
+        """Returns the entries as a list of manifest entry JSON objects, e.g. for Manifest.add_entries."""
+        return [entry.to_dict() for entry in self]
+
+def _fits(value: object):
+    """Returns True if the value can be stored in an integer column."""
+    return type(value) == int and _NONE < value < 2 ** 63
+
+def count_entries(raw: bytes):
+    """Counts manifest entries in a JSON array without decoding them.
+
+    Args:
+        raw (bytes): UTF-8 encoded JSON array of manifest entries.
+
+    Returns:
+        Int number of entries.
+
+    """
+    # A key followed by a colon cannot occur inside a JSON string, where quotes are escaped, so each match is an entry.
+    return sum(1 for _ in _SOURCE_FILE_KEY.finditer(raw))
+
+class EntryDiff:
+    """Difference between the entries of a manifest and a desired set of entries, see diff_entries."""
+    added: List[dict] = None
+    changed: List[dict] = None
+    removed: List[dict] = None
+    entries: List[dict] = None
+    method: str = None
+
+    def __init__(self, added: List[dict], changed: List[dict], removed: List[dict], entries: List[dict]):
+        self.added = added
+        self.changed = changed
+        self.removed = removed
+        self.entries = entries
+
+    def __repr__(self):
+        return 'EntryDiff(added={0}, changed={1}, removed={2}, method={3!r})'.format(len(self.added), len(self.changed), len(self.removed), self.method)
+
+    @property
+    def empty(self):
+        return self.added == [] and self.changed == [] and self.removed == []
+
+    def plan(self, max_posts: int = 100, request_cost: int = 4096):
+        """Returns the cheapest way to apply the difference to the manifest.
+
+        Added entries can be appended with one POST each, while changed and removed entries require a PUT of all entries.
+        POSTs are chosen if there are at most max_posts of them and their request bodies and per-request cost take fewer
+        bytes than the PUT, so that appending a few entries to a large manifest costs bytes in proportion to the entries added.
+
+        Args:
+            max_posts (int, optional): Max number of POST requests.
+            request_cost (int, optional): Cost of a request in request body bytes, e.g. for headers and the round trip.
+
+        Returns:
+            Str "post", "put", or None if there is no difference.
+
+        """
+        if (self.empty):
+            return None
+        if (self.changed != [] or self.removed != [] or len(self.added) > max_posts):
+            return 'put'
+
+        post_bytes = sum(len(json.dumps(entry)) + request_cost for entry in self.added)
+        put_bytes = request_cost + 2
+        for entry in self.entries:
+            put_bytes += len(json.dumps(entry)) + 2
+            if (put_bytes >= post_bytes):
+                return 'post'
+
+        return 'put'
+
+def diff_entries(current: Iterable[object], desired: Iterable[dict], replace: bool = False):
+    """Compares the entries of a manifest to a desired set of entries by sourceFile.
+
+    A desired entry is changed if an attribute it defines differs from the current entry, attributes it does not define
+    are kept. Without replace, the desired entries are added to the current entries, with replace the resulting entries
+    are the desired entries and current entries missing from them are removed.
+
+    Args:
+        current (iterable): Current manifest entries, e.g. an EntryList or a list of manifest entry JSON objects.
+        desired (iterable[dict]): Desired manifest entry JSON objects.
+        replace (bool, optional): Remove current entries missing from the desired entries.
+
+    Returns:
+        EntryDiff object with the added, changed and removed entries and the resulting entries in order.
+
+    """
+    current = [entry.to_dict() if isinstance(entry, ManifestEntry) else entry for entry in current]
+    current_by_file = {entry['sourceFile']: entry for entry in current}
+    desired_by_file = {}
+    added = []
+    changed = {}
+
+    for entry in desired:
+        source_file = entry['sourceFile']
+        if (source_file in desired_by_file):
+            # The first desired entry of a file wins.
+            continue
+
+        existing = current_by_file.get(source_file)
+        if (existing == None):
+            added.append(entry)
+        elif (any(existing.get(key) != value for key, value in entry.items())):
+            entry = changed[source_file] = dict(existing, **entry)
+        else:
+            entry = existing
+        desired_by_file[source_file] = entry
+
+    if (replace):
+        removed = [entry for entry in current if entry['sourceFile'] not in desired_by_file]
+        entries = list(desired_by_file.values())
+    else:
+        removed = []
+        entries = [changed.get(entry['sourceFile'], entry) for entry in current] + added
+
+    return EntryDiff(added, list(changed.values()), removed, entries)
@@ -0,0 +1,323 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from . import notifier
+from .session import configure_rate_limits, configure_sessions
+from typing import List, Set, Dict, Tuple, Optional, Callable, Iterable
+
+class Environment:
+    """ADE Runtime environment with its ADE Notify API base url, key and limits."""
+    name: str = None
+    base_url: str = None
+    notify_api_key: str = None
+    notify_api_key_secret: str = None
+    max_workers: int = None
+    rate_limit: dict = None
+
+    def __init__(self, name: str, base_url: str, notify_api_key: str, notify_api_key_secret: str, max_workers: int = 10, rate_limit: dict = None):
+        """Class constructor.
+
+        Args:
+            name (str): Environment name, e.g. "dev".
+            base_url (str): ADE Notify API base url of the environment.
+            notify_api_key (str): ADE Notify API key.
+            notify_api_key_secret (str): ADE Notify API key secret.
+            max_workers (int, optional): Number of operations run in parallel in the environment, also the size of its connection pool.
+            rate_limit (dict, optional): RateLimiter arguments of the environment, see session.configure_rate_limits.
+
+        """
+        self.name = name
+        self.base_url = base_url
+        self.notify_api_key = notify_api_key
+        self.notify_api_key_secret = notify_api_key_secret
+        self.max_workers = max_workers
+        self.rate_limit = rate_limit
+
+    def __repr__(self):
+        return 'Environment(name={0!r}, base_url={1!r})'.format(self.name, self.base_url)
+
+    @classmethod
+    def from_dict(cls, environment: dict):
+        """Returns an Environment of a JSON object. The key and key secret can be read from environment variables named
+        by notify_api_key_env and notify_api_key_secret_env instead of notify_api_key and notify_api_key_secret.
+
+        Raises:
+            ValueError if a mandatory attribute or environment variable is missing.
+
+        """
+        try:
+            credentials = {}
+            for name in ('notify_api_key', 'notify_api_key_secret'):
+                if ('{0}_env'.format(name) in environment):
+                    credentials[name] = os.environ[environment['{0}_env'.format(name)]]
+                else:
+                    credentials[name] = environment[name]
+
+            return cls(environment['name'], environment['base_url'], credentials['notify_api_key'], credentials['notify_api_key_secret'],
+                       environment.get('max_workers', 10), environment.get('rate_limit'))
+        except (KeyError, TypeError) as e:
+            raise ValueError('Mandatory environment attribute or variable missing: {0}'.format(e))
+
+class EnvironmentResult:
+    """Result of an operation in a single environment."""
+    OK: str = "OK"
+    FAILED: str = "FAILED"
+    TIMEOUT: str = "TIMEOUT"
+
+    environment: str = None
+    status: str = None
+    result: object = None
+    error: Exception = None
+    duration: float = None
+    future: Future = None
+
+    def __init__(self, environment: str, status: str, result: object = None, error: Exception = None, duration: float = None, future: Future = None):
+        self.environment = environment
+        self.status = status
+        self.result = result
+        self.error = error
+        self.duration = duration
+        self.future = future
+
+    def __repr__(self):
+        return 'EnvironmentResult(environment={0!r}, status={1!r}, duration={2})'.format(self.environment, self.status,
+            round(self.duration, 3) if self.duration != None else None)
+
+class FanOutReport:
+    """Results of an operation fanned out to multiple environments, in environment order."""
+    results: List[EnvironmentResult] = None
+
+    def __init__(self, results: List[EnvironmentResult]):
+        self.results = results
+
+    def __getitem__(self, environment: str):
+        for result in self.results:
+            if (result.environment == environment):
+                return result
+        raise KeyError(environment)
+
+    def __iter__(self):
+        return iter(self.results)
+
+    @property
+    def succeeded(self):
+        return [result for result in self.results if result.status == EnvironmentResult.OK]
+    @property
+    def failed(self):
+        return [result for result in self.results if result.status == EnvironmentResult.FAILED]
+    @property
+    def timed_out(self):
+        return [result for result in self.results if result.status == EnvironmentResult.TIMEOUT]
+    @property
+    def ok(self):
+        return len(self.succeeded) == len(self.results)
+
+    def __repr__(self):
+        return 'FanOutReport(succeeded={0}, failed={1}, timed_out={2})'.format(len(self.succeeded), len(self.failed), len(self.timed_out))
+
+class EnvironmentRegistry:
+    """Registry of ADE Runtime environments running notifier operations in all or selected environments concurrently.
+
+    Each environment has its own thread pool, connection pool and rate limiter, so that a slow or throttled environment does
+    not hold up the others. Operations are submitted to the pools of the environments and their results reported per environment:
+
+        with EnvironmentRegistry(load_environments('environments.json')) as environments:
+            report = environments.add_to_manifest(file_url, source)
+            for result in report.failed:
+                logging.error('{0}: {1}'.format(result.environment, result.error))
+
+    """
+    __lock: threading.Lock = None
+    __environments: Dict[str, Environment] = None
+    __executors: Dict[str, ThreadPoolExecutor] = None
+
+    def __init__(self, environments: Iterable[Environment] = None):
+        """Class constructor.
+
+        Args:
+            environments (iterable[Environment], optional): Environments to add.
+
+        Raises:
+            ValueError if environment names are not unique.
+
+        """
+        self.__lock = threading.Lock()
+        self.__environments = {}
+        self.__executors = {}
+
+        for environment in (environments or []):
+            self.add(environment)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __iter__(self):
+        return iter(list(self.__environments.values()))
+
+    def __len__(self):
+        return len(self.__environments)
+
+    def __getitem__(self, name: str):
+        return self.__environments[name]
+
+    @property
+    def names(self):
+        return list(self.__environments)
+
+    def add(self, environment: Environment):
+        """Adds an environment, setting the connection pool size and rate limits of its base url.
+
+        Raises:
+            ValueError if an environment with the same name exists.
+
+        """
+        with self.__lock:
+            if (environment.name in self.__environments):
+                raise ValueError('Duplicate environment name: {0}'.format(environment.name))
+            self.__environments[environment.name] = environment
+            self.__executors[environment.name] = ThreadPoolExecutor(max_workers=environment.max_workers, thread_name_prefix='adenotifier-{0}'.format(environment.name))
+
+        configure_sessions(pool_maxsize=environment.max_workers, base_url=environment.base_url)
+        if (environment.rate_limit != None):
+            configure_rate_limits(environment.base_url, **environment.rate_limit)
+
+    def remove(self, name: str):
+        """Removes an environment, letting its running operations finish."""
+        with self.__lock:
+            del self.__environments[name]
+            executor = self.__executors.pop(name)
+        executor.shutdown(wait=False)
+
+    def submit(self, function: Callable, *args, environments: List[str] = None, **kwargs):
+        """Submits a function taking base_url, notify_api_key and notify_api_key_secret keyword arguments, e.g. a notifier function,
+        to the thread pools of the environments.
+
+        Arguments are shared by the environments, copy mutable arguments that the function modifies. Do not pass a DedupIndex
+        shared by the environments, a file added in one environment would be dropped as a duplicate in the others.
+
+        Args:
+            function (callable): Function called with the given arguments and the base url and key of each environment.
+            environments (list[str], optional): Names of the environments, by default all.
+
+        Returns:
+            Dict [str, Future] of futures by environment name.
+
+        """
+        with self.__lock:
+            names = environments if environments != None else list(self.__environments)
+            targets = [(self.__environments[name], self.__executors[name]) for name in names]
+
+        def call(environment: Environment):
+            start = time.monotonic()
+            try:
+                return function(*args, base_url=environment.base_url, notify_api_key=environment.notify_api_key, notify_api_key_secret=environment.notify_api_key_secret, **kwargs)
+            finally:
+                logging.info('{0} in environment {1} took {2:.3f} s.'.format(getattr(function, '__name__', 'Operation'), environment.name, time.monotonic() - start))
+
+        return {environment.name: executor.submit(call, environment) for environment, executor in targets}
+
+    def fan_out(self, function: Callable, *args, environments: List[str] = None, timeout: float = None, **kwargs):
+        """Runs a function in the environments concurrently and waits for the results, see submit.
+
+        Args:
+            function (callable): Function called with the given arguments and the base url and key of each environment.
+            environments (list[str], optional): Names of the environments, by default all.
+            timeout (float, optional): Max seconds to wait. Operations still running are reported as TIMEOUT and keep running
+                in the pool of their environment, their futures are in the results.
+
+        Returns:
+            FanOutReport object with an EnvironmentResult per environment.
+
+        """
+        start = time.monotonic()
+        futures = self.submit(function, *args, environments=environments, **kwargs)
+        durations = {}
+
+        def done(name: str):
+            return lambda future: durations.setdefault(name, time.monotonic() - start)
+
+        for name, future in futures.items():
+            future.add_done_callback(done(name))
+
+        wait(futures.values(), timeout=timeout)
+        results = []
+
+        for name, future in futures.items():
+            # Done callbacks run after waiters are woken up, the duration of an operation finished just now may not be set yet.
+            durations.setdefault(name, time.monotonic() - start)
+            if (not future.done()):
+                results.append(EnvironmentResult(name, EnvironmentResult.TIMEOUT, duration=durations[name], future=future))
+            elif (future.exception() != None):
+                results.append(EnvironmentResult(name, EnvironmentResult.FAILED, error=future.exception(), duration=durations[name], future=future))
+            else:
+                results.append(EnvironmentResult(name, EnvironmentResult.OK, result=future.result(), duration=durations[name], future=future))
+
+        for result in results:
+            if (result.status != EnvironmentResult.OK):
+                logging.warning('{0} in environment {1}: {2}{3}'.format(getattr(function, '__name__', 'Operation'), result.environment, result.status,
+                    ':\n{0}'.format(result.error) if result.error != None else ''))
+
+        return FanOutReport(results)
+
+    def add_to_manifest(self, file_url: str, source: object, environments: List[str] = None, timeout: float = None, **kwargs):
+        """Runs notifier.add_to_manifest in the environments, see fan_out. Keyword arguments are passed to add_to_manifest."""
+        return self.fan_out(notifier.add_to_manifest, file_url, source, environments=environments, timeout=timeout, **kwargs)
+
+    def add_multiple_entries_to_manifest(self, entries: List[dict], source: object, environments: List[str] = None, timeout: float = None, **kwargs):
+        """Runs notifier.add_multiple_entries_to_manifest in the environments with a copy of the entries each, see fan_out."""
+        return self.fan_out(_with_entries_copy(notifier.add_multiple_entries_to_manifest), entries, source, environments=environments, timeout=timeout, **kwargs)
+
+    def add_entries_to_manifests(self, entries: List[dict], source: object, environments: List[str] = None, timeout: float = None, **kwargs):
+        """Runs notifier.add_entries_to_manifests in the environments with a copy of the entries each, see fan_out."""
+        return self.fan_out(_with_entries_copy(notifier.add_entries_to_manifests), entries, source, environments=environments, timeout=timeout, **kwargs)
+
+    def notify_manifests(self, source: object, environments: List[str] = None, timeout: float = None, **kwargs):
+        """Runs notifier.notify_manifests in the environments, see fan_out."""
+        return self.fan_out(notifier.notify_manifests, source, environments=environments, timeout=timeout, **kwargs)
+
+    def notify_sources(self, sources: List[object], environments: List[str] = None, timeout: float = None, **kwargs):
+        """Runs notifier.notify_sources in the environments, see fan_out. The result of each environment is a NotifyReport."""
+        return self.fan_out(notifier.notify_sources, sources, environments=environments, timeout=timeout, **kwargs)
+
+    def close(self, wait: bool = True):
+        """Stops the thread pools of the environments.
+
+        Args:
+            wait (bool, optional): Wait for running operations to finish.
+
+        """
+        with self.__lock:
+            executors = list(self.__executors.values())
+        for executor in executors:
+            executor.shutdown(wait=wait)
+
+def _with_entries_copy(function: Callable):
+    """Wraps a notifier function modifying its entries argument in place to work on a copy of the entries."""
+    def call(entries: List[dict], *args, **kwargs):
+        return function([dict(entry) for entry in entries], *args, **kwargs)
+    call.__name__ = function.__name__
+    return call
+
+def load_environments(path: str):
+    """Loads environments from a JSON file containing a list of environment JSON objects, see Environment.from_dict.
+
+    Args:
+        path (str): JSON file path.
+
+    Returns:
+        List [Environment] of environments.
+
+    Raises:
+        ValueError if an environment is not valid.
+
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        environments = json.load(file)
+
+    return [Environment.from_dict(environment) for environment in environments]
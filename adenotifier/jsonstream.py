@@ -0,0 +1,77 @@
+import codecs
+import json
+from typing import List, Set, Dict, Tuple, Optional, Iterable, Iterator
+
+_decoder = json.JSONDecoder()
+_whitespace = ' \t\n\r'
+_delimiters = _whitespace + ',]'
+
+def iter_array(chunks: Iterable[bytes]):
+    """Incrementally decodes a JSON array from chunks of bytes, e.g. requests.Response.iter_content(), yielding its items one at a time.
+
+    Only the item being decoded is kept in memory, so large responses can be processed without loading the whole array.
+
+    Args:
+        chunks (iterable[bytes]): UTF-8 encoded JSON array in chunks of any size.
+
+    Returns:
+        Iterator of decoded array items.
+
+    Raises:
+        ValueError if the data is not a JSON array.
+
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    position = 0
+    expected = '[' # Next token: "[" to start, "item" or "]" after it, "," or "]" after an item, "item" after a comma.
+    exhausted = False
+    chunks = iter(chunks)
+
+    while True:
+        while (position < len(buffer) and buffer[position] in _whitespace):
+            position += 1
+
+        if (position < len(buffer)):
+            character = buffer[position]
+
+            if (expected == '['):
+                if (character != '['):
+                    raise ValueError('Expected a JSON array, got: {0!r}'.format(buffer[position:position + 20]))
+                expected = 'item]'
+                position += 1
+                continue
+
+            if (expected != 'item' and character == ']'):
+                return
+
+            if (expected == ',]'):
+                if (character != ','):
+                    raise ValueError('Expected "," or "]" in JSON array, got: {0!r}'.format(buffer[position:position + 20]))
+                expected = 'item'
+                position += 1
+                continue
+
+            try:
+                item, end = _decoder.raw_decode(buffer, position)
+                # An item not followed by a delimiter may be truncated, e.g. a number split between chunks, unless no more data follows.
+                if (exhausted or (end < len(buffer) and buffer[end] in _delimiters)):
+                    yield item
+                    # The buffer is trimmed when the next chunk is read, not per item, to keep decoding linear in the chunk size.
+                    position = end
+                    expected = ',]'
+                    continue
+            except json.JSONDecodeError:
+                if (exhausted):
+                    raise
+
+        if (exhausted):
+            raise ValueError('Unexpected end of JSON array.')
+
+        chunk = next(chunks, None)
+        if (chunk == None):
+            exhausted = True
+            buffer = buffer[position:] + decoder.decode(b'', final=True)
+        else:
+            buffer = buffer[position:] + decoder.decode(chunk)
+        position = 0
@@ -0,0 +1,377 @@
+import contextlib
+import hashlib
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+from typing import List, Set, Dict, Tuple, Optional
+
+try:
+    import fcntl
+except ImportError: # Not available on Windows, msvcrt is used instead.
+    fcntl = None
+    import msvcrt
+
+class LeaseBackend:
+    """Interface of lease stores used to coordinate workers, modelled after Redis SET NX PX semantics.
+
+    A lease is an exclusive, expiring lock on a key held by an owner. Values are shared by all workers, e.g. the id of
+    the open manifest of a data source. Implement the methods to use other stores, e.g. a database or DynamoDB.
+    """
+
+    def acquire(self, key: str, owner: str, ttl: float):
+        """Acquires the lease of the key for the owner if it is free, expired or already held by the owner. Does not block.
+
+        Args:
+            key (str): Lease key.
+            owner (str): Unique owner id.
+            ttl (float): Lease expiry time in seconds, after which other owners may acquire it, e.g. after a crash.
+
+        Returns:
+            True if the lease was acquired.
+
+        """
+        raise NotImplementedError()
+
+    def release(self, key: str, owner: str):
+        """Releases the lease of the key if it is held by the owner.
+
+        Args:
+            key (str): Lease key.
+            owner (str): Owner id given to acquire().
+
+        """
+        raise NotImplementedError()
+
+    def get(self, key: str):
+        """Returns the shared value of the key or None if not set or expired.
+
+        Args:
+            key (str): Value key.
+
+        """
+        raise NotImplementedError()
+
+    def set(self, key: str, value: str, ttl: float = None):
+        """Sets the shared value of the key.
+
+        Args:
+            key (str): Value key.
+            value (str): Value.
+            ttl (float, optional): Value expiry time in seconds, by default the value does not expire.
+
+        """
+        raise NotImplementedError()
+
+    def delete(self, key: str):
+        """Deletes the shared value of the key.
+
+        Args:
+            key (str): Value key.
+
+        """
+        raise NotImplementedError()
+
+class MemoryLeaseBackend(LeaseBackend):
+    """Lease store for coordinating threads of a single process."""
+    __lock: threading.Lock = None
+    __leases: Dict[str, Tuple[str, float]] = None
+    __values: Dict[str, Tuple[str, float]] = None
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__leases = {}
+        self.__values = {}
+
+    def acquire(self, key: str, owner: str, ttl: float):
+        now = time.time()
+        with self.__lock:
+            lease = self.__leases.get(key)
+            if (lease != None and lease[0] != owner and lease[1] > now):
+                return False
+            self.__leases[key] = (owner, now + ttl)
+            return True
+
+    def release(self, key: str, owner: str):
+        with self.__lock:
+            lease = self.__leases.get(key)
+            if (lease != None and lease[0] == owner):
+                del self.__leases[key]
+
+    def get(self, key: str):
+        with self.__lock:
+            value = self.__values.get(key)
+            if (value == None or (value[1] != None and value[1] <= time.time())):
+                return None
+            return value[0]
+
+    def set(self, key: str, value: str, ttl: float = None):
+        with self.__lock:
+            self.__values[key] = (value, time.time() + ttl if ttl != None else None)
+
+    def delete(self, key: str):
+        with self.__lock:
+            self.__values.pop(key, None)
+
+class FileLeaseBackend(LeaseBackend):
+    """Lease store for coordinating processes on one host with operating system file locks in a directory.
+
+    File locks are released by the operating system when the holding process exits, so leases of crashed workers do not
+    need to expire and ttl is not used. Not suitable for network file systems, use SQLiteLeaseBackend or a shared store instead.
+    """
+    __lock: threading.Lock = None
+    __files: Dict[Tuple[str, str], int] = None
+
+    directory: str = None
+
+    def __init__(self, directory: str):
+        """Class constructor.
+
+        Args:
+            directory (str): Directory of the lock and value files, created if it does not exist.
+
+        """
+        self.directory = directory
+        self.__lock = threading.Lock()
+        self.__files = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def __path(self, key: str, suffix: str):
+        """Returns the file path of the key, hashed as keys may contain characters not allowed in file names."""
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + suffix)
+
+    def acquire(self, key: str, owner: str, ttl: float):
+        with self.__lock:
+            if ((key, owner) in self.__files):
+                return True
+
+            fd = os.open(self.__path(key, '.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if (fcntl != None):
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            except OSError:
+                os.close(fd)
+                return False
+
+            self.__files[(key, owner)] = fd
+            return True
+
+    def release(self, key: str, owner: str):
+        with self.__lock:
+            fd = self.__files.pop((key, owner), None)
+            if (fd != None):
+                if (fcntl == None):
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+                os.close(fd) # Closing the file releases the lock.
+
+    def get(self, key: str):
+        try:
+            with open(self.__path(key, '.value'), 'r', encoding='utf-8') as file:
+                value, expires = file.read().split('\n', 1)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        if (expires != '' and float(expires) <= time.time()):
+            return None
+        return value
+
+    def set(self, key: str, value: str, ttl: float = None):
+        path = self.__path(key, '.value')
+        temp_path = '{0}.{1}.tmp'.format(path, os.urandom(16).hex())
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write('{0}\n{1}'.format(value, time.time() + ttl if ttl != None else ''))
+        os.replace(temp_path, path) # Atomic, readers see either the old or the new value.
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.__path(key, '.value'))
+        except FileNotFoundError:
+            pass
+
+class SQLiteLeaseBackend(LeaseBackend):
+    """Lease store for coordinating processes sharing a SQLite database file, e.g. workers on one host or a shared volume."""
+    __connection: sqlite3.Connection = None
+    __lock: threading.Lock = None
+
+    path: str = None
+
+    def __init__(self, path: str, timeout: float = 30):
+        """Class constructor.
+
+        Args:
+            path (str): SQLite database file path, created if it does not exist.
+            timeout (float, optional): Seconds to wait for other processes to release the database.
+
+        """
+        self.path = path
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.executescript("""
+            CREATE TABLE IF NOT EXISTS leases (
+                key TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS lease_values (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires REAL
+            );
+        """)
+
+    def acquire(self, key: str, owner: str, ttl: float):
+        now = time.time()
+        with self.__lock:
+            cursor = self.__connection.execute("""
+                INSERT INTO leases (key, owner, expires) VALUES (?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires
+                WHERE leases.expires <= ? OR leases.owner = excluded.owner
+            """, (key, owner, now + ttl, now))
+            return cursor.rowcount > 0
+
+    def release(self, key: str, owner: str):
+        with self.__lock:
+            self.__connection.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def get(self, key: str):
+        with self.__lock:
+            row = self.__connection.execute("SELECT value FROM lease_values WHERE key = ? AND (expires IS NULL OR expires > ?)", (key, time.time())).fetchone()
+        return row[0] if row != None else None
+
+    def set(self, key: str, value: str, ttl: float = None):
+        with self.__lock:
+            self.__connection.execute("INSERT OR REPLACE INTO lease_values (key, value, expires) VALUES (?, ?, ?)", (key, value, time.time() + ttl if ttl != None else None))
+
+    def delete(self, key: str):
+        with self.__lock:
+            self.__connection.execute("DELETE FROM lease_values WHERE key = ?", (key,))
+
+    def close(self):
+        """Closes the database connection."""
+        with self.__lock:
+            self.__connection.close()
+
+class RedisLeaseBackend(LeaseBackend):
+    """Lease store for coordinating workers on any number of hosts, e.g. Lambda or Azure Functions instances, with Redis.
+
+    Takes a redis-py compatible client, e.g. redis.Redis.from_url(url), which is not a dependency of this package.
+    """
+    # Deletes the lease only if it is held by the owner.
+    RELEASE_SCRIPT: str = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+    # Sets the lease if it is free or extends it if it is held by the owner.
+    ACQUIRE_SCRIPT: str = "local owner = redis.call('get', KEYS[1]) if owner == false or owner == ARGV[1] then redis.call('set', KEYS[1], ARGV[1], 'PX', ARGV[2]) return 1 else return 0 end"
+
+    client: object = None
+    prefix: str = None
+
+    def __init__(self, client: object, prefix: str = "adenotifier:"):
+        """Class constructor.
+
+        Args:
+            client (object): redis-py compatible client.
+            prefix (str, optional): Key prefix.
+
+        """
+        self.client = client
+        self.prefix = prefix
+
+    def acquire(self, key: str, owner: str, ttl: float):
+        return self.client.eval(self.ACQUIRE_SCRIPT, 1, self.prefix + 'lease:' + key, owner, int(ttl * 1000)) == 1
+
+    def release(self, key: str, owner: str):
+        self.client.eval(self.RELEASE_SCRIPT, 1, self.prefix + 'lease:' + key, owner)
+
+    def get(self, key: str):
+        value = self.client.get(self.prefix + 'value:' + key)
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+    def set(self, key: str, value: str, ttl: float = None):
+        self.client.set(self.prefix + 'value:' + key, value, px=int(ttl * 1000) if ttl != None else None)
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + 'value:' + key)
+
+class ManifestLease:
+    """Coordinates open manifests of data sources between workers with a lease backend.
+
+    Only the worker holding the lease of a data source searches, creates or replaces its open manifest, and records the
+    manifest id in the backend. Other workers add entries to the recorded manifest without searching, so that parallel
+    workers share one open manifest per data source instead of each creating their own.
+    """
+    owner: str = None
+    backend: LeaseBackend = None
+    ttl: float = None
+    timeout: float = None
+    poll_interval: float = None
+    manifest_ttl: float = None
+
+    def __init__(self, backend: LeaseBackend, ttl: float = 30, timeout: float = 60, poll_interval: float = 0.05, manifest_ttl: float = None, owner: str = None):
+        """Class constructor.
+
+        Args:
+            backend (LeaseBackend): Lease store, e.g. SQLiteLeaseBackend or RedisLeaseBackend.
+            ttl (float, optional): Lease expiry time in seconds. Must exceed the time of a few ADE Notify API calls.
+            timeout (float, optional): Max time in seconds to wait for a lease.
+            poll_interval (float, optional): Initial interval in seconds of polling a lease held by another worker.
+            manifest_ttl (float, optional): Expiry time in seconds of recorded manifest ids, by default they do not expire.
+            owner (str, optional): Unique owner id of this worker, generated by default.
+
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.manifest_ttl = manifest_ttl
+        self.owner = owner if owner != None else '{0}:{1}:{2}'.format(socket.gethostname(), os.getpid(), os.urandom(16).hex())
+
+    @staticmethod
+    def key(base_url: str, source_system_name: str, source_entity_name: str):
+        """Returns the lease key of a source entity."""
+        return '{0}|{1}|{2}'.format(base_url, source_system_name, source_entity_name)
+
+    @contextlib.contextmanager
+    def hold(self, base_url: str, source_system_name: str, source_entity_name: str):
+        """Context manager holding the lease of a source entity, waiting for it if held by another worker.
+
+        Args:
+            base_url (str): ADE Notify API base url.
+            source_system_name (str): Source system name.
+            source_entity_name (str): Source entity name.
+
+        Raises:
+            TimeoutError if the lease is not acquired within timeout.
+
+        """
+        key = self.key(base_url, source_system_name, source_entity_name)
+        # Lease is owned per thread, as threads of a worker must not enter the section at the same time either.
+        owner = '{0}:{1}'.format(self.owner, threading.get_ident())
+        deadline = time.monotonic() + self.timeout
+        interval = self.poll_interval
+
+        while (not self.backend.acquire(key, owner, self.ttl)):
+            if (time.monotonic() >= deadline):
+                raise TimeoutError('Lease {0} not acquired in {1} seconds.'.format(key, self.timeout))
+            time.sleep(random.uniform(interval / 2, interval))
+            interval = min(interval * 2, 1)
+
+        try:
+            yield
+        finally:
+            self.backend.release(key, owner)
+
+    def get_manifest(self, base_url: str, source_system_name: str, source_entity_name: str):
+        """Returns the recorded open manifest id of a source entity or None."""
+        return self.backend.get(self.key(base_url, source_system_name, source_entity_name))
+
+    def set_manifest(self, base_url: str, source_system_name: str, source_entity_name: str, manifest_id: str):
+        """Records the open manifest id of a source entity, call while holding the lease."""
+        self.backend.set(self.key(base_url, source_system_name, source_entity_name), manifest_id, self.manifest_ttl)
+
+    def clear_manifest(self, base_url: str, source_system_name: str, source_entity_name: str):
+        """Removes the recorded open manifest id of a source entity, call while holding the lease."""
+        self.backend.delete(self.key(base_url, source_system_name, source_entity_name))
@@ -1,19 +1,25 @@
-import requests
 import json
-from requests.adapters import HTTPAdapter
-from urllib3.util import Retry
-from typing import List, Set, Dict, Tuple, Optional
+from .entries import EntryList, count_entries, diff_entries
+from .session import get_session, send
+from typing import List, Set, Dict, Tuple, Optional, TYPE_CHECKING
+
+if (TYPE_CHECKING):
+    import requests
 
 class Manifest:
     """Manages source data file manifests with ADE Notify API."""
     __base_url: str = None
     __created: str = None
+    __etag: str = None # Validators of the last fetched manifest for conditional requests.
+    __last_modified: str = None
     __format: str = None
     __id: str = None
-    __latest_response: requests.Response = None
-    __manifest_entries: object = None
+    __latest_response: 'requests.Response' = None
+    __manifest_entries: EntryList = None
+    __manifest_entry_dicts: Tuple[EntryList, List[dict]] = None # EntryList and the entry dicts of manifest_entries decoded from it.
+    __known_entries: EntryList = None # Server entries as last fetched, created or synced, None when changed otherwise.
     __modified: str = None
-    __session: requests.Session = None
+    __session: 'requests.Session' = None
     __source_entity_name: str = None
     __source_system_name: str = None
     __state: str = None
@@ -25,7 +31,7 @@ class Manifest:
     fullscanned: bool = None
     skiph: int = None
 
-    def __init__(self, base_url: str, source_system_name: str, source_entity_name: str, format: str, notify_api_key: str, notify_api_key_secret: str):
+    def __init__(self, base_url: str, source_system_name: str, source_entity_name: str, format: str, notify_api_key: str, notify_api_key_secret: str, id: str = None):
         """Class constructor.
 
         Args:
@@ -35,24 +41,25 @@ class Manifest:
             format (str): Source file format.
             notify_api_key (str): ADE Notify API key.
             notify_api_key_secret (str): ADE Notify API key secret.
+            id (str, optional): Id of an existing manifest. Attribute values are not fetched, use fetch_manifest() if needed.
 
         """
         self.__base_url = base_url
+        self.__id = id
         self.__source_system_name = source_system_name
         self.__source_entity_name = source_entity_name
         self.__format = format
-        self.__session = requests.Session()
-        self.__session.auth = (notify_api_key, notify_api_key_secret)
-        self.__session.headers.update({"Content-Type": "application/json"})
-        self.__session.mount('https://', HTTPAdapter(max_retries=Retry(total=3, status_forcelist=[401, 404, 429, 500, 502, 503, 504], backoff_factor=2, allowed_methods=None, raise_on_status=True))) # HTTP request retry settings.
+        self.__session = get_session(base_url, notify_api_key, notify_api_key_secret) # Pooled session shared by all Manifest objects with the same base url and key.
 
-    def __api_caller(self, http_method: str, request_url: str, request_body: str = None):
+    def __api_caller(self, http_method: str, request_url: str, request_body: str = None, endpoint: str = None, headers: dict = None):
         """Handles ADE Notify API calls.
 
         Args:
             http_method (str): Supported values: "get", "post" or "put".
             request_url (str): Request url.
             request_body (str, optional): Request body, if expected by ADE Notify API.
+            endpoint (str, optional): Endpoint name selecting the retry policy, see configure_sessions.
+            headers (dict, optional): Additional request headers.
         
         Returns:
             requests.Response object.
@@ -64,12 +71,7 @@ class Manifest:
         response = None
         
         try:
-            if (http_method == "get"):
-                response = self.__session.get(request_url, data=json.dumps(request_body))
-            elif (http_method == "post"):
-                response = self.__session.post(request_url, data=json.dumps(request_body))
-            elif (http_method == "put"):
-                response = self.__session.put(request_url, data=json.dumps(request_body))
+            response = send(self.__session, self.__base_url, http_method, request_url, data=json.dumps(request_body), endpoint=endpoint, headers=headers)
             response.raise_for_status()
         except Exception as e:
             self.__latest_response = response
@@ -78,13 +80,36 @@ class Manifest:
         self.__latest_response = response
         return response
 
-    def __refresh_manifest(self):
-        """Gets manifest from ADE Notify API, updates object attribute values."""
+    def __refresh_manifest(self, conditional: bool = False):
+        """Gets manifest from ADE Notify API, updates object attribute values.
+
+        Args:
+            conditional (bool, optional): Send the validators of the last fetch, so that an unchanged manifest is not sent again.
+
+        Returns:
+            False if the manifest was not modified since the last fetch, otherwise True.
+
+        """
         request_url = "{0}/tenants/local/installations/local/environments/local/source-systems/{1}/source-entities/{2}/manifests/{3}"\
             .format(self.__base_url, self.__source_system_name, self.__source_entity_name, self.__id)
 
-        response = self.__api_caller("get", request_url)
-        response_body = response.json()
+        headers = {}
+        if (conditional and self.__etag != None):
+            headers['If-None-Match'] = self.__etag
+        if (conditional and self.__last_modified != None):
+            headers['If-Modified-Since'] = self.__last_modified
+
+        response = self.__api_caller("get", request_url, endpoint="fetch_manifest", headers=headers)
+        if (response.status_code == 304):
+            return False
+
+        self.__etag = response.headers.get('ETag')
+        self.__last_modified = response.headers.get('Last-Modified')
+        self.__set_attributes(response.json())
+        return True
+
+    def __set_attributes(self, response_body: dict):
+        """Sets object attribute values from a manifest JSON object."""
         self.batch = response_body['batch']
         self.columns = response_body['columns']
         self.compression = response_body['compression']
@@ -102,8 +127,9 @@ class Manifest:
         request_url = "{0}/tenants/local/installations/local/environments/local/source-systems/{1}/source-entities/{2}/manifests/{3}/entries"\
             .format(self.__base_url, self.__source_system_name, self.__source_entity_name, self.__id)
 
-        response = self.__api_caller("get", request_url)
-        self.__manifest_entries = response.json()
+        response = self.__api_caller("get", request_url, endpoint="fetch_manifest_entries")
+        self.__manifest_entries = EntryList.from_json(response.content) # Decoded lazily on first access.
+        self.__known_entries = self.__manifest_entries
 
     """Getters for private attributes."""
     @property
@@ -123,6 +149,14 @@ class Manifest:
         return self.__latest_response
     @property
     def manifest_entries(self):
+        # List of entry dicts decoded from entry_list on first access.
+        if (self.__manifest_entries == None):
+            return None
+        if (self.__manifest_entry_dicts == None or self.__manifest_entry_dicts[0] is not self.__manifest_entries):
+            self.__manifest_entry_dicts = (self.__manifest_entries, self.__manifest_entries.to_list())
+        return self.__manifest_entry_dicts[1]
+    @property
+    def entry_list(self):
         return self.__manifest_entries
     @property
     def modified(self):
@@ -159,19 +193,9 @@ class Manifest:
         if self.skiph != None:
             request_body['skiph'] = self.skiph
 
-        response = self.__api_caller("post", request_url, request_body)
-        response_body = response.json()
-        self.batch = response_body['batch']
-        self.columns = response_body['columns']
-        self.compression = response_body['compression']
-        self.__created = response_body['created']
-        self.delim = response_body['delim']
-        self.__format = response_body['format']
-        self.fullscanned = response_body['fullscanned']
-        self.__id = response_body['id']
-        self.__modified = response_body['modified']
-        self.skiph = response_body['skiph']
-        self.__state = response_body['state']
+        response = self.__api_caller("post", request_url, request_body, endpoint="create")
+        self.__set_attributes(response.json())
+        self.__known_entries = EntryList()
 
     def fetch_manifest(self, id: str = None):
         """Calls __refresh_manifest().
@@ -191,6 +215,32 @@ class Manifest:
         else:
             raise ValueError("Manifest id = None. Create or get manifest before notifying.")
 
+    def fetch_manifest_if_modified(self):
+        """Fetches the manifest with a conditional request using the ETag and Last-Modified of the previous fetch, where supported
+        by ADE Notify API, so that polling an unchanged manifest does not download it again.
+
+        Returns:
+            True if the manifest was fetched for the first time or its modified timestamp changed, otherwise False.
+
+        Raises:
+            ValueError if manifest id is not set.
+
+        """
+        if (self.__id == None):
+            raise ValueError("Manifest id = None. Create or get manifest before fetching.")
+
+        modified = self.__modified
+        return self.__refresh_manifest(conditional=modified != None) and (modified == None or self.__modified != modified)
+
+    def load_manifest(self, manifest: dict):
+        """Sets object attribute values from a manifest JSON object without calling ADE Notify API, e.g. from a search_manifests result.
+
+        Args:
+            manifest (dict): Manifest JSON object as returned by ADE Notify API.
+
+        """
+        self.__set_attributes(manifest)
+
     def fetch_manifest_entries(self):
         """Calls __refresh_manifest_entries().
 
@@ -203,6 +253,25 @@ class Manifest:
         else:
             raise ValueError("Manifest id = None. Create or get manifest before notifying.")
 
+    def count_manifest_entries(self):
+        """Gets the number of manifest entries from Notify API without decoding or storing the entries.
+
+        Returns:
+            Int number of entries.
+
+        Raises:
+            ValueError if manifest id is not set.
+
+        """
+        if (self.__id == None):
+            raise ValueError("Manifest id = None. Create or get manifest before counting entries.")
+
+        request_url = "{0}/tenants/local/installations/local/environments/local/source-systems/{1}/source-entities/{2}/manifests/{3}/entries"\
+            .format(self.__base_url, self.__source_system_name, self.__source_entity_name, self.__id)
+
+        response = self.__api_caller("get", request_url, endpoint="fetch_manifest_entries")
+        return count_entries(response.content)
+
     def notify(self, id: str = None):
         """Notifies manifest in Notify API.
 
@@ -220,7 +289,7 @@ class Manifest:
         if (self.__id != None):
             request_url = "{0}/tenants/local/installations/local/environments/local/source-systems/{1}/source-entities/{2}/manifests/{3}/notify"\
                 .format(self.__base_url, self.__source_system_name, self.__source_entity_name, self.__id)
-            self.__api_caller("post", request_url)
+            self.__api_caller("post", request_url, endpoint="notify")
             #self.__refresh_manifest ## Disabled by default to reduce API calls, use fetch_manifest().
         else:
             raise ValueError("Manifest id = None. Create or get manifest before notifying.")
@@ -249,7 +318,8 @@ class Manifest:
         if (content_length != None):
             request_body['contentLength'] = content_length
 
-        self.__api_caller("post", request_url, request_body)
+        self.__known_entries = None
+        self.__api_caller("post", request_url, request_body, endpoint="add_entry")
         #self.__refresh_manifest_entries ## Disabled by default to reduce API calls, use fetch_manifest_entries().
 
     def add_entries(self, entries: List[dict]):
@@ -265,5 +335,48 @@ class Manifest:
         request_url = "{0}/tenants/local/installations/local/environments/local/source-systems/{1}/source-entities/{2}/manifests/{3}/entries"\
             .format(self.__base_url, self.__source_system_name, self.__source_entity_name, self.__id)
         
-        self.__api_caller("put", request_url, entries)
+        self.__known_entries = None
+        self.__api_caller("put", request_url, entries, endpoint="add_entries")
         #self.__refresh_manifest_entries ## Disabled by default to reduce API calls, use fetch_manifest_entries().
+
+    def sync_entries(self, entries: List[dict], replace: bool = False, refresh: bool = False, max_posts: int = 100, request_cost: int = 4096):
+        """Brings the manifest entries in Notify API to the given entries with the fewest bytes sent, see diff_entries.
+
+        The given entries are compared to the entries last fetched, created or synced by this object, which are fetched if not known.
+        Added entries are appended with single POSTs if cheaper (see EntryDiff.plan), otherwise all entries are sent with one PUT.
+        Syncing the same entries again makes no API calls.
+
+        Args:
+            entries (list[dict]): Desired manifest entry dictionaries.
+            replace (bool, optional): Remove entries missing from the given entries. By default entries are only added or changed.
+            refresh (bool, optional): Fetch the current entries even if known.
+            max_posts (int, optional): Max number of POST requests, more added entries are sent with a PUT.
+            request_cost (int, optional): Cost of a request in request body bytes used to choose between POSTs and a PUT.
+
+        Returns:
+            EntryDiff object with the added, changed and removed entries and the method used ("post", "put" or None).
+
+        """
+        if (self.__id == None):
+            self.create()
+
+        if (self.__known_entries == None or refresh):
+            self.__refresh_manifest_entries()
+
+        diff = diff_entries(self.__known_entries, entries, replace)
+        diff.method = diff.plan(max_posts, request_cost)
+
+        request_url = "{0}/tenants/local/installations/local/environments/local/source-systems/{1}/source-entities/{2}/manifests/{3}/entries"\
+            .format(self.__base_url, self.__source_system_name, self.__source_entity_name, self.__id)
+
+        # Entries are refetched on the next sync if a request fails, as some POSTs may have succeeded.
+        self.__known_entries = None
+
+        if (diff.method == 'post'):
+            for entry in diff.added:
+                self.__api_caller("post", request_url, entry, endpoint="add_entry")
+        elif (diff.method == 'put'):
+            self.__api_caller("put", request_url, diff.entries, endpoint="add_entries")
+
+        self.__manifest_entries = self.__known_entries = EntryList(diff.entries)
+        return diff
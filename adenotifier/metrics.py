@@ -0,0 +1,364 @@
+import bisect
+import contextlib
+import functools
+import inspect
+import logging
+import threading
+import time
+from typing import List, Set, Dict, Tuple, Optional, Callable
+
+DEFAULT_BUCKETS: List[float] = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+# ADE Notify API endpoint templates by endpoint name, used as a low-cardinality label instead of request urls.
+ENDPOINT_TEMPLATES: Dict[str, str] = {
+    'search_manifests': '/source-systems/{system}/source-entities/{entity}/manifests',
+    'create': '/source-systems/{system}/source-entities/{entity}/manifests',
+    'fetch_manifest': '/source-systems/{system}/source-entities/{entity}/manifests/{id}',
+    'fetch_manifest_entries': '/source-systems/{system}/source-entities/{entity}/manifests/{id}/entries',
+    'notify': '/source-systems/{system}/source-entities/{entity}/manifests/{id}/notify',
+    'add_entry': '/source-systems/{system}/source-entities/{entity}/manifests/{id}/entries',
+    'add_entries': '/source-systems/{system}/source-entities/{entity}/manifests/{id}/entries'
+}
+
+class ApiCall:
+    """Measurements of a single ADE Notify API call, including its retries, passed to metrics hooks."""
+    endpoint: str = None
+    method: str = None
+    status: int = None
+    retries: int = None
+    latency: float = None
+    request_bytes: int = None
+    response_bytes: int = None
+    error: Exception = None
+
+    def __init__(self, endpoint: str, method: str, status: int, retries: int, latency: float, request_bytes: int, response_bytes: int, error: Exception = None):
+        self.endpoint = endpoint
+        self.method = method
+        self.status = status
+        self.retries = retries
+        self.latency = latency
+        self.request_bytes = request_bytes
+        self.response_bytes = response_bytes
+        self.error = error
+
+    @property
+    def template(self):
+        return ENDPOINT_TEMPLATES.get(self.endpoint)
+
+    def __repr__(self):
+        return 'ApiCall(endpoint={0!r}, method={1!r}, status={2!r}, retries={3!r}, latency={4:.3f})'.format(self.endpoint, self.method, self.status, self.retries, self.latency)
+
+class Histogram:
+    """Cumulative histogram with fixed bucket upper bounds."""
+    buckets: List[float] = None
+    counts: List[int] = None
+    count: int = None
+    sum: float = None
+
+    def __init__(self, buckets: List[float] = DEFAULT_BUCKETS):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """Adds a value to the histogram, expects the registry lock to be held by the caller."""
+        index = bisect.bisect_left(self.buckets, value)
+        if (index < len(self.counts)):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float):
+        """Returns an estimate of the given quantile, i.e. the upper bound of the bucket containing it.
+
+        Args:
+            q (float): Quantile between 0 and 1, e.g. 0.99.
+
+        Returns:
+            Float upper bound in seconds, None if the histogram is empty and inf if the quantile is above the largest bucket.
+
+        """
+        if (self.count == 0):
+            return None
+
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if (cumulative >= rank):
+                return bound
+
+        return float('inf')
+
+class MetricsRegistry:
+    """Thread-safe in-process registry of counters and histograms by metric name and labels.
+
+    Metrics recorded by default:
+        adenotifier_api_requests_total (endpoint, method, status): ADE Notify API calls, retries not counted separately.
+        adenotifier_api_request_duration_seconds (endpoint, method): Call latency including retries and backoff.
+        adenotifier_api_retries_total (endpoint, method): Retried requests.
+        adenotifier_api_request_bytes_total (endpoint, method): Request payload bytes.
+        adenotifier_api_response_bytes_total (endpoint, method): Response payload bytes, if known.
+        adenotifier_operation_duration_seconds (operation, outcome): Notifier-level operations, e.g. add_to_manifest.
+    """
+    __lock: threading.Lock = None
+    __counters: Dict[Tuple[str, tuple], float] = None
+    __histograms: Dict[Tuple[str, tuple], Histogram] = None
+
+    buckets: List[float] = None
+
+    def __init__(self, buckets: List[float] = DEFAULT_BUCKETS):
+        """Class constructor.
+
+        Args:
+            buckets (list[float], optional): Histogram bucket upper bounds in seconds.
+
+        """
+        self.buckets = list(buckets)
+        self.__lock = threading.Lock()
+        self.__counters = {}
+        self.__histograms = {}
+
+    def inc(self, name: str, labels: Dict[str, str] = None, value: float = 1):
+        """Increments a counter.
+
+        Args:
+            name (str): Metric name.
+            labels (dict, optional): Label names and values.
+            value (float, optional): Increment.
+
+        """
+        key = (name, tuple(sorted(labels.items())) if labels else ())
+        with self.__lock:
+            self.__counters[key] = self.__counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: Dict[str, str] = None):
+        """Adds a value to a histogram.
+
+        Args:
+            name (str): Metric name.
+            value (float): Observed value, e.g. latency in seconds.
+            labels (dict, optional): Label names and values.
+
+        """
+        key = (name, tuple(sorted(labels.items())) if labels else ())
+        with self.__lock:
+            histogram = self.__histograms.get(key)
+            if (histogram == None):
+                histogram = Histogram(self.buckets)
+                self.__histograms[key] = histogram
+            histogram.observe(value)
+
+    def counter(self, name: str, labels: Dict[str, str] = None):
+        """Returns the value of a counter, 0 if not recorded."""
+        return self.__counters.get((name, tuple(sorted(labels.items())) if labels else ()), 0)
+
+    def histogram(self, name: str, labels: Dict[str, str] = None):
+        """Returns a histogram, None if not recorded."""
+        return self.__histograms.get((name, tuple(sorted(labels.items())) if labels else ()))
+
+    def record_call(self, call: ApiCall):
+        """Metrics hook recording an ADE Notify API call, see add_hook.
+
+        Args:
+            call (ApiCall): Call measurements.
+
+        """
+        labels = {'endpoint': call.endpoint or '', 'method': call.method}
+        self.inc('adenotifier_api_requests_total', dict(labels, status=str(call.status) if call.status != None else 'error'))
+        self.observe('adenotifier_api_request_duration_seconds', call.latency, labels)
+        if (call.retries > 0):
+            self.inc('adenotifier_api_retries_total', labels, call.retries)
+        if (call.request_bytes):
+            self.inc('adenotifier_api_request_bytes_total', labels, call.request_bytes)
+        if (call.response_bytes):
+            self.inc('adenotifier_api_response_bytes_total', labels, call.response_bytes)
+
+    def clear(self):
+        """Removes all recorded metrics."""
+        with self.__lock:
+            self.__counters.clear()
+            self.__histograms.clear()
+
+    def to_prometheus(self):
+        """Returns recorded metrics in Prometheus text exposition format.
+
+        Returns:
+            Str metrics.
+
+        """
+        lines = []
+
+        with self.__lock:
+            counters = sorted(self.__counters.items())
+            histograms = sorted((key, (list(h.counts), h.count, h.sum)) for key, h in self.__histograms.items())
+
+        name = None
+        for (metric, labels), value in counters:
+            if (metric != name):
+                lines.append('# TYPE {0} counter'.format(metric))
+                name = metric
+            lines.append('{0}{1} {2}'.format(metric, _format_labels(labels), _format_value(value)))
+
+        name = None
+        for (metric, labels), (counts, count, total) in histograms:
+            if (metric != name):
+                lines.append('# TYPE {0} histogram'.format(metric))
+                name = metric
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append('{0}_bucket{1} {2}'.format(metric, _format_labels(labels + (('le', _format_value(bound)),)), cumulative))
+            lines.append('{0}_bucket{1} {2}'.format(metric, _format_labels(labels + (('le', '+Inf'),)), count))
+            lines.append('{0}_sum{1} {2}'.format(metric, _format_labels(labels), _format_value(total)))
+            lines.append('{0}_count{1} {2}'.format(metric, _format_labels(labels), count))
+
+        return '\n'.join(lines) + '\n'
+
+REGISTRY: MetricsRegistry = MetricsRegistry() # Default registry, recording all ADE Notify API calls.
+
+_hooks: List[Callable[[ApiCall], None]] = [REGISTRY.record_call]
+_settings: dict = {
+    'tracer': None
+}
+
+def add_hook(hook: Callable[[ApiCall], None]):
+    """Adds a metrics hook called with an ApiCall after each ADE Notify API call, e.g. to forward metrics to StatsD or CloudWatch.
+
+    Hooks are called in the calling thread and should not block. Exceptions raised by hooks are logged and ignored.
+
+    Args:
+        hook (callable): Function taking an ApiCall.
+
+    """
+    global _hooks
+    _hooks = _hooks + [hook]
+
+def remove_hook(hook: Callable[[ApiCall], None]):
+    """Removes a metrics hook, e.g. REGISTRY.record_call to disable the default registry.
+
+    Args:
+        hook (callable): Function added with add_hook.
+
+    """
+    global _hooks
+    _hooks = [h for h in _hooks if h != hook]
+
+def enable_tracing(tracer_provider: object = None):
+    """Enables OpenTelemetry spans around notifier-level operations and ADE Notify API calls.
+
+    Args:
+        tracer_provider (opentelemetry.trace.TracerProvider, optional): Tracer provider, by default the globally configured one.
+
+    Raises:
+        ImportError if opentelemetry-api is not installed.
+
+    """
+    # Imported here, so that importing the package does not pay for OpenTelemetry unless tracing is enabled.
+    try:
+        from opentelemetry import trace
+    except ImportError: # OpenTelemetry is an optional dependency, install with: pip install adenotifier[otel]
+        raise ImportError("Tracing requires opentelemetry-api, install with: pip install adenotifier[otel]")
+
+    _settings['tracer'] = trace.get_tracer('adenotifier', tracer_provider=tracer_provider)
+
+def disable_tracing():
+    """Disables OpenTelemetry spans."""
+    _settings['tracer'] = None
+
+def record_call(call: ApiCall):
+    """Passes ADE Notify API call measurements to all metrics hooks.
+
+    Args:
+        call (ApiCall): Call measurements.
+
+    """
+    for hook in _hooks:
+        try:
+            hook(call)
+        except Exception as e:
+            logging.warning('Metrics hook failed: {0}'.format(e))
+
+    tracer = _settings['tracer']
+    if (tracer != None):
+        # The call has already completed, so the span is recorded with its measured start and end times.
+        end = time.time_ns()
+        span = tracer.start_span('adenotifier.api.{0}'.format(call.endpoint), start_time=end - int(call.latency * 1e9), attributes={
+            'http.request.method': call.method.upper(),
+            'http.response.status_code': call.status if call.status != None else 0,
+            'http.route': call.template or '',
+            'adenotifier.retries': call.retries
+        })
+        span.end(end_time=end)
+
+@contextlib.contextmanager
+def operation(name: str, **attributes):
+    """Measures a notifier-level operation, e.g. add_to_manifest, and wraps it in an OpenTelemetry span if tracing is enabled.
+
+    Args:
+        name (str): Operation name.
+        attributes: Span attributes, e.g. source_id.
+
+    """
+    tracer = _settings['tracer']
+    outcome = 'error'
+    start = time.monotonic()
+
+    try:
+        if (tracer != None):
+            with tracer.start_as_current_span('adenotifier.{0}'.format(name), attributes={'adenotifier.{0}'.format(key): value for key, value in attributes.items() if value != None}):
+                yield
+        else:
+            yield
+        outcome = 'ok'
+    finally:
+        REGISTRY.observe('adenotifier_operation_duration_seconds', time.monotonic() - start, {'operation': name, 'outcome': outcome})
+
+def measured(name: str):
+    """Decorator measuring calls of a notifier-level function with operation(), with the id of its source argument as a span attribute.
+
+    Args:
+        name (str): Operation name.
+
+    """
+    def decorator(function):
+        # Position of the source argument is resolved once, binding the signature on every call is too slow for hot paths.
+        parameters = list(inspect.signature(function).parameters)
+        index = parameters.index('source') if 'source' in parameters else None
+
+        def attributes(args, kwargs):
+            if (_settings['tracer'] == None or index == None):
+                # Attributes are used by spans only.
+                return {}
+            source = args[index] if index < len(args) else kwargs.get('source')
+            return {'source_id': getattr(source, 'id', None) or (source.get('id') if isinstance(source, dict) else None)}
+
+        if (inspect.iscoroutinefunction(function)):
+            @functools.wraps(function)
+            async def wrapper(*args, **kwargs):
+                with operation(name, **attributes(args, kwargs)):
+                    return await function(*args, **kwargs)
+        else:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with operation(name, **attributes(args, kwargs)):
+                    return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+def _format_labels(labels: tuple):
+    """Returns Prometheus labels of the given (name, value) tuples."""
+    if (labels == ()):
+        return ''
+    return '{' + ','.join('{0}="{1}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for name, value in labels) + '}'
+
+def _format_value(value: float):
+    """Returns a Prometheus sample value."""
+    if (value == float('inf')):
+        return '+Inf'
+    if (float(value).is_integer()):
+        return str(int(value))
+    return repr(float(value))
@@ -1,47 +1,122 @@
-import requests
+import json
 import logging
 import re
-from requests.adapters import HTTPAdapter
-from urllib3.util import Retry
+from concurrent.futures import ThreadPoolExecutor, wait
+from .cache import ManifestStateCache, ResponseCache
+from .config import SourceConfig
+from .dedup import DedupIndex
+from .enrich import ContentLengthEnricher
+from .jsonstream import iter_array
+from .lease import ManifestLease
 from .manifest import Manifest
-from typing import List, Set, Dict, Tuple, Optional
+from .metrics import measured
+from .session import get_session, send, send_conditional
+from typing import List, Set, Dict, Tuple, Optional, Pattern, Iterable
 
-def search_manifests(source_system_name: str, source_entity_name: str, base_url: str, notify_api_key: str, notify_api_key_secret: str, state: str):
-    """Searches manifests from ADE Notify API.
+def iter_manifests(source_system_name: str, source_entity_name: str, base_url: str, notify_api_key: str, notify_api_key_secret: str, state: str = "", created_after: str = None, created_before: str = None, limit: int = None, params: dict = None, chunk_size: int = 65536, cache: ResponseCache = None):
+    """Searches manifests from ADE Notify API, yielding them one at a time as the response is read.
+
+    The response is streamed and decoded incrementally, so the full manifest list is not loaded into memory.
+    Manifests are yielded in the order returned by ADE Notify API, use search_manifests for a list ordered by created time.
 
     Args:
         source_system_name (str): Source system name defined in ADE source entity.
         source_entity_name (str): ADE source entity name.
-        state (str): Manifest state, supported values: "OPEN", "NOTIFIED", "FAILED", "ARCHIVED".
         base_url (str): ADE Notify API base url, e.g. https://external-api.{environment}.datahub.{tenant}.saas.agiledataengine.com:443/notify-api.
         notify_api_key (str): ADE Notify API key.
         notify_api_key_secret (str): ADE Notify API key secret.
+        state (str, optional): Manifest state filtered by ADE Notify API, supported values: "OPEN", "NOTIFIED", "FAILED", "ARCHIVED". Empty for all states.
+        created_after (str, optional): Only yield manifests created after the given ISO 8601 timestamp.
+        created_before (str, optional): Only yield manifests created before the given ISO 8601 timestamp.
+        limit (int, optional): Max number of manifests to yield. The response is closed without reading the rest when reached.
+        params (dict, optional): Additional query parameters passed to ADE Notify API, e.g. paging parameters where supported.
+        chunk_size (int, optional): Response chunk size in bytes.
+        cache (ResponseCache, optional): Send a conditional request and decode the cached response if the result has not changed,
+            where supported by ADE Notify API. The response is read fully instead of streamed.
 
     Returns:
-        List [str] of manifest ids.
+        Iterator of manifest dictionaries.
 
     """
-    
-    session = requests.Session()
-    session.auth = (notify_api_key, notify_api_key_secret)
-    session.headers.update({"Content-Type": "application/json"})
-    session.mount('https://', HTTPAdapter(max_retries=Retry(total=3, status_forcelist=[401, 404, 429, 500, 502, 503, 504], backoff_factor=2, allowed_methods=None, raise_on_status=True))) # HTTP request retry settings.
+    session = get_session(base_url, notify_api_key, notify_api_key_secret)
     request_url = "{0}/tenants/local/installations/local/environments/local/source-systems/{1}/source-entities/{2}/manifests"\
             .format(base_url, source_system_name, source_entity_name)
 
+    query = dict(params) if params != None else {}
     if state != "":
-        response = session.get(request_url + "?state={0}".format(state.upper()))
-    else:
-        response = session.get(request_url)
-    response.raise_for_status()
+        query['state'] = state.upper()
 
-    if response.status_code == 200:
-        manifests = response.json()
-        if manifests != []:
-            # Ordering manifests by created time
-            manifests = (sorted(manifests, key = lambda i: i['created']))
+    if (limit != None and limit <= 0):
+        return
 
-    return manifests
+    if (cache != None):
+        content, modified = send_conditional(session, base_url, request_url, cache, params=query, endpoint="search_manifests")
+        # The full body is in memory, decoded at once instead of incrementally.
+        yield from _filter_manifests(json.loads(content), created_after, created_before, limit)
+        return
+
+    with send(session, base_url, "get", request_url, params=query, endpoint="search_manifests", stream=True) as response:
+        response.raise_for_status()
+        yield from _filter_manifests(iter_array(response.iter_content(chunk_size)), created_after, created_before, limit)
+
+def _filter_manifests(manifests: Iterable[dict], created_after: str = None, created_before: str = None, limit: int = None):
+    """Yields manifests created in the given time range, at most limit manifests."""
+    count = 0
+
+    for manifest in manifests:
+        if (created_after != None and manifest['created'] <= created_after):
+            continue
+        if (created_before != None and manifest['created'] >= created_before):
+            continue
+
+        yield manifest
+        count += 1
+
+        if (limit != None and count >= limit):
+            return
+
+@measured('search_manifests')
+def search_manifests(source_system_name: str, source_entity_name: str, base_url: str, notify_api_key: str, notify_api_key_secret: str, state: str, cache: ResponseCache = None):
+    """Searches manifests from ADE Notify API.
+
+    Args:
+        source_system_name (str): Source system name defined in ADE source entity.
+        source_entity_name (str): ADE source entity name.
+        state (str): Manifest state, supported values: "OPEN", "NOTIFIED", "FAILED", "ARCHIVED".
+        base_url (str): ADE Notify API base url, e.g. https://external-api.{environment}.datahub.{tenant}.saas.agiledataengine.com:443/notify-api.
+        notify_api_key (str): ADE Notify API key.
+        notify_api_key_secret (str): ADE Notify API key secret.
+        cache (ResponseCache, optional): Send a conditional request and use the cached response if the result has not changed, see iter_manifests.
+
+    Returns:
+        List [dict] of manifests ordered by created time.
+
+    """
+
+    manifests = iter_manifests(source_system_name, source_entity_name, base_url, notify_api_key, notify_api_key_secret, state, cache=cache)
+
+    # Ordering manifests by created time
+    return sorted(manifests, key = lambda i: i['created'])
+
+@measured('latest_manifest')
+def latest_manifest(source_system_name: str, source_entity_name: str, base_url: str, notify_api_key: str, notify_api_key_secret: str, state: str = "OPEN"):
+    """Searches the latest created manifest from ADE Notify API in a single pass without sorting the manifest list.
+
+    Args:
+        source_system_name (str): Source system name defined in ADE source entity.
+        source_entity_name (str): ADE source entity name.
+        base_url (str): ADE Notify API base url, e.g. https://external-api.{environment}.datahub.{tenant}.saas.agiledataengine.com:443/notify-api.
+        notify_api_key (str): ADE Notify API key.
+        notify_api_key_secret (str): ADE Notify API key secret.
+        state (str, optional): Manifest state, defaults to "OPEN".
+
+    Returns:
+        Manifest dictionary or None if no manifests are found.
+
+    """
+    manifests = iter_manifests(source_system_name, source_entity_name, base_url, notify_api_key, notify_api_key_secret, state)
+
+    return max(manifests, key = lambda i: i['created'], default = None)
 
 def parse_batch(file_url: str, regexp: str):
     """Parses batch number from given file url with given regular expression.
@@ -64,105 +139,307 @@ def parse_batch(file_url: str, regexp: str):
         
     return int(batch)
 
-def add_to_manifest(file_url: str, source: object, base_url: str, notify_api_key: str, notify_api_key_secret: str):
-    """Utilizes Manifest class and other functions to add the given file_url to a manifest for the given configured data source.
+class BatchResults:
+    """Results of parsing batch numbers of file urls with parse_batches.
+
+    Batch numbers are stored in a list in the order of the file urls, None for file urls that failed to parse,
+    and errors in a dictionary by file url index, so that results of large lists take little memory.
+    """
+    file_urls: List[str] = None
+    batches: List[int] = None
+    errors: Dict[int, Exception] = None
+
+    def __init__(self, file_urls: List[str], batches: List[int], errors: Dict[int, Exception]):
+        self.file_urls = file_urls
+        self.batches = batches
+        self.errors = errors
+
+    def __len__(self):
+        return len(self.batches)
+
+    def __iter__(self):
+        """Iterates (file url, batch, error) tuples in file url order."""
+        errors = self.errors
+        for index, (file_url, batch) in enumerate(zip(self.file_urls, self.batches)):
+            yield (file_url, batch, errors.get(index))
+
+    @property
+    def ok(self):
+        return self.errors == {}
+    @property
+    def failed(self):
+        return [(self.file_urls[index], error) for index, error in sorted(self.errors.items())]
+
+    def __repr__(self):
+        return 'BatchResults(parsed={0}, failed={1})'.format(len(self.batches) - len(self.errors), len(self.errors))
+
+def _parse_batch_chunk(file_urls: List[str], pattern: Pattern):
+    """Parses batch numbers of a chunk of file urls with a compiled regular expression in one pass.
+
+    Returns:
+        Tuple (list of batch numbers, dict of errors by index).
+
+    """
+    batches = []
+    errors = {}
+    append = batches.append
+    search = pattern.search
+
+    for index, file_url in enumerate(file_urls):
+        match = search(file_url)
+
+        if (match != None):
+            try:
+                append(int(''.join(match.groups())))
+                continue
+            except (TypeError, ValueError) as e:
+                errors[index] = ValueError('Batch parsing failed for {0}: {1}'.format(file_url, e))
+        else:
+            errors[index] = ValueError('Batch parsing failed for {0}: no match.'.format(file_url))
+
+        append(None)
+
+    return (batches, errors)
+
+def parse_batches(file_urls: List[str], regexp: object, processes: int = None, chunk_size: int = 10000):
+    """Parses batch numbers from the given file urls with the given regular expression, compiled once for all file urls.
+
+    Unlike parse_batch, a file url that cannot be parsed does not stop parsing the others, its error is returned in the results.
 
     Args:
-        file_url (str): Source file url.
-        source (object): Data source configuration JSON object. See notifier documentation for format & required attributes.
+        file_urls (list[str]): Source file urls.
+        regexp (object): Regular expression string or compiled pattern for finding the batch number from the source file url.
+            Supports capturing groups, which are concatenated before casting to integer.
+        processes (int, optional): Parse in a pool of the given number of processes, for very large lists of file urls.
+        chunk_size (int, optional): Number of file urls per process pool task.
+
+    Returns:
+        BatchResults object.
+
+    """
+    pattern = re.compile(regexp)
+    file_urls = list(file_urls)
+
+    if (processes == None or processes <= 1 or len(file_urls) <= chunk_size):
+        batches, errors = _parse_batch_chunk(file_urls, pattern)
+        return BatchResults(file_urls, batches, errors)
+
+    # Imported on use, multiprocessing is slow to import.
+    from concurrent.futures import ProcessPoolExecutor
+
+    batches = []
+    errors = {}
+    chunk_starts = range(0, len(file_urls), chunk_size)
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        chunks = executor.map(_parse_batch_chunk, [file_urls[start:start + chunk_size] for start in chunk_starts], [pattern] * len(chunk_starts))
+        for start, (chunk_batches, chunk_errors) in zip(chunk_starts, chunks):
+            batches.extend(chunk_batches)
+            errors.update({start + index: error for index, error in chunk_errors.items()})
+
+    return BatchResults(file_urls, batches, errors)
+
+def new_manifest(source: object, base_url: str, notify_api_key: str, notify_api_key_secret: str, id: str = None):
+    """Initializes a Manifest object with the mandatory and optional manifest attributes configured in the given data source.
+
+    Args:
+        source (object): Data source configuration JSON object or SourceConfig. See notifier documentation for format & required attributes.
         base_url (str): ADE Notify API base url, e.g. https://external-api.{environment}.datahub.{tenant}.saas.agiledataengine.com:443/notify-api.
         notify_api_key (str): ADE Notify API key.
         notify_api_key_secret (str): ADE Notify API key secret.
+        id (str, optional): Id of an existing manifest, which is not fetched from ADE Notify API.
 
     Returns:
-        Manifest object.
-            
+        Manifest object, not yet created in ADE Notify API if id is not given.
+
     """
-    
-    # Set single_file_manifest based on configuration
-    if ('single_file_manifest' in source['attributes']):
-        if(source['attributes']['single_file_manifest']):
-            single_file_manifest = True
-        else:
-            single_file_manifest = False
-    else:
-        single_file_manifest = False
-    
-    open_manifest_ids = []
+    return SourceConfig.of(source).new_manifest(base_url, notify_api_key, notify_api_key_secret, id)
 
-    # Search open manifests for data source if not single_file_manifest
-    if(not single_file_manifest):
-        open_manifests = search_manifests(
-            source_system_name = source['attributes']['ade_source_system'],
-            source_entity_name = source['attributes']['ade_source_entity'],
-            base_url = base_url,   
-            notify_api_key = notify_api_key,
-            notify_api_key_secret = notify_api_key_secret,
-            state = "OPEN"
-        )
-        
-        for open_manifest_id in open_manifests:
-            open_manifest_ids.append(open_manifest_id['id'])
+def create_entries(file_urls: List[str], source: object, enricher: ContentLengthEnricher = None):
+    """Creates manifest entries for the given file urls, applying path replacement and batch parsing configured in the data source.
 
-        logging.info('Open manifests: {0}'.format(open_manifest_ids))
+    Args:
+        file_urls (list[str]): Source file urls.
+        source (object): Data source configuration JSON object or SourceConfig. See notifier documentation for format & required attributes.
+        enricher (ContentLengthEnricher, optional): Sets the content length of entries from storage metadata.
 
-    # Initialize a manifest object with mandatory attributes.
-    manifest = Manifest(
-        base_url = base_url,
-        source_system_name = source['attributes']['ade_source_system'],
-        source_entity_name = source['attributes']['ade_source_entity'],
-        format = source['manifest_parameters']['format'],
-        notify_api_key = notify_api_key,
-        notify_api_key_secret = notify_api_key_secret
-    )
+    Returns:
+        List [dict] of manifest entries.
+
+    """
+    config = SourceConfig.of(source)
+
+    # Modify manifest entry file url if configured.
+    entries = [{'sourceFile': config.entry_path(file_url)} for file_url in file_urls]
+
+    if (config.batch_pattern != None):
+        # Parse entry specific batch number from file name if configured.
+        results = parse_batches(file_urls, config.batch_pattern)
+        for entry, batch in zip(entries, results.batches):
+            if (batch != None):
+                entry['batch'] = batch
+        for file_url, error in results.failed:
+            logging.warning(error)
+
+    if (enricher != None):
+        content_lengths = enricher.content_lengths(file_urls)
+        for entry, file_url in zip(entries, file_urls):
+            if (content_lengths[file_url] != None):
+                entry['contentLength'] = content_lengths[file_url]
 
-    # Set optional manifest attributes if configured in data source.
-    if ('columns' in source['manifest_parameters']):
-        manifest.columns = source['manifest_parameters']['columns']
-    if ('compression' in source['manifest_parameters']):
-        manifest.compression = source['manifest_parameters']['compression']
-    if ('delim' in source['manifest_parameters']):
-        manifest.delim = source['manifest_parameters']['delim']
-    if ('fullscanned' in source['manifest_parameters']):
-        manifest.fullscanned = source['manifest_parameters']['fullscanned']
-    if ('skiph' in source['manifest_parameters']):
-        manifest.skiph = source['manifest_parameters']['skiph']
-
-    if (open_manifest_ids == []):
-        # Create a new manifest if open manifests are not found.
+    return entries
+
+def _lease_manifest(config: SourceConfig, base_url: str, notify_api_key: str, notify_api_key_secret: str, lease: ManifestLease, replace_id: str = None):
+    """Returns the open manifest of the data source recorded in the lease backend, searching or creating it while holding the lease.
+
+    Args:
+        replace_id (str, optional): Id of a full or closed manifest to replace with a new one, unless another worker has already replaced it.
+
+    Returns:
+        Tuple (str, int) of manifest id and entry count, count is None if not known.
+
+    """
+    lease_key = (base_url, config.ade_source_system, config.ade_source_entity)
+
+    with lease.hold(*lease_key):
+        # Another worker may have recorded the manifest while waiting for the lease.
+        manifest_id = lease.get_manifest(*lease_key)
+        if (manifest_id != None and manifest_id != replace_id):
+            logging.info('Using leased open manifest: {0}'.format(manifest_id))
+            return (manifest_id, None)
+
+        if (replace_id == None):
+            open_manifest = latest_manifest(config.ade_source_system, config.ade_source_entity, base_url, notify_api_key, notify_api_key_secret, "OPEN")
+            if (open_manifest != None):
+                lease.set_manifest(*lease_key, open_manifest['id'])
+                logging.info('Using open manifest: {0}'.format(open_manifest['id']))
+                return (open_manifest['id'], None)
+
+        manifest = config.new_manifest(base_url, notify_api_key, notify_api_key_secret)
         manifest.create()
+        lease.set_manifest(*lease_key, manifest.id)
         logging.info('Manifest created: {0}'.format(manifest.id))
-    else:
-        if ('max_files_in_manifest' in source['attributes']):
-            manifest.fetch_manifest(open_manifest_ids[-1])
+        return (manifest.id, 0)
 
-            manifest.fetch_manifest_entries()
-            manifest_entries = manifest.manifest_entries
+@measured('add_to_manifest')
+def add_to_manifest(file_url: str, source: object, base_url: str, notify_api_key: str, notify_api_key_secret: str, cache: ManifestStateCache = None, lease: ManifestLease = None, dedup: DedupIndex = None, enricher: ContentLengthEnricher = None):
+    """Utilizes Manifest class and other functions to add the given file_url to a manifest for the given configured data source.
 
-            if (len(manifest_entries) >= source['attributes']['max_files_in_manifest']):
-                logging.info('Max files in manifest reached. Creating a new manifest')
-                # Create a new manifest if current manifest has already reached max files limit
-                manifest.create()
-                logging.info('Manifest created: {0}'.format(manifest.id))
-            else:
-                # Use latest existing manifest if open manifests are found and max_files_in_manifest not reached.
-                manifest.fetch_manifest(open_manifest_ids[-1])
-                logging.info('Using open manifest: {0}'.format(manifest.id))
+    Args:
+        file_url (str): Source file url.
+        source (object): Data source configuration JSON object or SourceConfig. See notifier documentation for format & required attributes.
+        base_url (str): ADE Notify API base url, e.g. https://external-api.{environment}.datahub.{tenant}.saas.agiledataengine.com:443/notify-api.
+        notify_api_key (str): ADE Notify API key.
+        notify_api_key_secret (str): ADE Notify API key secret.
+        cache (ManifestStateCache, optional): Open manifest state cache. If given, a cached open manifest is used without searching
+            and fetching it, and the cache is updated with the manifest the entry was added to.
+        lease (ManifestLease, optional): Open manifest coordination between parallel workers. If given, the open manifest is searched,
+            created and replaced only by the worker holding the lease of the data source, and other workers use the manifest it recorded.
+        dedup (DedupIndex, optional): Source file deduplication index. If given, a file url already added to a manifest of the data source
+            is dropped without any API call. The file url is recorded only after it has been added, a concurrent duplicate waits for the
+            outcome. The index is seeded with the entries of the open manifests on first use per data source.
+        enricher (ContentLengthEnricher, optional): Sets the content length of the entry from storage metadata.
+
+    Returns:
+        Manifest object, or None if the file url was dropped as a duplicate. Attributes other than id are not fetched when a cached or leased open manifest is used.
+            
+    """
+
+    config = SourceConfig.of(source)
+
+    if (dedup == None):
+        content_length = enricher.content_length(file_url) if enricher != None else None
+        return _add_to_manifest(config, file_url, base_url, notify_api_key, notify_api_key_secret, cache, lease, content_length)
+
+    dedup.seed(config, base_url, notify_api_key, notify_api_key_secret)
+    if (not dedup.add(config, file_url)):
+        logging.info('Dropped duplicate entry: {0}'.format(config.entry_path(file_url)))
+        return None
+
+    try:
+        content_length = enricher.content_length(file_url) if enricher != None else None
+        manifest = _add_to_manifest(config, file_url, base_url, notify_api_key, notify_api_key_secret, cache, lease, content_length)
+    except BaseException:
+        # Release the file url, so that a retried event is not dropped.
+        dedup.discard(config, file_url)
+        raise
+
+    dedup.commit(config, file_url)
+    return manifest
+
+def _add_to_manifest(config: SourceConfig, file_url: str, base_url: str, notify_api_key: str, notify_api_key_secret: str, cache: ManifestStateCache = None, lease: ManifestLease = None, content_length: int = None):
+    """Adds the given file_url to a manifest, see add_to_manifest."""
+    single_file_manifest = config.single_file_manifest
+    open_manifest = None
+    cached_state = None
+    entry_count = None
+    cache_key = (base_url, config.ade_source_system, config.ade_source_entity)
+    leased = lease != None and not single_file_manifest
+
+    if (cache != None and not single_file_manifest):
+        cached_state = cache.get(*cache_key)
+
+    if (cached_state != None):
+        # Use cached open manifest.
+        manifest = config.new_manifest(base_url, notify_api_key, notify_api_key_secret, id = cached_state[0])
+        entry_count = cached_state[1]
+        logging.info('Using cached open manifest: {0}'.format(manifest.id))
+    elif (leased):
+        # Use the open manifest recorded by the worker holding the lease.
+        manifest_id = lease.get_manifest(*cache_key)
+        if (manifest_id == None):
+            manifest_id, entry_count = _lease_manifest(config, base_url, notify_api_key, notify_api_key_secret, lease)
+        manifest = config.new_manifest(base_url, notify_api_key, notify_api_key_secret, id = manifest_id)
+    else:
+        # Search the latest open manifest for data source if not single_file_manifest
+        if (not single_file_manifest):
+            open_manifest = latest_manifest(
+                source_system_name = config.ade_source_system,
+                source_entity_name = config.ade_source_entity,
+                base_url = base_url,   
+                notify_api_key = notify_api_key,
+                notify_api_key_secret = notify_api_key_secret,
+                state = "OPEN"
+            )
+
+            logging.info('Latest open manifest: {0}'.format(open_manifest['id'] if open_manifest != None else None))
+
+        # Initialize a manifest object with mandatory and optional attributes configured in data source.
+        manifest = config.new_manifest(base_url, notify_api_key, notify_api_key_secret)
+
+        if (open_manifest == None):
+            # Create a new manifest if open manifests are not found.
+            manifest.create()
+            entry_count = 0
+            logging.info('Manifest created: {0}'.format(manifest.id))
         else:
             # Use latest existing manifest if open manifests are found.
-            manifest.fetch_manifest(open_manifest_ids[-1])
+            manifest.load_manifest(open_manifest)
             logging.info('Using open manifest: {0}'.format(manifest.id))
+
+    if (config.max_files_in_manifest != None and not single_file_manifest):
+        if (entry_count == None):
+            entry_count = manifest.count_manifest_entries()
+
+        if (entry_count >= config.max_files_in_manifest):
+            logging.info('Max files in manifest reached. Creating a new manifest')
+            # Create a new manifest if current manifest has already reached max files limit
+            cached_state = None
+            if (leased):
+                manifest_id, entry_count = _lease_manifest(config, base_url, notify_api_key, notify_api_key_secret, lease, replace_id = manifest.id)
+                manifest = config.new_manifest(base_url, notify_api_key, notify_api_key_secret, id = manifest_id)
+            else:
+                manifest.create()
+                entry_count = 0
+                logging.info('Manifest created: {0}'.format(manifest.id))
         
-    if ('path_replace' in source['attributes'] and 'path_replace_with' in source['attributes']):
-        # Modify manifest entry file url if configured.
-        entry_path = file_url.replace(source['attributes']['path_replace'], source['attributes']['path_replace_with'])
-    else:
-        entry_path = file_url
+    # Modify manifest entry file url if configured.
+    entry_path = config.entry_path(file_url)
 
-    if ('batch_from_file_path_regex' in source['attributes']):
+    if (config.batch_pattern != None):
         # Parse entry specific batch number from file name if configured.
         try:
-            batch = parse_batch(file_url, source['attributes']['batch_from_file_path_regex'])
+            batch = config.parse_batch(file_url)
             logging.info('Batch: {0}'.format(batch))
         except Exception as e:
             batch = None
@@ -172,15 +449,29 @@ def add_to_manifest(file_url: str, source: object, base_url: str, notify_api_key
 
     # Add entry to manifest.
     try:
-        manifest.add_entry(entry_path, batch)
+        manifest.add_entry(entry_path, batch, content_length)
     except Exception as e:
         # Retry with a new manifest if e.g. an uncontrolled parallel execution has closed the manifest
         logging.warning('Adding entry to manifest failed, retrying with a new manifest.')
-        manifest.create()
-        logging.info('Manifest created: {0}'.format(manifest.id))
-        manifest.add_entry(entry_path, batch)
+        if (cache != None):
+            cache.invalidate(*cache_key)
+        cached_state = None
+        if (leased):
+            manifest_id, entry_count = _lease_manifest(config, base_url, notify_api_key, notify_api_key_secret, lease, replace_id = manifest.id)
+            manifest = config.new_manifest(base_url, notify_api_key, notify_api_key_secret, id = manifest_id)
+        else:
+            manifest.create()
+            entry_count = 0
+            logging.info('Manifest created: {0}'.format(manifest.id))
+        manifest.add_entry(entry_path, batch, content_length)
 
     logging.info('Added entry: {0}'.format(entry_path))
+
+    if (cache != None and not single_file_manifest):
+        if (cached_state != None):
+            cache.increment(*cache_key, manifest.id)
+        else:
+            cache.set(*cache_key, manifest.id, entry_count + 1 if entry_count != None else None)
     
     # Notify manifest if single_file_manifest = true
     if (single_file_manifest):
@@ -190,43 +481,32 @@ def add_to_manifest(file_url: str, source: object, base_url: str, notify_api_key
     
     return manifest
 
-def add_multiple_entries_to_manifest(entries: List[dict], source: object, base_url: str, notify_api_key: str, notify_api_key_secret: str, batch: int = None):
+@measured('add_multiple_entries_to_manifest')
+def add_multiple_entries_to_manifest(entries: List[dict], source: object, base_url: str, notify_api_key: str, notify_api_key_secret: str, batch: int = None, processes: int = None, enricher: ContentLengthEnricher = None):
     """Utilizes Manifest class and other functions to add the given file_url to a manifest for the given configured data source.
 
     Args:
         entries (list): Source file url.
-        source (object): Data source configuration JSON object. See notifier documentation for format & required attributes.
+        source (object): Data source configuration JSON object or SourceConfig. See notifier documentation for format & required attributes.
         base_url (str): ADE Notify API base url, e.g. https://external-api.{environment}.datahub.{tenant}.saas.agiledataengine.com:443/notify-api.
         notify_api_key (str): ADE Notify API key.
         notify_api_key_secret (str): ADE Notify API key secret.
         batch (int): Optional manifest-level batch id.
+        processes (int, optional): Parse entry batch numbers in a pool of the given number of processes, see parse_batches.
+        enricher (ContentLengthEnricher, optional): Sets the content length of entries without it from storage metadata.
 
     Returns:
         Manifest object.
 
     """
 
-    # Initialize a manifest object with mandatory attributes.
-    manifest = Manifest(
-        base_url = base_url,
-        source_system_name = source['attributes']['ade_source_system'],
-        source_entity_name = source['attributes']['ade_source_entity'],
-        format = source['manifest_parameters']['format'],
-        notify_api_key = notify_api_key,
-        notify_api_key_secret = notify_api_key_secret
-    )
+    config = SourceConfig.of(source)
+
+    if (enricher != None):
+        enricher.enrich(entries)
 
-    # Set optional manifest attributes if configured in data source.
-    if ('columns' in source['manifest_parameters']):
-        manifest.columns = source['manifest_parameters']['columns']
-    if ('compression' in source['manifest_parameters']):
-        manifest.compression = source['manifest_parameters']['compression']
-    if ('delim' in source['manifest_parameters']):
-        manifest.delim = source['manifest_parameters']['delim']
-    if ('fullscanned' in source['manifest_parameters']):
-        manifest.fullscanned = source['manifest_parameters']['fullscanned']
-    if ('skiph' in source['manifest_parameters']):
-        manifest.skiph = source['manifest_parameters']['skiph']
+    # Initialize a manifest object with mandatory and optional attributes configured in data source.
+    manifest = config.new_manifest(base_url, notify_api_key, notify_api_key_secret)
 
     # Setting manifest-level batch if needed
     if (batch is not None):
@@ -236,82 +516,380 @@ def add_multiple_entries_to_manifest(entries: List[dict], source: object, base_u
     manifest.create()
     logging.info('Manifest created: {0}'.format(manifest.id))
 
-    if ('path_replace' in source['attributes'] and 'path_replace_with' in source['attributes']):
-        # Modify manifest entry file url if configured.
-        for entry in entries:
-            entry['sourceFile'] = entry['sourceFile'].replace(
-                source['attributes']['path_replace'], source['attributes']['path_replace_with'])
-
-    if ('batch_from_file_path_regex' in source['attributes']):
-        # Parse entry specific batch number from file name if configured.
-        try:
-            for entry_batch in entries:
-                entry_batch['batch'] = parse_batch(entry['sourceFile'], source['attributes']['batch_from_file_path_regex'])
-                logging.info('Batch: {0}'.format(batch))
-        except Exception as e:
-            batch = None
-            logging.warning('Batch parsing failed:\n{0}'.format(e))
-    else:
-        batch = None
+    _prepare_entries(entries, config, processes)
 
     # Add entry to manifest.
     manifest.add_entries(entries)
-    logging.info('Added entries: {0}'.format(entries))
+    logging.info('Added {0} entries to manifest: {1}'.format(len(entries), manifest.id))
     
     manifest.notify(manifest.id)
 
     return manifest
 
+def _prepare_entries(entries: List[dict], config: SourceConfig, processes: int = None):
+    """Applies path replacement and entry batch parsing configured in the data source to the given entries in place."""
+    if (config.path_replace != None):
+        # Modify manifest entry file url if configured.
+        for entry in entries:
+            entry['sourceFile'] = config.entry_path(entry['sourceFile'])
+
+    if (config.batch_pattern != None):
+        # Parse entry specific batch number from file name if configured, entries failing to parse are added without batch.
+        results = parse_batches([entry['sourceFile'] for entry in entries], config.batch_pattern, processes)
+
+        for entry, entry_batch in zip(entries, results.batches):
+            if (entry_batch != None):
+                entry['batch'] = entry_batch
+
+        for file_url, error in results.failed:
+            logging.warning(error)
+
+        if (not results.ok):
+            logging.warning('Batch parsing failed for {0} of {1} entries.'.format(len(results.errors), len(entries)))
+
+def chunk_entries(entries: List[dict], max_files: int = None, max_payload_bytes: int = None):
+    """Splits manifest entries into chunks of at most max_files entries and max_payload_bytes of JSON request body, keeping entry order.
+
+    Args:
+        entries (list[dict]): Manifest entries.
+        max_files (int, optional): Max number of entries per chunk.
+        max_payload_bytes (int, optional): Max size of a chunk as a JSON request body in bytes. An entry larger than this is put in a chunk of its own.
+
+    Returns:
+        List [list[dict]] of entry chunks.
+
+    """
+    chunks = []
+    chunk = []
+    chunk_bytes = 2 # Enclosing brackets.
+
+    for entry in entries:
+        entry_bytes = len(json.dumps(entry).encode('utf-8')) + 2 if max_payload_bytes != None else 0 # Separating comma and space.
+
+        if (chunk != [] and ((max_files != None and len(chunk) >= max_files) or (max_payload_bytes != None and chunk_bytes + entry_bytes > max_payload_bytes))):
+            chunks.append(chunk)
+            chunk = []
+            chunk_bytes = 2
+
+        chunk.append(entry)
+        chunk_bytes += entry_bytes
+
+    if (chunk != []):
+        chunks.append(chunk)
+
+    return chunks
+
+@measured('add_entries_to_manifests')
+def add_entries_to_manifests(entries: List[dict], source: object, base_url: str, notify_api_key: str, notify_api_key_secret: str, batch: int = None, max_files: int = None, max_payload_bytes: int = None, max_workers: int = 4, notify: bool = True, processes: int = None, dedup: DedupIndex = None, enricher: ContentLengthEnricher = None):
+    """Adds the given entries to new manifests for the given configured data source, split into chunks that fit in a manifest.
+
+    Entries are split into manifests of at most max_files entries (default max_files_in_manifest of the data source) and max_payload_bytes.
+    Manifests are created and filled in parallel. If all chunks succeed, manifests are notified one at a time in entry order, not in
+    parallel, so that manifests with earlier entries (e.g. batches) are notified first.
+
+    If a chunk fails, no manifests are notified, the entries of all manifests created by the call are removed and the error is raised,
+    so that the entries can be retried without loading them twice. The emptied manifests are left OPEN without entries, and are not
+    notified by notify_manifests, notify_sources or NotifyScheduler, which skip manifests without entries. If removing
+    the entries of a manifest fails, it is logged as an error with the manifest id. If notifying a manifest fails, the error is
+    raised and the manifests not yet notified are left OPEN with their entries for notify_manifests, do not retry adding the entries.
+
+    Args:
+        entries (list[dict]): List of manifest entry dictionaries.
+        source (object): Data source configuration JSON object or SourceConfig. See notifier documentation for format & required attributes.
+        base_url (str): ADE Notify API base url, e.g. https://external-api.{environment}.datahub.{tenant}.saas.agiledataengine.com:443/notify-api.
+        notify_api_key (str): ADE Notify API key.
+        notify_api_key_secret (str): ADE Notify API key secret.
+        batch (int, optional): Manifest-level batch id set to all manifests.
+        max_files (int, optional): Max number of entries per manifest, defaults to max_files_in_manifest of the data source.
+        max_payload_bytes (int, optional): Max size of the entries request body per manifest in bytes.
+        max_workers (int, optional): Number of manifests created and filled in parallel.
+        notify (bool, optional): Notify manifests after all entries have been added.
+        processes (int, optional): Parse entry batch numbers in a pool of the given number of processes, see parse_batches.
+        dedup (DedupIndex, optional): Source file deduplication index. If given, entries already added to a manifest of the data source
+            are dropped before any API call, see add_to_manifest. The file urls are recorded when all manifests have been filled.
+        enricher (ContentLengthEnricher, optional): Sets the content length of entries without it from storage metadata.
+
+    Returns:
+        List [Manifest] in entry order.
+
+    Raises:
+        All exceptions if creating or filling a manifest fails, after the other chunks have finished and the entries have been removed.
+
+    """
+    config = SourceConfig.of(source)
+
+    if (dedup != None):
+        dedup.seed(config, base_url, notify_api_key, notify_api_key_secret)
+        file_urls = dedup.filter([entry['sourceFile'] for entry in entries], config)
+        new = set(file_urls)
+        unique = []
+
+        for entry in entries:
+            # Only the first entry of each new file url is kept.
+            if (entry['sourceFile'] in new):
+                new.discard(entry['sourceFile'])
+                unique.append(entry)
+
+        if (len(unique) < len(entries)):
+            logging.info('Dropped {0} duplicate entries.'.format(len(entries) - len(unique)))
+        entries = unique
+
+        try:
+            manifests = _add_entries_to_manifests(entries, config, base_url, notify_api_key, notify_api_key_secret, batch, max_files, max_payload_bytes, max_workers, processes, enricher)
+        except BaseException:
+            # No manifests are notified, release the file urls so that the entries can be retried.
+            dedup.discard_many(file_urls, config)
+            raise
+
+        dedup.commit_many(file_urls, config)
+    else:
+        manifests = _add_entries_to_manifests(entries, config, base_url, notify_api_key, notify_api_key_secret, batch, max_files, max_payload_bytes, max_workers, processes, enricher)
+
+    if (notify):
+        for manifest in manifests:
+            manifest.notify()
+            logging.info('Notified manifest: {0}.'.format(manifest.id))
+
+    return manifests
+
+def _add_entries_to_manifests(entries: List[dict], config: SourceConfig, base_url: str, notify_api_key: str, notify_api_key_secret: str, batch: int, max_files: int, max_payload_bytes: int, max_workers: int, processes: int, enricher: ContentLengthEnricher):
+    """Adds entries to new manifests without notifying them, removing the entries of all created manifests if a chunk fails, see add_entries_to_manifests."""
+    if (enricher != None):
+        enricher.enrich(entries)
+
+    _prepare_entries(entries, config, processes)
+
+    chunks = chunk_entries(entries, max_files if max_files != None else config.max_files_in_manifest, max_payload_bytes)
+
+    created = [None] * len(chunks)
+
+    def fill(index: int, chunk: List[dict]):
+        manifest = config.new_manifest(base_url, notify_api_key, notify_api_key_secret)
+        if (batch != None):
+            manifest.batch = batch
+        manifest.create()
+        created[index] = manifest
+        manifest.add_entries(chunk)
+        logging.info('Added {0} entries to manifest: {1}'.format(len(chunk), manifest.id))
+        return manifest
+
+    def clear(manifest: Manifest):
+        try:
+            manifest.add_entries([])
+            logging.info('Removed entries of manifest: {0}'.format(manifest.id))
+        except Exception as e:
+            logging.error('Removing entries of manifest {0} failed, its entries may be loaded twice if retried:\n{1}'.format(manifest.id, e))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(fill, index, chunk) for index, chunk in enumerate(chunks)]
+        wait(futures)
+        failed = any(future.exception() != None for future in futures)
 
-def notify_manifests(source: object, base_url: str, notify_api_key: str, notify_api_key_secret: str):
+        if (failed):
+            # Entries of the other chunks would be loaded by the next notify and again by a retry.
+            list(executor.map(clear, [manifest for manifest in created if manifest != None]))
+
+    # Raises the first failure in entry order after all chunks have finished.
+    return [future.result() for future in futures]
+
+@measured('notify_manifests')
+def notify_manifests(source: object, base_url: str, notify_api_key: str, notify_api_key_secret: str, cache: ManifestStateCache = None, lease: ManifestLease = None, skip_empty: bool = True):
     """Utilizes Manifest class and other functions to notify all open manifests for the given configured data source.
 
     Args:
-        source (object): Data source configuration JSON object. See notifier documentation for format & required attributes.
+        source (object): Data source configuration JSON object or SourceConfig. See notifier documentation for format & required attributes.
         base_url (str): ADE Notify API base url, e.g. https://external-api.{environment}.datahub.{tenant}.saas.agiledataengine.com:443/notify-api.
         notify_api_key (str): ADE Notify API key.
         notify_api_key_secret (str): ADE Notify API key secret.
+        cache (ManifestStateCache, optional): Open manifest state cache, the cached state of the data source is invalidated.
+        lease (ManifestLease, optional): Open manifest coordination between parallel workers. If given, manifests are notified
+            while holding the lease of the data source and the recorded open manifest is removed, so that workers adding
+            entries create a new manifest instead of using a notified one.
+        skip_empty (bool, optional): Leave open manifests without entries unnotified, e.g. manifests emptied by add_entries_to_manifests
+            after a failed chunk. Counting the entries takes a request per open manifest.
 
     Returns:
-        Array of Manifest objects.
+        Array of notified Manifest objects.
             
     """
 
+    config = SourceConfig.of(source)
+
+    if (lease != None):
+        with lease.hold(base_url, config.ade_source_system, config.ade_source_entity):
+            lease.clear_manifest(base_url, config.ade_source_system, config.ade_source_entity)
+            return _notify_manifests(config, base_url, notify_api_key, notify_api_key_secret, cache, skip_empty)
+
+    return _notify_manifests(config, base_url, notify_api_key, notify_api_key_secret, cache, skip_empty)
+
+def _is_empty(manifest: Manifest):
+    """Returns True if a manifest has no entries, logging that it is not notified."""
+    if (manifest.count_manifest_entries() > 0):
+        return False
+    logging.info('Manifest {0} has no entries, not notified.'.format(manifest.id))
+    return True
+
+def _notify_manifests(config: SourceConfig, base_url: str, notify_api_key: str, notify_api_key_secret: str, cache: ManifestStateCache = None, skip_empty: bool = True):
+    """Notifies all open manifests of the data source in created order, see notify_manifests."""
+    if (cache != None):
+        cache.invalidate(base_url, config.ade_source_system, config.ade_source_entity)
+
     # Search open manifests for data source.
     open_manifests = search_manifests(
-        source_system_name = source['attributes']['ade_source_system'],
-        source_entity_name = source['attributes']['ade_source_entity'],
+        source_system_name = config.ade_source_system,
+        source_entity_name = config.ade_source_entity,
         base_url = base_url,
         notify_api_key = notify_api_key,
         notify_api_key_secret = notify_api_key_secret,
         state = "OPEN"
     )
-    open_manifest_ids = []
-
-    for open_manifest_id in open_manifests:
-        open_manifest_ids.append(open_manifest_id['id'])
-
-    # Initialize a manifest object with mandatory attributes.
-    manifest = Manifest(
-        base_url = base_url,
-        source_system_name = source['attributes']['ade_source_system'],
-        source_entity_name = source['attributes']['ade_source_entity'],
-        format = source['manifest_parameters']['format'],
-        notify_api_key = notify_api_key,
-        notify_api_key_secret = notify_api_key_secret
-    )
-
     manifests = []
 
-    if (open_manifest_ids == []):
+    if (open_manifests == []):
         # Warning if open manifests not found.
-        logging.warning('Open manifests for source {0} not found when attempting to notify.'.format(source['id']))
+        logging.warning('Open manifests for source {0} not found when attempting to notify.'.format(config.id))
     else:
-        # Notify all open manifests for data source.
-        for manifest_id in open_manifest_ids:
-            manifest.fetch_manifest(manifest_id)
+        # Notify all open manifests for data source in created order.
+        for open_manifest in open_manifests:
+            manifest = config.new_manifest(base_url, notify_api_key, notify_api_key_secret)
+            manifest.load_manifest(open_manifest)
+            if (skip_empty and _is_empty(manifest)):
+                continue
             manifest.notify()
             logging.info('Notified manifest: {0}.'.format(manifest.id))
             manifests.append(manifest)
     
-    return manifests
\ No newline at end of file
+    return manifests
+
+class NotifyResult:
+    """Result of notifying a single manifest with notify_sources."""
+    NOTIFIED: str = "NOTIFIED"
+    FAILED: str = "FAILED"
+    SKIPPED: str = "SKIPPED"
+
+    source_id: str = None
+    manifest: Manifest = None
+    status: str = None
+    error: Exception = None
+
+    def __init__(self, source_id: str, manifest: Manifest, status: str, error: Exception = None):
+        self.source_id = source_id
+        self.manifest = manifest
+        self.status = status
+        self.error = error
+
+    def __repr__(self):
+        return 'NotifyResult(source_id={0!r}, manifest_id={1!r}, status={2!r})'.format(self.source_id, self.manifest.id if self.manifest != None else None, self.status)
+
+class NotifyReport:
+    """Aggregated results of notify_sources."""
+    results: List[NotifyResult] = None
+
+    def __init__(self, results: List[NotifyResult]):
+        self.results = results
+
+    @property
+    def notified(self):
+        return [result for result in self.results if result.status == NotifyResult.NOTIFIED]
+    @property
+    def failed(self):
+        return [result for result in self.results if result.status == NotifyResult.FAILED]
+    @property
+    def skipped(self):
+        return [result for result in self.results if result.status == NotifyResult.SKIPPED]
+    @property
+    def ok(self):
+        return self.failed == [] and self.skipped == []
+
+    def __repr__(self):
+        return 'NotifyReport(notified={0}, failed={1}, skipped={2})'.format(len(self.notified), len(self.failed), len(self.skipped))
+
+def _notify_source(config: SourceConfig, base_url: str, notify_api_key: str, notify_api_key_secret: str, cache: ManifestStateCache = None, lease: ManifestLease = None, skip_empty: bool = True):
+    """Notifies open manifests of a single data source in created order, stops at the first failure to keep the order.
+
+    Returns:
+        List [NotifyResult], failures are returned instead of raised.
+
+    """
+    if (lease != None):
+        try:
+            with lease.hold(base_url, config.ade_source_system, config.ade_source_entity):
+                lease.clear_manifest(base_url, config.ade_source_system, config.ade_source_entity)
+                return _notify_source(config, base_url, notify_api_key, notify_api_key_secret, cache, skip_empty=skip_empty)
+        except TimeoutError as e:
+            logging.warning('Lease of source {0} not acquired:\n{1}'.format(config.id, e))
+            return [NotifyResult(config.id, None, NotifyResult.FAILED, e)]
+
+    try:
+        if (cache != None):
+            cache.invalidate(base_url, config.ade_source_system, config.ade_source_entity)
+
+        open_manifests = search_manifests(
+            source_system_name = config.ade_source_system,
+            source_entity_name = config.ade_source_entity,
+            base_url = base_url,
+            notify_api_key = notify_api_key,
+            notify_api_key_secret = notify_api_key_secret,
+            state = "OPEN"
+        )
+    except Exception as e:
+        logging.warning('Searching open manifests for source {0} failed:\n{1}'.format(config.id, e))
+        return [NotifyResult(config.id, None, NotifyResult.FAILED, e)]
+
+    results = []
+    failed = False
+
+    for open_manifest in open_manifests:
+        # Distinct Manifest object per notified manifest.
+        manifest = config.new_manifest(base_url, notify_api_key, notify_api_key_secret)
+        manifest.load_manifest(open_manifest)
+
+        if (failed):
+            # Later manifests are not notified before earlier ones.
+            results.append(NotifyResult(config.id, manifest, NotifyResult.SKIPPED))
+            continue
+
+        try:
+            if (skip_empty and _is_empty(manifest)):
+                continue
+            manifest.notify()
+            logging.info('Notified manifest: {0}.'.format(manifest.id))
+            results.append(NotifyResult(config.id, manifest, NotifyResult.NOTIFIED))
+        except Exception as e:
+            logging.warning('Notifying manifest {0} of source {1} failed:\n{2}'.format(manifest.id, config.id, e))
+            results.append(NotifyResult(config.id, manifest, NotifyResult.FAILED, e))
+            failed = True
+
+    return results
+
+@measured('notify_sources')
+def notify_sources(sources: List[object], base_url: str, notify_api_key: str, notify_api_key_secret: str, max_workers: int = 10, cache: ManifestStateCache = None, lease: ManifestLease = None, skip_empty: bool = True):
+    """Notifies all open manifests of the given configured data sources in parallel.
+
+    Sources are notified in parallel by a thread pool. Manifests of a source are notified one at a time in created order,
+    and if notifying a manifest fails, the later manifests of the source are skipped.
+
+    Args:
+        sources (list[object]): Data source configuration JSON objects or SourceConfig objects. See notifier documentation for format & required attributes.
+        base_url (str): ADE Notify API base url, e.g. https://external-api.{environment}.datahub.{tenant}.saas.agiledataengine.com:443/notify-api.
+        notify_api_key (str): ADE Notify API key.
+        notify_api_key_secret (str): ADE Notify API key secret.
+        max_workers (int, optional): Number of sources notified in parallel. See configure_sessions to set a matching connection pool size.
+        cache (ManifestStateCache, optional): Open manifest state cache, cached states of the data sources are invalidated.
+        lease (ManifestLease, optional): Open manifest coordination between parallel workers, see notify_manifests.
+        skip_empty (bool, optional): Leave open manifests without entries unnotified, see notify_manifests. They are not in the results.
+
+    Returns:
+        NotifyReport object with a NotifyResult per manifest, ordered by source and created time.
+
+    """
+    configs = [SourceConfig.of(source) for source in sources]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_notify_source, config, base_url, notify_api_key, notify_api_key_secret, cache, lease, skip_empty) for config in configs]
+        results = [result for future in futures for result in future.result()]
+
+    report = NotifyReport(results)
+    logging.info('Notified sources: {0}'.format(report))
+
+    return report
@@ -0,0 +1,348 @@
+import logging
+import sqlite3
+import threading
+import time
+from .config import SourceConfig
+from .notifier import create_entries
+from typing import List, Set, Dict, Tuple, Optional
+
+DEFAULT_MAX_FILES: int = 10000
+
+class Outbox:
+    """Durable local queue of file events in a SQLite database, drained into manifests in bulk.
+
+    File events are stored with put() at local disk speed, independent of ADE Notify API latency and availability,
+    and added to manifests by drain(), e.g. in an OutboxDrainer background thread. Each drained batch of events is
+    recorded with the id of its manifest before the entries are added. As entries are added with a single
+    Manifest.add_entries call, which overwrites the entries of the manifest, a batch interrupted e.g. by a crash is
+    replayed into the same manifest on the next drain, so that each event ends up in exactly one manifest.
+    """
+    __connection: sqlite3.Connection = None
+    __drain_lock: threading.Lock = None
+    __lock: threading.Lock = None
+
+    path: str = None
+
+    def __init__(self, path: str, synchronous: str = "NORMAL"):
+        """Class constructor.
+
+        Args:
+            path (str): SQLite database file path, created if it does not exist.
+            synchronous (str, optional): SQLite synchronous setting. "NORMAL" keeps events safe in process crashes,
+                "FULL" also in operating system crashes and power loss at the cost of put() latency.
+
+        """
+        self.path = path
+        self.__lock = threading.Lock()
+        self.__drain_lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute("PRAGMA synchronous={0}".format(synchronous))
+        self.__connection.executescript("""
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source_id TEXT NOT NULL,
+                file_url TEXT NOT NULL,
+                batch_id INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS events_pending ON events (source_id, batch_id, id);
+            CREATE TABLE IF NOT EXISTS batches (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source_id TEXT NOT NULL,
+                manifest_id TEXT,
+                created REAL NOT NULL
+            );
+        """)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def put(self, file_url: str, source_id: str):
+        """Stores a file event.
+
+        Args:
+            file_url (str): Source file url.
+            source_id (str): Data source id.
+
+        """
+        self.put_many([file_url], source_id)
+
+    def put_many(self, file_urls: List[str], source_id: str):
+        """Stores file events of a single data source in one transaction.
+
+        Args:
+            file_urls (list[str]): Source file urls.
+            source_id (str): Data source id.
+
+        """
+        with self.__lock:
+            with self.__transaction():
+                self.__connection.executemany("INSERT INTO events (source_id, file_url) VALUES (?, ?)", [(source_id, file_url) for file_url in file_urls])
+
+    def pending_count(self, source_id: str = None):
+        """Returns the number of file events not yet added to a manifest.
+
+        Args:
+            source_id (str, optional): Data source id, by default all data sources are counted.
+
+        Returns:
+            Int number of events.
+
+        """
+        with self.__lock:
+            if (source_id != None):
+                row = self.__connection.execute("SELECT COUNT(*) FROM events WHERE source_id = ?", (source_id,)).fetchone()
+            else:
+                row = self.__connection.execute("SELECT COUNT(*) FROM events").fetchone()
+        return row[0]
+
+    def __transaction(self):
+        """Returns a context manager running statements in a single transaction, expects __lock to be held by the caller."""
+        return _Transaction(self.__connection)
+
+    def __claim(self, source_id: str, max_files: int):
+        """Assigns up to max_files pending events of a data source to a new batch.
+
+        Returns:
+            Int batch id or None if there are no pending events.
+
+        """
+        with self.__lock:
+            with self.__transaction():
+                if (self.__connection.execute("SELECT 1 FROM events WHERE source_id = ? AND batch_id IS NULL LIMIT 1", (source_id,)).fetchone() == None):
+                    return None
+                batch_id = self.__connection.execute("INSERT INTO batches (source_id, created) VALUES (?, ?)", (source_id, time.time())).lastrowid
+                self.__connection.execute(
+                    "UPDATE events SET batch_id = ? WHERE id IN (SELECT id FROM events WHERE source_id = ? AND batch_id IS NULL ORDER BY id LIMIT ?)",
+                    (batch_id, source_id, max_files)
+                )
+        return batch_id
+
+    def __batches(self, source_ids: List[str] = None):
+        """Returns (batch id, source id, manifest id) of unfinished batches in creation order."""
+        with self.__lock:
+            batches = self.__connection.execute("SELECT id, source_id, manifest_id FROM batches ORDER BY id").fetchall()
+        return [batch for batch in batches if source_ids == None or batch[1] in source_ids]
+
+    def __batch_file_urls(self, batch_id: int):
+        with self.__lock:
+            return [row[0] for row in self.__connection.execute("SELECT file_url FROM events WHERE batch_id = ? ORDER BY id", (batch_id,))]
+
+    def __set_manifest(self, batch_id: int, manifest_id: str):
+        with self.__lock:
+            with self.__transaction():
+                self.__connection.execute("UPDATE batches SET manifest_id = ? WHERE id = ?", (manifest_id, batch_id))
+
+    def __complete(self, batch_id: int):
+        """Removes a batch and its events after they have been added to a manifest."""
+        with self.__lock:
+            with self.__transaction():
+                self.__connection.execute("DELETE FROM events WHERE batch_id = ?", (batch_id,))
+                self.__connection.execute("DELETE FROM batches WHERE id = ?", (batch_id,))
+
+    def __process(self, batch_id: int, config: SourceConfig, manifest_id: str, base_url: str, notify_api_key: str, notify_api_key_secret: str, notify: bool):
+        """Adds the events of a batch to its manifest, replaying into the recorded manifest if the batch was interrupted."""
+        manifest = None
+
+        if (manifest_id != None):
+            # Replay of an interrupted batch.
+            manifest = config.new_manifest(base_url, notify_api_key, notify_api_key_secret)
+            try:
+                manifest.fetch_manifest(manifest_id)
+            except Exception as e:
+                # requests.HTTPError of a missing manifest, checked by status to avoid importing requests.
+                if (getattr(getattr(e, 'response', None), 'status_code', None) != 404):
+                    raise
+                logging.warning('Manifest {0} of outbox batch {1} not found, using a new manifest.'.format(manifest_id, batch_id))
+                manifest = None
+
+            if (manifest != None and manifest.state != "OPEN"):
+                # Entries were added and the manifest notified before the interruption.
+                logging.info('Outbox batch {0} already in {1} manifest {2}.'.format(batch_id, manifest.state, manifest.id))
+                self.__complete(batch_id)
+                return manifest
+
+        if (manifest == None):
+            manifest = config.new_manifest(base_url, notify_api_key, notify_api_key_secret)
+            manifest.create()
+            self.__set_manifest(batch_id, manifest.id)
+
+        file_urls = self.__batch_file_urls(batch_id)
+        manifest.add_entries(create_entries(file_urls, config))
+        logging.info('Added {0} outbox entries to manifest: {1}'.format(len(file_urls), manifest.id))
+
+        if (notify):
+            manifest.notify()
+            logging.info('Notified manifest: {0}.'.format(manifest.id))
+
+        self.__complete(batch_id)
+        return manifest
+
+    def drain(self, sources: Dict[str, object], base_url: str, notify_api_key: str, notify_api_key_secret: str, max_files: int = None, notify: bool = True):
+        """Adds stored file events to new manifests in bulk, first replaying batches interrupted in earlier drains.
+
+        Args:
+            sources (dict): Data source configuration JSON objects or SourceConfig objects by data source id, e.g. from config.load_sources().
+                Events of data sources not in sources are kept in the outbox.
+            base_url (str): ADE Notify API base url, e.g. https://external-api.{environment}.datahub.{tenant}.saas.agiledataengine.com:443/notify-api.
+            notify_api_key (str): ADE Notify API key.
+            notify_api_key_secret (str): ADE Notify API key secret.
+            max_files (int, optional): Max number of events per manifest, defaults to max_files_in_manifest of the data source or 10000.
+            notify (bool, optional): Notify manifests after adding the entries.
+
+        Returns:
+            List of Manifest objects.
+
+        Failures are logged per batch instead of raised. The events of a failed batch are kept in the outbox and retried on the
+        next drain, and the other data sources are drained meanwhile.
+
+        """
+        configs = {source_id: SourceConfig.of(source) for source_id, source in sources.items()}
+
+        # Concurrent drains would replay the same unfinished batches.
+        with self.__drain_lock:
+            return self.__drain(configs, base_url, notify_api_key, notify_api_key_secret, max_files, notify)
+
+    def __drain(self, configs: Dict[str, SourceConfig], base_url: str, notify_api_key: str, notify_api_key_secret: str, max_files: int, notify: bool):
+        """Drains the outbox, expects __drain_lock to be held by the caller.
+
+        A failing batch is logged and its source skipped until the next drain, so that it does not block the other sources.
+        Later batches of the source are not drained before it, to keep the order of the events of a source.
+        """
+        manifests = []
+        failed_source_ids = set()
+
+        def process(batch_id: int, source_id: str, manifest_id: str):
+            try:
+                manifests.append(self.__process(batch_id, configs[source_id], manifest_id, base_url, notify_api_key, notify_api_key_secret, notify))
+                return True
+            except Exception as e:
+                logging.warning('Adding outbox batch {0} of source {1} failed, retrying on the next drain:\n{2}'.format(batch_id, source_id, e))
+                failed_source_ids.add(source_id)
+                return False
+
+        # Replay unfinished batches, e.g. after a crash.
+        for batch_id, source_id, manifest_id in self.__batches(list(configs)):
+            if (source_id not in failed_source_ids):
+                process(batch_id, source_id, manifest_id)
+
+        with self.__lock:
+            pending_source_ids = [row[0] for row in self.__connection.execute("SELECT DISTINCT source_id FROM events WHERE batch_id IS NULL")]
+
+        for source_id in pending_source_ids:
+            if (source_id not in configs):
+                logging.warning('Data source {0} of outbox events not configured, events are kept in the outbox.'.format(source_id))
+                continue
+
+            config = configs[source_id]
+            batch_max_files = max_files or config.max_files_in_manifest or DEFAULT_MAX_FILES
+
+            while (source_id not in failed_source_ids):
+                batch_id = self.__claim(source_id, batch_max_files)
+                if (batch_id == None):
+                    break
+                process(batch_id, source_id, None)
+
+        return manifests
+
+    def close(self):
+        """Closes the database connection."""
+        with self.__lock:
+            self.__connection.close()
+
+class _Transaction:
+    """Context manager for a SQLite transaction in autocommit mode connections."""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.__connection = connection
+
+    def __enter__(self):
+        self.__connection.execute("BEGIN IMMEDIATE")
+        return self.__connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if (exc_type == None):
+            self.__connection.execute("COMMIT")
+        else:
+            self.__connection.execute("ROLLBACK")
+
+class OutboxDrainer:
+    """Background thread draining an Outbox into manifests at a fixed interval.
+
+    Usage:
+        with Outbox('events.db') as outbox, OutboxDrainer(outbox, sources, base_url, notify_api_key, notify_api_key_secret):
+            for event in events:
+                outbox.put(event['url'], event['source_id'])
+    """
+    __outbox: Outbox = None
+    __stopped: threading.Event = None
+    __thread: threading.Thread = None
+    __kwargs: dict = None
+
+    interval: float = None
+
+    def __init__(self, outbox: Outbox, sources: Dict[str, object], base_url: str, notify_api_key: str, notify_api_key_secret: str, interval: float = 5, max_files: int = None, notify: bool = True):
+        """Class constructor, starts the background thread.
+
+        Args:
+            outbox (Outbox): Outbox to drain.
+            sources (dict): Data source configuration JSON objects or SourceConfig objects by data source id.
+            base_url (str): ADE Notify API base url.
+            notify_api_key (str): ADE Notify API key.
+            notify_api_key_secret (str): ADE Notify API key secret.
+            interval (float, optional): Seconds between drains.
+            max_files (int, optional): Max number of events per manifest, see Outbox.drain.
+            notify (bool, optional): Notify manifests after adding the entries.
+
+        """
+        self.__outbox = outbox
+        self.__kwargs = {
+            'sources': sources,
+            'base_url': base_url,
+            'notify_api_key': notify_api_key,
+            'notify_api_key_secret': notify_api_key_secret,
+            'max_files': max_files,
+            'notify': notify
+        }
+        self.interval = interval
+        self.__stopped = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, name='OutboxDrainer', daemon=True)
+        self.__thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __run(self):
+        while (not self.__stopped.wait(self.interval)):
+            self.drain()
+
+    def drain(self):
+        """Drains the outbox once, logging failures instead of raising them.
+
+        Returns:
+            List of Manifest objects.
+
+        """
+        try:
+            return self.__outbox.drain(**self.__kwargs)
+        except Exception as e:
+            logging.warning('Draining outbox failed, retrying in {0} seconds:\n{1}'.format(self.interval, e))
+            return []
+
+    def stop(self, drain: bool = True):
+        """Stops the background thread.
+
+        Args:
+            drain (bool, optional): Drain the outbox once more after stopping.
+
+        """
+        self.__stopped.set()
+        self.__thread.join()
+        if (drain):
+            self.drain()
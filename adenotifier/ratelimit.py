@@ -0,0 +1,199 @@
+import random
+import threading
+import time
+from typing import List, Set, Dict, Tuple, Optional
+
+class RetryPolicy:
+    """HTTP request retry policy with exponential backoff, full jitter and Retry-After support.
+
+    Jitter spreads the retries of parallel workers over the backoff window, so that they do not hit the API in lockstep.
+    """
+    total: int = None
+    backoff_factor: float = None
+    max_backoff: float = None
+    status_forcelist: List[int] = None
+    respect_retry_after: bool = None
+
+    def __init__(self, total: int = 3, backoff_factor: float = 2, max_backoff: float = 60, status_forcelist: List[int] = [401, 404, 429, 500, 502, 503, 504], respect_retry_after: bool = True):
+        """Class constructor.
+
+        Args:
+            total (int, optional): Max number of retries.
+            backoff_factor (float, optional): Backoff before retry n is a random value between 0 and backoff_factor * 2 ** n seconds.
+            max_backoff (float, optional): Max backoff in seconds.
+            status_forcelist (list[int], optional): HTTP status codes that are retried. Connection errors and timeouts are always retried.
+            respect_retry_after (bool, optional): Wait at least the time given in the Retry-After header of a response.
+
+        """
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.status_forcelist = list(status_forcelist)
+        self.respect_retry_after = respect_retry_after
+
+    def backoff(self, attempt: int, retry_after: float = None):
+        """Returns the time to wait in seconds before the given retry.
+
+        Args:
+            attempt (int): Number of the retry, starting from 0.
+            retry_after (float, optional): Retry-After of the failed response in seconds.
+
+        Returns:
+            Float seconds.
+
+        """
+        backoff = random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+        if (self.respect_retry_after and retry_after != None):
+            backoff = max(backoff, retry_after)
+        return backoff
+
+    def without(self, *status_codes: int):
+        """Returns a copy of the policy that does not retry the given HTTP status codes.
+
+        Args:
+            status_codes (int): HTTP status codes.
+
+        Returns:
+            RetryPolicy object.
+
+        """
+        return RetryPolicy(self.total, self.backoff_factor, self.max_backoff, [code for code in self.status_forcelist if code not in status_codes], self.respect_retry_after)
+
+class RateLimiter:
+    """Client-side rate limiter shared by all threads calling an ADE Notify API.
+
+    Combines a token bucket limiting the request rate with an adaptive concurrency limit: the limit is halved (at most once
+    per cooldown period) on HTTP 429 responses or when latency exceeds latency_target, and increased additively by one
+    after a limit's worth of successful requests (AIMD). A Retry-After in a 429 response pauses all requests.
+    """
+    __condition: threading.Condition = None
+    __in_flight: int = None
+    __last_decrease: float = None
+    __paused_until: float = None
+    __successes: int = None
+    __tokens: float = None
+    __tokens_updated: float = None
+
+    rate: float = None
+    burst: int = None
+    limit: float = None
+    min_concurrency: int = None
+    max_concurrency: int = None
+    latency_target: float = None
+    cooldown: float = None
+
+    def __init__(self, rate: float = None, burst: int = None, max_concurrency: int = 32, min_concurrency: int = 1, latency_target: float = None, cooldown: float = 1):
+        """Class constructor.
+
+        Args:
+            rate (float, optional): Max requests per second, unlimited by default.
+            burst (int, optional): Token bucket size, i.e. number of requests that can be sent at once. Defaults to rate rounded up.
+            max_concurrency (int, optional): Max and initial number of requests in flight.
+            min_concurrency (int, optional): Min number of requests in flight the limit is decreased to.
+            latency_target (float, optional): Response time in seconds above which the concurrency limit is decreased.
+            cooldown (float, optional): Min time in seconds between concurrency limit decreases.
+
+        """
+        self.rate = rate
+        self.burst = burst if burst != None else (max(1, int(rate + 0.999)) if rate != None else None)
+        self.limit = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.__condition = threading.Condition()
+        self.__in_flight = 0
+        self.__last_decrease = 0
+        self.__paused_until = 0
+        self.__successes = 0
+        self.__tokens = self.burst
+        self.__tokens_updated = time.monotonic()
+
+    def __wait_time(self, now: float):
+        """Returns seconds until a request may be sent, 0 if it may be sent now. Expects __condition to be held."""
+        if (now < self.__paused_until):
+            return self.__paused_until - now
+
+        if (self.rate != None):
+            self.__tokens = min(self.burst, self.__tokens + (now - self.__tokens_updated) * self.rate)
+            self.__tokens_updated = now
+            if (self.__tokens < 1):
+                return (1 - self.__tokens) / self.rate
+
+        return 0
+
+    def acquire(self):
+        """Blocks until a request may be sent, then reserves a token and a concurrency slot. Call release() after the response."""
+        with self.__condition:
+            while True:
+                if (self.__in_flight < int(self.limit)):
+                    wait = self.__wait_time(time.monotonic())
+                    if (wait <= 0):
+                        break
+                    self.__condition.wait(wait)
+                else:
+                    self.__condition.wait()
+
+            if (self.rate != None):
+                self.__tokens -= 1
+            self.__in_flight += 1
+
+    def release(self, status_code: int = None, latency: float = None, retry_after: float = None):
+        """Releases a concurrency slot and adapts the limits to the response.
+
+        Args:
+            status_code (int, optional): HTTP status code, None if the request failed without a response.
+            latency (float, optional): Response time in seconds.
+            retry_after (float, optional): Retry-After of the response in seconds.
+
+        """
+        with self.__condition:
+            self.__in_flight -= 1
+            now = time.monotonic()
+
+            if (status_code == 429 or (self.latency_target != None and latency != None and latency > self.latency_target)):
+                if (now - self.__last_decrease >= self.cooldown):
+                    # Multiplicative decrease.
+                    self.limit = max(self.min_concurrency, self.limit / 2)
+                    self.__last_decrease = now
+                    self.__successes = 0
+                if (status_code == 429 and retry_after != None):
+                    self.__paused_until = max(self.__paused_until, now + retry_after)
+            elif (status_code != None and status_code < 500):
+                # Additive increase by one after a limit's worth of successful requests.
+                self.__successes += 1
+                if (self.__successes >= self.limit):
+                    self.limit = min(self.max_concurrency, self.limit + 1)
+                    self.__successes = 0
+
+            self.__condition.notify_all()
+
+    @property
+    def in_flight(self):
+        return self.__in_flight
+
+def parse_retry_after(value: str):
+    """Parses a Retry-After header value in seconds.
+
+    Args:
+        value (str): Retry-After header value, delay in seconds or an HTTP date.
+
+    Returns:
+        Float seconds or None if the value is missing or invalid.
+
+    """
+    if (value == None):
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    # Imported on use, HTTP dates are rare and email.utils is slow to import.
+    from email.utils import parsedate_to_datetime
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,121 @@
+import logging
+from .config import SourceConfig
+from typing import List, Set, Dict, Tuple, Optional, Iterable, Callable
+
+class SourceRouter:
+    """Routes file urls to data sources by file url prefix.
+
+    Prefixes are stored in a trie of url path segments, so routing a file url takes time proportional to the number
+    of segments in the url regardless of the number of data sources. The longest matching prefix wins. Prefixes match
+    whole path segments, e.g. prefix "https://account.blob.core.windows.net/container/folder" matches
+    "https://account.blob.core.windows.net/container/folder/file.csv" but not ".../container/folder2/file.csv".
+
+    Prefixes are read from the file_url_prefix attribute (string or list of strings) of the data sources by default.
+    """
+    __prefix_getter: Callable = None
+    __root: dict = None
+    __sources: Dict[str, SourceConfig] = None
+
+    def __init__(self, sources: Iterable[object] = None, prefix_getter: Callable = None):
+        """Class constructor.
+
+        Args:
+            sources (iterable[object], optional): Data source configuration JSON objects or SourceConfig objects.
+            prefix_getter (callable, optional): Function returning the list of file url prefixes of a given SourceConfig,
+                e.g. built from custom storage account, container and folder attributes. Defaults to SourceConfig.file_url_prefixes.
+
+        Raises:
+            ValueError if a prefix is defined for more than one data source.
+
+        """
+        self.__prefix_getter = prefix_getter if prefix_getter != None else (lambda config: config.file_url_prefixes)
+        self.__root = {}
+        self.__sources = {}
+
+        for source in (sources or []):
+            self.add(source)
+
+    @staticmethod
+    def __segments(url: str):
+        """Splits a url into path segments, ignoring query string, fragment and trailing slashes."""
+        for separator in ('?', '#'):
+            url = url.split(separator, 1)[0]
+        return url.rstrip('/').split('/')
+
+    @property
+    def sources(self):
+        return self.__sources
+
+    def add(self, source: object, prefixes: List[str] = None):
+        """Adds a data source to the router.
+
+        Args:
+            source (object): Data source configuration JSON object or SourceConfig.
+            prefixes (list[str], optional): File url prefixes of the data source, by default read with prefix_getter.
+
+        Returns:
+            SourceConfig object.
+
+        Raises:
+            ValueError if a prefix is already defined for another data source.
+
+        """
+        config = SourceConfig.of(source)
+        prefixes = prefixes if prefixes != None else self.__prefix_getter(config)
+
+        if (prefixes == []):
+            logging.warning('No file url prefixes defined for source {0}, file urls are not routed to it.'.format(config.id))
+
+        for prefix in prefixes:
+            node = self.__root
+            for segment in self.__segments(prefix):
+                node = node.setdefault(segment, {})
+
+            existing = node.get(None)
+            if (existing != None and existing.id != config.id):
+                raise ValueError('File url prefix {0} is defined for sources {1} and {2}.'.format(prefix, existing.id, config.id))
+            # Sources are stored under the None key, which is never a segment.
+            node[None] = config
+
+        self.__sources[config.id] = config
+
+        return config
+
+    def route(self, file_url: str):
+        """Returns the data source of the given file url.
+
+        Args:
+            file_url (str): Source file url.
+
+        Returns:
+            SourceConfig object of the longest matching prefix or None if no prefix matches.
+
+        """
+        node = self.__root
+        match = None
+
+        for segment in self.__segments(file_url):
+            node = node.get(segment)
+            if (node == None):
+                break
+            match = node.get(None, match)
+
+        return match
+
+    def route_many(self, file_urls: Iterable[str]):
+        """Groups the given file urls by data source, e.g. for adding them to manifests in bulk.
+
+        Args:
+            file_urls (iterable[str]): Source file urls.
+
+        Returns:
+            Dict [str, list[str]] of file urls by data source id in input order. File urls without a matching data source are under the None key.
+
+        """
+        routed = {}
+
+        for file_url in file_urls:
+            config = self.route(file_url)
+            routed.setdefault(config.id if config != None else None, []).append(file_url)
+
+        return routed
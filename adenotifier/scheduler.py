@@ -0,0 +1,506 @@
+import calendar
+import datetime
+import heapq
+import itertools
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .cache import ManifestStateCache
+from .config import SourceConfig
+from .lease import ManifestLease
+from .notifier import NotifyResult, search_manifests
+from typing import List, Set, Dict, Tuple, Optional
+
+class CronExpression:
+    """Cron expression with five fields: minute, hour, day of month, month and day of week, evaluated in UTC.
+
+    Fields support *, numbers, ranges (1-5), steps (*/15, 0-30/10) and lists (0,30). Day of week is 0-7, where 0 and 7 are Sunday.
+    If both day of month and day of week are restricted, a time matching either one matches, as in cron.
+    """
+    FIELDS: List[Tuple[int, int]] = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    expression: str = None
+    minutes: Set[int] = None
+    hours: Set[int] = None
+    days: Set[int] = None
+    months: Set[int] = None
+    weekdays: Set[int] = None
+    any_day: bool = None
+    any_weekday: bool = None
+
+    def __init__(self, expression: str):
+        """Class constructor.
+
+        Args:
+            expression (str): Cron expression, e.g. "*/15 * * * *" or "0 6 * * 1-5".
+
+        Raises:
+            ValueError if the expression is not valid.
+
+        """
+        fields = expression.split()
+        if (len(fields) != 5):
+            raise ValueError('Cron expression {0!r} must have 5 fields.'.format(expression))
+
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = [self.__parse_field(field, low, high) for field, (low, high) in zip(fields, self.FIELDS)]
+        self.weekdays = {weekday % 7 for weekday in weekdays}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def __repr__(self):
+        return 'CronExpression({0!r})'.format(self.expression)
+
+    def __parse_field(self, field: str, low: int, high: int):
+        """Returns the set of values of a cron field."""
+        values = set()
+
+        for part in field.split(','):
+            match = re.fullmatch(r'(\*|(\d+)(?:-(\d+))?)(?:/(\d+))?', part)
+            if (match == None):
+                raise ValueError('Invalid cron field {0!r} in {1!r}.'.format(field, self.expression))
+
+            if (match.group(1) == '*'):
+                start, end = low, high
+            else:
+                start = int(match.group(2))
+                end = int(match.group(3)) if match.group(3) != None else (high if match.group(4) != None else start)
+            step = int(match.group(4)) if match.group(4) != None else 1
+
+            if (start < low or end > high or start > end or step < 1):
+                raise ValueError('Cron field {0!r} out of range {1}-{2}.'.format(field, low, high))
+
+            values.update(range(start, end + 1, step))
+
+        return values
+
+    def __day_matches(self, day: datetime.datetime):
+        """Returns True if the day of month and day of week of the given time match."""
+        day_match = day.day in self.days
+        weekday_match = (day.isoweekday() % 7) in self.weekdays
+        if (self.any_day or self.any_weekday):
+            return day_match and weekday_match
+        return day_match or weekday_match
+
+    def next(self, after: float):
+        """Returns the first matching time after the given time.
+
+        Args:
+            after (float): Unix timestamp.
+
+        Returns:
+            Float Unix timestamp.
+
+        Raises:
+            ValueError if the expression never matches, e.g. "0 0 31 2 *".
+
+        """
+        current = datetime.datetime.fromtimestamp(after, datetime.timezone.utc).replace(tzinfo=None, second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        limit = current + datetime.timedelta(days=366 * 5)
+
+        # Skips whole months, days and hours that do not match instead of iterating minute by minute.
+        while (current < limit):
+            if (current.month not in self.months):
+                current = (current.replace(day=1, hour=0, minute=0) + datetime.timedelta(days=32)).replace(day=1)
+            elif (not self.__day_matches(current)):
+                current = current.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+            elif (current.hour not in self.hours):
+                current = current.replace(minute=0) + datetime.timedelta(hours=1)
+            elif (current.minute not in self.minutes):
+                current += datetime.timedelta(minutes=1)
+            else:
+                return float(calendar.timegm(current.timetuple()))
+
+        raise ValueError('Cron expression {0!r} does not match any time.'.format(self.expression))
+
+class NotifySchedule:
+    """Conditions for notifying the open manifests of a data source, a manifest is notified when any condition is met."""
+    max_entries: int = None
+    max_age: float = None
+    max_idle: float = None
+    cron: CronExpression = None
+
+    def __init__(self, max_entries: int = None, max_age: float = None, max_idle: float = None, cron: str = None):
+        """Class constructor.
+
+        Args:
+            max_entries (int, optional): Notify a manifest with at least the given number of entries.
+            max_age (float, optional): Notify a manifest the given number of seconds after it was created.
+            max_idle (float, optional): Notify a manifest the given number of seconds after it was last modified.
+            cron (str, optional): Notify manifests created before each time matching the cron expression, see CronExpression.
+
+        Raises:
+            ValueError if no condition is given or the cron expression is not valid.
+
+        """
+        if (max_entries == None and max_age == None and max_idle == None and cron == None):
+            raise ValueError('Notify schedule must have at least one of max_entries, max_age, max_idle or cron.')
+
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.max_idle = max_idle
+        self.cron = CronExpression(cron) if cron != None else None
+
+    def __repr__(self):
+        return 'NotifySchedule(max_entries={0!r}, max_age={1!r}, max_idle={2!r}, cron={3!r})'\
+            .format(self.max_entries, self.max_age, self.max_idle, self.cron.expression if self.cron != None else None)
+
+    @classmethod
+    def of(cls, source: object):
+        """Returns the schedule configured in the notify_schedule attribute of a data source, e.g. {"max_age": 900, "cron": "0 * * * *"}.
+
+        Args:
+            source (object): Data source configuration JSON object or SourceConfig.
+
+        Returns:
+            NotifySchedule object or None if not configured.
+
+        """
+        schedule = SourceConfig.of(source)['attributes'].get('notify_schedule')
+        if (schedule == None):
+            return None
+        return cls(**schedule)
+
+class NotifyScheduler:
+    """Long-running scheduler notifying open manifests of data sources by entry count, age, idle time or cron windows.
+
+    Sources are kept in a single priority queue by the time they are next due, so one background thread and a worker pool
+    serve thousands of sources. A source is checked with one search call when its earliest manifest deadline or cron time
+    is reached, and otherwise every poll_interval seconds to discover new manifests. Entry counts need a fetch call per
+    open manifest unless they are reported with record_entries by the process adding the entries.
+
+    Usage:
+        with NotifyScheduler(base_url, notify_api_key, notify_api_key_secret, poll_interval = 60) as scheduler:
+            for source in sources.values():
+                scheduler.add(source, NotifySchedule(max_entries = 1000, max_age = 900))
+            ...
+    """
+    __base_url: str = None
+    __notify_api_key: str = None
+    __notify_api_key_secret: str = None
+    __lock: threading.Lock = None
+    __queue: List[Tuple[float, int, str]] = None
+    __sequence: itertools.count = None
+    __sources: Dict[str, dict] = None
+    __stopped: threading.Event = None
+    __wakeup: threading.Event = None
+    __thread: threading.Thread = None
+    __executor: ThreadPoolExecutor = None
+
+    poll_interval: float = None
+    max_workers: int = None
+    cache: ManifestStateCache = None
+    lease: ManifestLease = None
+
+    def __init__(self, base_url: str, notify_api_key: str, notify_api_key_secret: str, poll_interval: float = 60, max_workers: int = 10,
+                 cache: ManifestStateCache = None, lease: ManifestLease = None):
+        """Class constructor.
+
+        Args:
+            base_url (str): ADE Notify API base url, e.g. https://external-api.{environment}.datahub.{tenant}.saas.agiledataengine.com:443/notify-api.
+            notify_api_key (str): ADE Notify API key.
+            notify_api_key_secret (str): ADE Notify API key secret.
+            poll_interval (float, optional): Max seconds between checks of a source.
+            max_workers (int, optional): Number of sources checked in parallel.
+            cache (ManifestStateCache, optional): Open manifest state cache invalidated when a source is notified.
+            lease (ManifestLease, optional): Open manifest coordination with workers adding entries, see notifier.notify_manifests.
+
+        """
+        self.__base_url = base_url
+        self.__notify_api_key = notify_api_key
+        self.__notify_api_key_secret = notify_api_key_secret
+        self.__lock = threading.Lock()
+        self.__queue = []
+        self.__sequence = itertools.count()
+        self.__sources = {}
+        self.__stopped = threading.Event()
+        self.__wakeup = threading.Event()
+        self.poll_interval = poll_interval
+        self.max_workers = max_workers
+        self.cache = cache
+        self.lease = lease
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def add(self, source: object, schedule: NotifySchedule = None):
+        """Adds or replaces a data source. The first check is spread randomly over poll_interval to even out API load.
+
+        Args:
+            source (object): Data source configuration JSON object or SourceConfig.
+            schedule (NotifySchedule, optional): Notify conditions, by default read from the notify_schedule attribute of the data source.
+
+        Raises:
+            ValueError if the source has no schedule.
+
+        """
+        config = SourceConfig.of(source)
+        schedule = schedule if schedule != None else NotifySchedule.of(config)
+        if (schedule == None):
+            raise ValueError('Data source {0} has no notify_schedule.'.format(config.id))
+
+        with self.__lock:
+            self.__sources[config.id] = {'source': config, 'schedule': schedule, 'counts': {}, 'checked': time.time(), 'due': None, 'running': False, 'recheck': False}
+            self.__schedule(config.id, time.time() + random.uniform(0, self.poll_interval))
+
+    def remove(self, source_id: str):
+        """Removes a data source.
+
+        Args:
+            source_id (str): Data source id.
+
+        """
+        with self.__lock:
+            self.__sources.pop(source_id, None)
+
+    def record_entries(self, source_id: str, manifest_id: str, count: int = 1):
+        """Reports entries added to a manifest by this process, so that max_entries is checked without fetching entries.
+
+        Args:
+            source_id (str): Data source id.
+            manifest_id (str): Manifest id.
+            count (int, optional): Number of added entries.
+
+        """
+        with self.__lock:
+            state = self.__sources.get(source_id)
+            if (state == None):
+                return
+            state['counts'][manifest_id] = state['counts'].get(manifest_id, 0) + count
+
+            if (state['schedule'].max_entries != None and state['counts'][manifest_id] >= state['schedule'].max_entries):
+                self.__schedule(source_id, time.time())
+                self.__wakeup.set()
+
+    def __schedule(self, source_id: str, due: float):
+        """Sets the time a source is next checked, if earlier than the current one. Expects __lock to be held."""
+        state = self.__sources[source_id]
+        if (state['due'] == None or due < state['due']):
+            state['due'] = due
+            heapq.heappush(self.__queue, (due, next(self.__sequence), source_id))
+
+    def __pop_due(self, now: float):
+        """Returns ids of sources due at the given time and removes them from the queue. Expects __lock to be held."""
+        due = []
+        while (self.__queue != [] and self.__queue[0][0] <= now):
+            time_due, _, source_id = heapq.heappop(self.__queue)
+            state = self.__sources.get(source_id)
+            # Skips removed sources and entries superseded by an earlier due time.
+            if (state == None or state['due'] != time_due):
+                continue
+            if (state['running']):
+                # Checked again when the running check ends, see check().
+                state['due'] = None
+                state['recheck'] = True
+                continue
+            state['due'] = None
+            state['running'] = True
+            due.append(source_id)
+        return due
+
+    def check(self, source_id: str):
+        """Checks a source now and notifies its due open manifests.
+
+        Args:
+            source_id (str): Data source id.
+
+        Returns:
+            List [NotifyResult], failures are returned instead of raised.
+
+        """
+        with self.__lock:
+            state = self.__sources[source_id]
+
+        now = time.time()
+        results = []
+        next_due = now + self.poll_interval
+
+        try:
+            open_manifests = search_manifests(state['source'].ade_source_system, state['source'].ade_source_entity, self.__base_url,
+                                              self.__notify_api_key, self.__notify_api_key_secret, "OPEN")
+            due_index, deadline = self.__evaluate(state, open_manifests, now)
+            if (due_index >= 0):
+                results = self.__notify(state, open_manifests[:due_index + 1])
+                if (any(result.status != NotifyResult.NOTIFIED for result in results)):
+                    deadline = None
+            if (deadline != None):
+                next_due = min(next_due, deadline)
+        except Exception as e:
+            logging.warning('Checking source {0} failed:\n{1}'.format(source_id, e))
+            results = [NotifyResult(source_id, None, NotifyResult.FAILED, e)]
+
+        with self.__lock:
+            state['checked'] = now
+            state['running'] = False
+            if (source_id in self.__sources):
+                # A source that became due during the check, e.g. by record_entries, is checked again right away.
+                self.__schedule(source_id, time.time() if state['recheck'] else max(next_due, now + 1))
+                state['recheck'] = False
+
+        return results
+
+    def __evaluate(self, state: dict, open_manifests: List[dict], now: float):
+        """Returns the index of the last due manifest in created order (-1 if none) and the earliest deadline of the manifests after it."""
+        schedule = state['schedule']
+        due_index = -1
+        deadlines = []
+        cron_deadline = None
+
+        # Latest cron time since the previous check.
+        cron_time = None
+        if (schedule.cron != None):
+            next_time = schedule.cron.next(state['checked'])
+            while (next_time <= now):
+                cron_time = next_time
+                next_time = schedule.cron.next(next_time)
+            cron_deadline = next_time
+
+        for index, manifest in enumerate(open_manifests):
+            created = _parse_time(manifest.get('created'))
+            modified = _parse_time(manifest.get('modified')) or created
+            due = False
+            deadline = cron_deadline
+
+            if (cron_time != None and (created == None or created <= cron_time)):
+                due = True
+            if (schedule.max_age != None and created != None):
+                due = due or created + schedule.max_age <= now
+                deadline = _earliest(deadline, created + schedule.max_age)
+            if (schedule.max_idle != None and modified != None):
+                due = due or modified + schedule.max_idle <= now
+                deadline = _earliest(deadline, modified + schedule.max_idle)
+            if (schedule.max_entries != None and not due):
+                due = self.__entry_count(state, manifest['id']) >= schedule.max_entries
+
+            if (due):
+                # Earlier manifests are notified before later ones to keep the order.
+                due_index = index
+            deadlines.append(deadline)
+
+        deadline = None
+        for manifest_deadline in deadlines[due_index + 1:]:
+            if (manifest_deadline != None):
+                deadline = _earliest(deadline, manifest_deadline)
+
+        return (due_index, deadline)
+
+    def __entry_count(self, state: dict, manifest_id: str):
+        """Returns the entry count of a manifest, reported with record_entries or fetched from ADE Notify API."""
+        with self.__lock:
+            count = state['counts'].get(manifest_id)
+        if (count != None):
+            return count
+
+        manifest = state['source'].new_manifest(self.__base_url, self.__notify_api_key, self.__notify_api_key_secret, id = manifest_id)
+        return manifest.count_manifest_entries()
+
+    def __notify(self, state: dict, open_manifests: List[dict]):
+        """Notifies the given open manifests in created order, skipping the rest after a failure."""
+        config = state['source']
+
+        if (self.lease != None):
+            with self.lease.hold(self.__base_url, config.ade_source_system, config.ade_source_entity):
+                self.lease.clear_manifest(self.__base_url, config.ade_source_system, config.ade_source_entity)
+                return self.__notify_manifests(state, open_manifests)
+
+        return self.__notify_manifests(state, open_manifests)
+
+    def __notify_manifests(self, state: dict, open_manifests: List[dict]):
+        config = state['source']
+        results = []
+
+        if (self.cache != None):
+            self.cache.invalidate(self.__base_url, config.ade_source_system, config.ade_source_entity)
+
+        for open_manifest in open_manifests:
+            manifest = config.new_manifest(self.__base_url, self.__notify_api_key, self.__notify_api_key_secret)
+            manifest.load_manifest(open_manifest)
+
+            if (results != [] and results[-1].status != NotifyResult.NOTIFIED):
+                results.append(NotifyResult(config.id, manifest, NotifyResult.SKIPPED))
+                continue
+
+            try:
+                # Manifests without entries, e.g. emptied by notifier.add_entries_to_manifests after a failed chunk, are not notified.
+                if (self.__entry_count(state, manifest.id) == 0):
+                    logging.info('Manifest {0} has no entries, not notified.'.format(manifest.id))
+                    continue
+                manifest.notify()
+                logging.info('Notified manifest: {0}.'.format(manifest.id))
+                results.append(NotifyResult(config.id, manifest, NotifyResult.NOTIFIED))
+                with self.__lock:
+                    state['counts'].pop(manifest.id, None)
+            except Exception as e:
+                logging.warning('Notifying manifest {0} of source {1} failed:\n{2}'.format(manifest.id, config.id, e))
+                results.append(NotifyResult(config.id, manifest, NotifyResult.FAILED, e))
+
+        return results
+
+    def run_once(self):
+        """Checks all sources that are due now, e.g. from an external timer instead of the background thread.
+
+        Returns:
+            List [NotifyResult] of notified, failed and skipped manifests.
+
+        """
+        with self.__lock:
+            due = self.__pop_due(time.time())
+        return [result for source_id in due for result in self.check(source_id)]
+
+    def __run(self):
+        """Background thread dispatching due sources to the worker pool."""
+        while (not self.__stopped.is_set()):
+            self.__wakeup.clear()
+            now = time.time()
+
+            with self.__lock:
+                due = self.__pop_due(now)
+                wait = self.__queue[0][0] - now if self.__queue != [] else self.poll_interval
+
+            for source_id in due:
+                self.__executor.submit(self.check, source_id)
+
+            self.__wakeup.wait(min(max(wait, 0.01), 1))
+
+    def start(self):
+        """Starts the background thread."""
+        self.__stopped.clear()
+        self.__executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='NotifyScheduler')
+        self.__thread = threading.Thread(target=self.__run, name='NotifyScheduler', daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """Stops the background thread and waits for running checks to finish."""
+        self.__stopped.set()
+        self.__wakeup.set()
+        if (self.__thread != None):
+            self.__thread.join()
+            self.__executor.shutdown(wait=True)
+            self.__thread = None
+
+def _earliest(a: float, b: float):
+    return b if a == None or b < a else a
+
+def _parse_time(value: str):
+    """Parses an ADE Notify API timestamp, e.g. 2023-05-04T12:00:00.123Z, to a Unix timestamp. Returns None if the value cannot be parsed."""
+    if (value == None):
+        return None
+
+    match = re.match(r'(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2})(?:\.(\d+))?(Z|[+-]\d{2}:?\d{2})?$', value)
+    if (match == None):
+        return None
+
+    fraction = (match.group(3) or '0')[:6].ljust(6, '0')
+    zone = match.group(4) if match.group(4) not in (None, 'Z') else '+00:00'
+    if (':' not in zone):
+        zone = zone[:3] + ':' + zone[3:]
+
+    parsed = datetime.datetime.fromisoformat('{0}T{1}.{2}{3}'.format(match.group(1), match.group(2), fraction, zone))
+    return parsed.timestamp()
@@ -0,0 +1,313 @@
+import logging
+import threading
+import time
+from .cache import ResponseCache
+from .metrics import ApiCall, record_call
+from .ratelimit import RateLimiter, RetryPolicy, parse_retry_after
+from typing import List, Set, Dict, Tuple, Optional, TYPE_CHECKING
+
+if (TYPE_CHECKING):
+    import requests
+
+# requests and urllib3 are imported when the first session is created, so that importing the package stays fast
+# e.g. in serverless cold starts and for the asyncio client.
+
+DEFAULT_POOL_CONNECTIONS: int = 10
+DEFAULT_POOL_MAXSIZE: int = 10
+DEFAULT_KEEP_ALIVE: bool = True
+DEFAULT_RETRY: RetryPolicy = RetryPolicy(total=3, backoff_factor=2, status_forcelist=[401, 404, 429, 500, 502, 503, 504]) # HTTP request retry settings.
+ENDPOINT_RETRY_EXCLUSIONS: Dict[str, List[int]] = {
+    # A missing manifest is reported right away instead of after retries.
+    'fetch_manifest': [404],
+    'fetch_manifest_entries': [404]
+}
+# Endpoint policies of DEFAULT_RETRY. Policies in use are derived from the configured default retry policy when looked up.
+DEFAULT_ENDPOINT_RETRIES: Dict[str, RetryPolicy] = {endpoint: DEFAULT_RETRY.without(*codes) for endpoint, codes in ENDPOINT_RETRY_EXCLUSIONS.items()}
+
+_lock = threading.Lock()
+_sessions: Dict[Tuple[str, str], 'requests.Session'] = {}
+_rate_limiters: Dict[str, RateLimiter] = {}
+_settings: dict = {
+    'pool_connections': DEFAULT_POOL_CONNECTIONS,
+    'pool_maxsize': DEFAULT_POOL_MAXSIZE,
+    'keep_alive': DEFAULT_KEEP_ALIVE,
+    'retry': DEFAULT_RETRY,
+    'endpoint_retries': {}, # Explicit policies by endpoint, see configure_sessions.
+    'derived_retries': dict(DEFAULT_ENDPOINT_RETRIES),
+    'rate_limit': {},
+    'base_url_rate_limits': {},
+    'base_url_pool_maxsizes': {}
+}
+
+def configure_sessions(pool_connections: int = None, pool_maxsize: int = None, keep_alive: bool = None, retry: RetryPolicy = None, endpoint_retries: Dict[str, RetryPolicy] = None, base_url: str = None):
+    """Sets connection pool settings for ADE Notify API sessions. Existing sessions are closed and recreated on next use.
+
+    Args:
+        pool_connections (int, optional): Number of connection pools to cache per session.
+        pool_maxsize (int, optional): Max number of connections kept open per pool, i.e. the number of threads that can use a session concurrently without blocking.
+        keep_alive (bool, optional): Reuse connections between requests. Set to False to close the connection after each request.
+        retry (RetryPolicy, optional): Default HTTP request retry policy.
+        endpoint_retries (dict, optional): Retry policies by endpoint, overriding the default policy. Endpoints: "search_manifests", "create",
+            "fetch_manifest", "fetch_manifest_entries", "notify", "add_entry" and "add_entries". Without an explicit policy, fetch_manifest and
+            fetch_manifest_entries use the default policy without retrying 404.
+        base_url (str, optional): Set pool_maxsize for the given base url only, e.g. per environment. Other settings are not allowed with base_url.
+
+    """
+    with _lock:
+        if (base_url != None):
+            if (pool_connections != None or keep_alive != None or retry != None or endpoint_retries != None):
+                raise ValueError('Only pool_maxsize can be set per base url.')
+            _settings['base_url_pool_maxsizes'][base_url] = pool_maxsize
+            for key in [key for key in _sessions if key[0] == base_url]:
+                _sessions.pop(key).close()
+            return
+
+        if (pool_connections != None):
+            _settings['pool_connections'] = pool_connections
+        if (pool_maxsize != None):
+            _settings['pool_maxsize'] = pool_maxsize
+        if (keep_alive != None):
+            _settings['keep_alive'] = keep_alive
+        if (retry != None):
+            _settings['retry'] = retry
+            _settings['derived_retries'] = {endpoint: retry.without(*codes) for endpoint, codes in ENDPOINT_RETRY_EXCLUSIONS.items()}
+        if (endpoint_retries != None):
+            _settings['endpoint_retries'].update(endpoint_retries)
+        _close_all()
+
+def configure_rate_limits(base_url: str = None, **kwargs):
+    """Sets client-side rate limits of ADE Notify API requests, see RateLimiter for the arguments. Existing rate limiters are replaced.
+
+    Requests to a base url share one rate limiter across all threads of the process. By default the concurrency limit adapts
+    to HTTP 429 responses between 1 and 32 requests in flight and the request rate is not limited.
+
+    Args:
+        base_url (str, optional): Set limits for the given base url only, by default limits are set for all base urls without own limits.
+        kwargs: RateLimiter arguments: rate, burst, max_concurrency, min_concurrency, latency_target, cooldown.
+
+    """
+    with _lock:
+        if (base_url != None):
+            _settings['base_url_rate_limits'][base_url] = kwargs
+            _rate_limiters.pop(base_url, None)
+        else:
+            _settings['rate_limit'] = kwargs
+            for url in [url for url in _rate_limiters if url not in _settings['base_url_rate_limits']]:
+                del _rate_limiters[url]
+
+def get_rate_limiter(base_url: str):
+    """Returns the rate limiter shared by all requests to the given ADE Notify API base url.
+
+    Args:
+        base_url (str): ADE Notify API base url.
+
+    Returns:
+        RateLimiter object.
+
+    """
+    with _lock:
+        limiter = _rate_limiters.get(base_url)
+        if (limiter == None):
+            limiter = RateLimiter(**_settings['base_url_rate_limits'].get(base_url, _settings['rate_limit']))
+            _rate_limiters[base_url] = limiter
+    return limiter
+
+def get_retry_policy(endpoint: str = None):
+    """Returns the retry policy of the given endpoint.
+
+    Args:
+        endpoint (str, optional): Endpoint name, e.g. "fetch_manifest".
+
+    Returns:
+        RetryPolicy object.
+
+    """
+    policy = _settings['endpoint_retries'].get(endpoint)
+    if (policy == None):
+        policy = _settings['derived_retries'].get(endpoint, _settings['retry'])
+    return policy
+
+def get_session(base_url: str, notify_api_key: str, notify_api_key_secret: str):
+    """Returns a pooled session for the given ADE Notify API base url and key, creating one on first use.
+
+    Sessions are shared process-wide (and between threads) so that connections and TLS handshakes are reused across calls.
+
+    Args:
+        base_url (str): ADE Notify API base url.
+        notify_api_key (str): ADE Notify API key.
+        notify_api_key_secret (str): ADE Notify API key secret.
+
+    Returns:
+        requests.Session object.
+
+    """
+    key = (base_url, notify_api_key)
+
+    with _lock:
+        session = _sessions.get(key)
+
+        if (session == None):
+            session = _new_session(base_url)
+            _sessions[key] = session
+
+        if (session.auth != (notify_api_key, notify_api_key_secret)):
+            # Key secret has been rotated.
+            session.auth = (notify_api_key, notify_api_key_secret)
+
+    return session
+
+def send(session: 'requests.Session', base_url: str, http_method: str, request_url: str, data: str = None, params: dict = None, endpoint: str = None, stream: bool = False, headers: dict = None):
+    """Sends an ADE Notify API request through the rate limiter of the base url, retrying with the retry policy of the endpoint.
+
+    Args:
+        session (requests.Session): Session returned by get_session().
+        base_url (str): ADE Notify API base url, selects the rate limiter.
+        http_method (str): Supported values: "get", "post" or "put".
+        request_url (str): Request url.
+        data (str, optional): Request body.
+        params (dict, optional): Query parameters.
+        endpoint (str, optional): Endpoint name, selects the retry policy.
+        stream (bool, optional): Do not read the response body before returning.
+        headers (dict, optional): Additional request headers, e.g. If-None-Match.
+
+    Returns:
+        requests.Response object of the last attempt. Status is not checked, call raise_for_status().
+
+    Raises:
+        Connection errors and timeouts after retries.
+
+    """
+    import requests
+
+    limiter = get_rate_limiter(base_url)
+    policy = get_retry_policy(endpoint)
+    attempt = 0
+    call_start = time.monotonic()
+
+    while True:
+        limiter.acquire()
+        start = time.monotonic()
+        try:
+            response = session.request(http_method.upper(), request_url, data=data, params=params, stream=stream, headers=headers)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            limiter.release(None, time.monotonic() - start)
+            if (attempt >= policy.total):
+                record_call(ApiCall(endpoint, http_method, None, attempt, time.monotonic() - call_start, len(data) if data else 0, 0, e))
+                raise
+            retry_after = None
+        else:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            limiter.release(response.status_code, time.monotonic() - start, retry_after)
+            if (response.status_code not in policy.status_forcelist or attempt >= policy.total):
+                record_call(ApiCall(endpoint, http_method, response.status_code, attempt, time.monotonic() - call_start, len(data) if data else 0, _response_bytes(response, stream)))
+                return response
+            response.close()
+
+        time.sleep(policy.backoff(attempt, retry_after))
+        attempt += 1
+
+def send_conditional(session: 'requests.Session', base_url: str, request_url: str, cache: ResponseCache, params: dict = None, endpoint: str = None):
+    """Sends a conditional GET request with the ETag and Last-Modified validators of the cached response of the url, so that
+    ADE Notify API can answer HTTP 304 without a body if the resource has not changed. Responses with validators are cached.
+
+    Args:
+        session (requests.Session): Session returned by get_session().
+        base_url (str): ADE Notify API base url, selects the rate limiter.
+        request_url (str): Request url.
+        cache (ResponseCache): Response cache.
+        params (dict, optional): Query parameters.
+        endpoint (str, optional): Endpoint name, selects the retry policy.
+
+    Returns:
+        Tuple (bytes, bool) of the response body, from the cache if not modified, and True if the resource was modified or not cached.
+
+    Raises:
+        requests.HTTPError if the response status is an error, connection errors and timeouts after retries.
+
+    """
+    cached = cache.get(request_url, params)
+    headers = {}
+
+    if (cached != None):
+        if (cached.etag != None):
+            headers['If-None-Match'] = cached.etag
+        if (cached.last_modified != None):
+            headers['If-Modified-Since'] = cached.last_modified
+
+    response = send(session, base_url, "get", request_url, params=params, endpoint=endpoint, headers=headers)
+
+    if (response.status_code == 304 and cached != None):
+        return (cached.content, False)
+
+    response.raise_for_status()
+    cache.set(request_url, params, response.headers.get('ETag'), response.headers.get('Last-Modified'), response.content)
+    return (response.content, True)
+
+def prewarm(base_url: str, notify_api_key: str, notify_api_key_secret: str, connect: bool = False):
+    """Creates the pooled session and rate limiter of the given base url and key ahead of the first API call, e.g. at module
+    level of a serverless function, so that the work is done in the initialization phase and kept for warm invocations.
+
+    Args:
+        base_url (str): ADE Notify API base url.
+        notify_api_key (str): ADE Notify API key.
+        notify_api_key_secret (str): ADE Notify API key secret.
+        connect (bool, optional): Also open a pooled connection with a HEAD request to the base url. The response status is ignored.
+
+    Returns:
+        requests.Session object.
+
+    """
+    session = get_session(base_url, notify_api_key, notify_api_key_secret)
+    get_rate_limiter(base_url)
+
+    if (connect):
+        import requests
+
+        try:
+            session.head(base_url, timeout=10).close()
+        except requests.exceptions.RequestException as e:
+            logging.warning('Opening a connection to {0} failed:\n{1}'.format(base_url, e))
+
+    return session
+
+def close_sessions():
+    """Closes all pooled sessions and their connections."""
+    with _lock:
+        _close_all()
+
+def _new_session(base_url: str = None):
+    """Creates a new session with current pool settings of the given base url."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    session.headers.update({"Content-Type": "application/json"})
+
+    if (not _settings['keep_alive']):
+        session.headers.update({"Connection": "close"})
+
+    # Retries are handled by send() to apply retry policies per endpoint and the shared rate limiter.
+    adapter = HTTPAdapter(
+        pool_connections = _settings['pool_connections'],
+        pool_maxsize = _settings['base_url_pool_maxsizes'].get(base_url) or _settings['pool_maxsize'],
+        max_retries = 0
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    return session
+
+def _response_bytes(response: 'requests.Response', stream: bool):
+    """Returns the response body size, from the Content-Length header if the body is streamed."""
+    if (not stream):
+        return len(response.content)
+    try:
+        return int(response.headers.get('Content-Length', 0))
+    except ValueError:
+        return 0
+
+def _close_all():
+    """Closes all pooled sessions, expects _lock to be held by the caller."""
+    for session in _sessions.values():
+        session.close()
+    _sessions.clear()
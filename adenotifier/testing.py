@@ -0,0 +1,329 @@
+import datetime
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from typing import List, Set, Dict, Tuple, Optional
+
+_PATH = re.compile(r'^(?P<base>.*)/tenants/local/installations/local/environments/local/source-systems/(?P<system>[^/]+)/source-entities/(?P<entity>[^/]+)/manifests(?:/(?P<id>[^/]+)(?:/(?P<action>entries|notify))?)?/?$')
+
+class FakeNotifyApi:
+    """Local in-memory stand-in for ADE Notify API for tests and benchmarks, implementing the manifest, entries, notify and search
+    endpoints used by the Manifest class and the notifier functions.
+
+    Latency, errors and throttling can be injected to test retries and measure behaviour under load:
+
+        with FakeNotifyApi(latency=0.02, throttle_rate=0.01) as api:
+            notifier.add_to_manifest(file_url, source, api.base_url, "key", "secret")
+            print(api.request_counts)
+
+    """
+    __lock: threading.Lock = None
+    __random: random.Random = None
+    __server: ThreadingHTTPServer = None
+    __thread: threading.Thread = None
+    __manifests: Dict[str, dict] = None
+    __entries: Dict[str, List[dict]] = None
+    __next_id: int = None
+    __last_created: datetime.datetime = None
+    __tokens: float = None
+    __tokens_updated: float = None
+
+    host: str = None
+    port: int = None
+    latency: float = None
+    latency_jitter: float = None
+    error_rate: float = None
+    error_status: int = None
+    throttle_rate: float = None
+    retry_after: float = None
+    max_requests_per_second: float = None
+    conditional_requests: bool = None
+    request_counts: Dict[str, int] = None
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0, latency_jitter: float = 0, error_rate: float = 0, error_status: int = 503,
+                 throttle_rate: float = 0, retry_after: float = 1, max_requests_per_second: float = None, seed: int = None, conditional_requests: bool = True):
+        """Class constructor.
+
+        Args:
+            host (str, optional): Host to bind to.
+            port (int, optional): Port to bind to, by default a free port.
+            latency (float, optional): Response delay in seconds.
+            latency_jitter (float, optional): Random additional response delay between 0 and the given seconds.
+            error_rate (float, optional): Share of requests failed with error_status, between 0 and 1.
+            error_status (int, optional): HTTP status code of injected errors.
+            throttle_rate (float, optional): Share of requests throttled with HTTP 429, between 0 and 1.
+            retry_after (float, optional): Retry-After header value in seconds of throttled responses.
+            max_requests_per_second (float, optional): Requests above the given rate are throttled with HTTP 429.
+            seed (int, optional): Random seed for reproducible error injection.
+            conditional_requests (bool, optional): Send ETag headers and answer GET requests with a matching If-None-Match with HTTP 304.
+
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.max_requests_per_second = max_requests_per_second
+        self.conditional_requests = conditional_requests
+        self.__lock = threading.Lock()
+        self.__random = random.Random(seed)
+        self.reset()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def base_url(self):
+        return "http://{0}:{1}/notify-api".format(self.host, self.port)
+
+    def start(self):
+        """Starts serving in a background thread.
+
+        Returns:
+            Str ADE Notify API base url of the server.
+
+        """
+        self.__server = ThreadingHTTPServer((self.host, self.port), _handler(self))
+        self.__server.daemon_threads = True
+        self.port = self.__server.server_address[1]
+        self.__thread = threading.Thread(target=self.__server.serve_forever, name="FakeNotifyApi", daemon=True)
+        self.__thread.start()
+        return self.base_url
+
+    def stop(self):
+        """Stops the server."""
+        if (self.__server != None):
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__thread.join()
+            self.__server = None
+
+    def reset(self):
+        """Removes all manifests and resets request counts."""
+        with self.__lock:
+            self.__manifests = {}
+            self.__entries = {}
+            self.__next_id = 1
+            self.__last_created = None
+            self.__tokens = self.max_requests_per_second
+            self.__tokens_updated = time.monotonic()
+            self.request_counts = {}
+
+    def manifests(self, source_system_name: str = None, source_entity_name: str = None, state: str = None):
+        """Returns stored manifests in created order.
+
+        Args:
+            source_system_name (str, optional): Filter by source system.
+            source_entity_name (str, optional): Filter by source entity.
+            state (str, optional): Filter by manifest state.
+
+        Returns:
+            List [dict] of manifest JSON objects.
+
+        """
+        with self.__lock:
+            return [dict(manifest) for manifest in self.__manifests.values() if self.__matches(manifest, source_system_name, source_entity_name, state)]
+
+    def entries(self, id: str):
+        """Returns the entries of a stored manifest.
+
+        Args:
+            id (str): Manifest id.
+
+        Returns:
+            List [dict] of manifest entry JSON objects.
+
+        """
+        with self.__lock:
+            return list(self.__entries[id])
+
+    def set_state(self, id: str, state: str):
+        """Sets the state of a stored manifest, e.g. to simulate a load that has completed or failed.
+
+        Args:
+            id (str): Manifest id.
+            state (str): Manifest state, e.g. "FAILED".
+
+        """
+        with self.__lock:
+            manifest = self.__manifests[id]
+            manifest['state'] = state
+            manifest['modified'] = self.__created()
+
+    def __matches(self, manifest: dict, source_system_name: str, source_entity_name: str, state: str):
+        """Returns True if the manifest matches the given filters. Expects __lock to be held."""
+        system, entity = manifest['_source']
+        return (source_system_name == None or system == source_system_name) and (source_entity_name == None or entity == source_entity_name)\
+            and (state == None or manifest['state'] == state)
+
+    def __created(self):
+        """Returns a strictly increasing created timestamp. Expects __lock to be held."""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        if (self.__last_created != None and now <= self.__last_created):
+            now = self.__last_created + datetime.timedelta(microseconds=1)
+        self.__last_created = now
+        return now.isoformat(timespec='microseconds').replace('+00:00', 'Z')
+
+    def fault(self, endpoint: str):
+        """Returns an injected (status, headers) response for a request or None to serve the request normally.
+
+        Args:
+            endpoint (str): Endpoint name, e.g. "add_entry".
+
+        """
+        with self.__lock:
+            self.request_counts[endpoint] = self.request_counts.get(endpoint, 0) + 1
+
+            if (self.max_requests_per_second != None):
+                now = time.monotonic()
+                self.__tokens = min(self.max_requests_per_second, self.__tokens + (now - self.__tokens_updated) * self.max_requests_per_second)
+                self.__tokens_updated = now
+                if (self.__tokens < 1):
+                    return (429, {'Retry-After': str(self.retry_after)})
+                self.__tokens -= 1
+
+            draw = self.__random.random()
+            delay = self.latency + (self.__random.uniform(0, self.latency_jitter) if self.latency_jitter > 0 else 0)
+
+        if (delay > 0):
+            time.sleep(delay)
+
+        if (draw < self.throttle_rate):
+            return (429, {'Retry-After': str(self.retry_after)})
+        if (draw < self.throttle_rate + self.error_rate):
+            return (self.error_status, {})
+
+        return None
+
+    def handle(self, method: str, system: str, entity: str, id: str, action: str, query: dict, body: object):
+        """Serves a request to the stored manifests.
+
+        Returns:
+            Tuple (int, object) of HTTP status code and response JSON body.
+
+        """
+        with self.__lock:
+            if (id == None):
+                if (method == 'POST'):
+                    created = self.__created()
+                    manifest = {'id': str(self.__next_id), 'state': 'OPEN', 'created': created, 'modified': created, 'format': None, 'batch': None,
+                                'columns': None, 'compression': None, 'delim': None, 'fullscanned': None, 'skiph': None}
+                    manifest.update(body or {})
+                    manifest['_source'] = (system, entity)
+                    self.__next_id += 1
+                    self.__manifests[manifest['id']] = manifest
+                    self.__entries[manifest['id']] = []
+                    return (201, _public(manifest))
+
+                state = query.get('state', [None])[0]
+                return (200, [_public(manifest) for manifest in self.__manifests.values() if self.__matches(manifest, system, entity, state)])
+
+            manifest = self.__manifests.get(id)
+            if (manifest == None or manifest['_source'] != (system, entity)):
+                return (404, {'message': 'Manifest {0} not found'.format(id)})
+
+            if (action == None):
+                return (200, _public(manifest))
+
+            if (action == 'entries' and method == 'GET'):
+                return (200, self.__entries[id])
+
+            if (manifest['state'] != 'OPEN'):
+                return (400, {'message': 'Manifest {0} is {1}'.format(id, manifest['state'])})
+
+            if (action == 'notify'):
+                manifest['state'] = 'NOTIFIED'
+            elif (method == 'POST'):
+                self.__entries[id].append(body)
+            else:
+                self.__entries[id] = list(body)
+
+            manifest['modified'] = self.__created()
+            return (200, {})
+
+def _public(manifest: dict):
+    """Returns a manifest JSON object without internal keys."""
+    return {key: value for key, value in manifest.items() if key != '_source'}
+
+def _endpoint(method: str, id: str, action: str):
+    """Returns the endpoint name of a request, see metrics.ENDPOINT_TEMPLATES."""
+    if (id == None):
+        return 'create' if method == 'POST' else 'search_manifests'
+    if (action == None):
+        return 'fetch_manifest'
+    if (action == 'notify'):
+        return 'notify'
+    return {'GET': 'fetch_manifest_entries', 'POST': 'add_entry', 'PUT': 'add_entries'}.get(method)
+
+def _handler(api: FakeNotifyApi):
+    """Returns a request handler class serving the given FakeNotifyApi."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True # Headers and body are written separately, avoid delayed ACK stalls on keep-alive connections.
+
+        def log_message(self, format, *args):
+            pass
+
+        def __respond(self, status: int, body: object = None, headers: dict = {}):
+            content = json.dumps(body).encode('utf-8') if body != None else b''
+
+            if (self.command == 'GET' and status == 200 and api.conditional_requests):
+                etag = '"{0}"'.format(hashlib.sha1(content).hexdigest())
+                headers = dict(headers, ETag=etag)
+                if (self.headers.get('If-None-Match') == etag):
+                    status, content = 304, b''
+
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            if (status != 304):
+                self.send_header('Content-Length', str(len(content)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(content)
+
+        def __serve(self, method: str):
+            length = int(self.headers.get('Content-Length') or 0)
+            content = self.rfile.read(length) if length > 0 else b''
+            url = urlsplit(self.path)
+            match = _PATH.match(url.path)
+
+            if (match == None):
+                return self.__respond(404, {'message': 'Not found'})
+
+            id, action = match.group('id'), match.group('action')
+            fault = api.fault(_endpoint(method, id, action))
+            if (fault != None):
+                return self.__respond(fault[0], {'message': 'Injected error'}, fault[1])
+
+            try:
+                body = json.loads(content) if content else None
+            except ValueError:
+                return self.__respond(400, {'message': 'Invalid JSON'})
+
+            status, response_body = api.handle(method, match.group('system'), match.group('entity'), id, action, parse_qs(url.query), body)
+            self.__respond(status, response_body)
+
+        def do_GET(self):
+            self.__serve('GET')
+
+        def do_POST(self):
+            self.__serve('POST')
+
+        def do_PUT(self):
+            self.__serve('PUT')
+
+    return Handler
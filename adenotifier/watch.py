@@ -0,0 +1,270 @@
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .cache import ResponseCache
+from .manifest import Manifest
+from .session import get_session, send_conditional
+from typing import List, Set, Dict, Tuple, Optional, Callable, Iterable
+
+class ManifestEvent:
+    """State change of a manifest, e.g. from OPEN to NOTIFIED or from NOTIFIED to FAILED."""
+    id: str = None
+    source_system_name: str = None
+    source_entity_name: str = None
+    previous_state: str = None
+    state: str = None
+    modified: str = None
+
+    def __init__(self, id: str, source_system_name: str, source_entity_name: str, previous_state: str, state: str, modified: str):
+        self.id = id
+        self.source_system_name = source_system_name
+        self.source_entity_name = source_entity_name
+        self.previous_state = previous_state
+        self.state = state
+        self.modified = modified
+
+    def __repr__(self):
+        return 'ManifestEvent(id={0!r}, source={1}/{2}, {3} -> {4})'.format(self.id, self.source_system_name, self.source_entity_name, self.previous_state, self.state)
+
+class ManifestWatcher:
+    """Polls manifests and reports state changes only, e.g. to monitor failed loads of thousands of manifests.
+
+    Whole data sources are watched with one search call per source and poll, and single manifests with one fetch call per
+    manifest. Requests are conditional where supported by ADE Notify API, so an unchanged search result or manifest is
+    answered with HTTP 304 without a body. Manifests whose modified timestamp has not changed are not compared further.
+    Manifests found on the first poll of a source are reported only when their state changes, manifests created later
+    are reported with previous_state None.
+
+    Usage:
+        with ManifestWatcher(base_url, notify_api_key, notify_api_key_secret, poll_interval = 60, callback = handle) as watcher:
+            watcher.watch_source('system', 'entity')
+            ...
+    """
+    __base_url: str = None
+    __notify_api_key: str = None
+    __notify_api_key_secret: str = None
+    __lock: threading.Lock = None
+    __states: Dict[str, Tuple[str, str]] = None # Last seen (state, modified) by manifest id.
+    __sources: Dict[Tuple[str, str], dict] = None
+    __manifests: Dict[str, Manifest] = None
+    __stopped: threading.Event = None
+    __thread: threading.Thread = None
+    __executor: ThreadPoolExecutor = None
+
+    poll_interval: float = None
+    max_workers: int = None
+    cache: ResponseCache = None
+    callback: Callable[[ManifestEvent], None] = None
+    final_states: Set[str] = None
+
+    def __init__(self, base_url: str, notify_api_key: str, notify_api_key_secret: str, poll_interval: float = 60, max_workers: int = 10,
+                 cache: ResponseCache = None, callback: Callable[[ManifestEvent], None] = None, final_states: Iterable[str] = ('ARCHIVED',)):
+        """Class constructor.
+
+        Args:
+            base_url (str): ADE Notify API base url, e.g. https://external-api.{environment}.datahub.{tenant}.saas.agiledataengine.com:443/notify-api.
+            notify_api_key (str): ADE Notify API key.
+            notify_api_key_secret (str): ADE Notify API key secret.
+            poll_interval (float, optional): Seconds between polls of the background thread.
+            max_workers (int, optional): Number of sources and manifests polled in parallel.
+            cache (ResponseCache, optional): Cache of search responses for conditional requests, by default one per watcher.
+            callback (callable, optional): Function called with each ManifestEvent.
+            final_states (iterable[str], optional): Single manifests reaching these states are not watched anymore.
+
+        """
+        self.__base_url = base_url
+        self.__notify_api_key = notify_api_key
+        self.__notify_api_key_secret = notify_api_key_secret
+        self.__lock = threading.Lock()
+        self.__states = {}
+        self.__sources = {}
+        self.__manifests = {}
+        self.__stopped = threading.Event()
+        self.poll_interval = poll_interval
+        self.max_workers = max_workers
+        self.cache = cache if cache != None else ResponseCache()
+        self.callback = callback
+        self.final_states = set(final_states)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def watch(self, manifest: Manifest):
+        """Watches a single manifest. Watch a data source with watch_source instead of its manifests one by one.
+
+        Args:
+            manifest (Manifest): Manifest with id set. Its current state, if fetched or created, is the state changes are reported from.
+
+        Raises:
+            ValueError if manifest id is not set.
+
+        """
+        if (manifest.id == None):
+            raise ValueError("Manifest id = None. Create or get manifest before watching.")
+
+        with self.__lock:
+            self.__manifests[manifest.id] = manifest
+            if (manifest.state != None and manifest.id not in self.__states):
+                self.__states[manifest.id] = (manifest.state, manifest.modified)
+
+    def watch_source(self, source_system_name: str, source_entity_name: str, state: str = ""):
+        """Watches all manifests of a data source.
+
+        Args:
+            source_system_name (str): Source system name defined in ADE source entity.
+            source_entity_name (str): ADE source entity name.
+            state (str, optional): Manifest state filtered by ADE Notify API, e.g. "OPEN", empty for all states. Manifests leaving
+                the filtered state are fetched once to report their new state.
+
+        """
+        with self.__lock:
+            self.__sources[(source_system_name, source_entity_name)] = {'state': state.upper(), 'ids': set(), 'initialized': False}
+
+    def unwatch(self, manifest_id: str):
+        """Stops watching a single manifest."""
+        with self.__lock:
+            if (self.__manifests.pop(manifest_id, None) != None):
+                self.__states.pop(manifest_id, None)
+
+    def unwatch_source(self, source_system_name: str, source_entity_name: str):
+        """Stops watching the manifests of a data source."""
+        with self.__lock:
+            source = self.__sources.pop((source_system_name, source_entity_name), None)
+            for id in (source['ids'] if source != None else []):
+                if (id not in self.__manifests):
+                    self.__states.pop(id, None)
+
+    def __update(self, id: str, source_system_name: str, source_entity_name: str, state: str, modified: str, report_new: bool):
+        """Records the state of a manifest.
+
+        Returns:
+            ManifestEvent if the state changed, otherwise None.
+
+        """
+        with self.__lock:
+            previous = self.__states.get(id)
+            self.__states[id] = (state, modified)
+
+        if (previous == None):
+            return ManifestEvent(id, source_system_name, source_entity_name, None, state, modified) if report_new else None
+        if (previous[1] == modified or previous[0] == state):
+            return None
+        return ManifestEvent(id, source_system_name, source_entity_name, previous[0], state, modified)
+
+    def __poll_source(self, source_system_name: str, source_entity_name: str):
+        """Searches the manifests of a source with a conditional request and returns their state changes."""
+        with self.__lock:
+            source = self.__sources.get((source_system_name, source_entity_name))
+        if (source == None):
+            return []
+
+        session = get_session(self.__base_url, self.__notify_api_key, self.__notify_api_key_secret)
+        request_url = "{0}/tenants/local/installations/local/environments/local/source-systems/{1}/source-entities/{2}/manifests"\
+            .format(self.__base_url, source_system_name, source_entity_name)
+        params = {'state': source['state']} if source['state'] != "" else {}
+
+        content, modified = send_conditional(session, self.__base_url, request_url, self.cache, params=params, endpoint="search_manifests")
+        if (not modified and source['initialized']):
+            return []
+
+        events = []
+        ids = set()
+
+        for manifest in json.loads(content):
+            ids.add(manifest['id'])
+            events.append(self.__update(manifest['id'], source_system_name, source_entity_name, manifest['state'], manifest['modified'], source['initialized']))
+
+        for id in source['ids'] - ids:
+            if (source['state'] != ""):
+                # Left the filtered state, fetched once to report the new state.
+                manifest = Manifest(self.__base_url, source_system_name, source_entity_name, None, self.__notify_api_key, self.__notify_api_key_secret, id)
+                try:
+                    manifest.fetch_manifest()
+                    events.append(self.__update(id, source_system_name, source_entity_name, manifest.state, manifest.modified, True))
+                except Exception as e:
+                    logging.warning('Fetching manifest {0} of source {1}/{2} failed:\n{3}'.format(id, source_system_name, source_entity_name, e))
+
+            with self.__lock:
+                if (id not in self.__manifests):
+                    self.__states.pop(id, None)
+
+        source['ids'] = ids
+        source['initialized'] = True
+        return [event for event in events if event != None]
+
+    def __poll_manifest(self, id: str):
+        """Fetches a single manifest with a conditional request and returns its state change."""
+        with self.__lock:
+            manifest = self.__manifests.get(id)
+            known = id in self.__states
+        if (manifest == None):
+            return []
+
+        if (not manifest.fetch_manifest_if_modified() and known):
+            return []
+
+        event = self.__update(id, manifest.source_system_name, manifest.source_entity_name, manifest.state, manifest.modified, False)
+
+        if (manifest.state in self.final_states):
+            self.unwatch(id)
+
+        return [event] if event != None else []
+
+    def __poll(self, target: tuple):
+        """Polls a source (system, entity) or a single manifest (id,), logging errors."""
+        try:
+            return self.__poll_source(*target) if len(target) == 2 else self.__poll_manifest(*target)
+        except Exception as e:
+            logging.warning('Polling manifests of {0} failed:\n{1}'.format('/'.join(target), e))
+            return []
+
+    def poll(self):
+        """Polls all watched sources and manifests once, e.g. from an external timer instead of the background thread.
+
+        Returns:
+            List [ManifestEvent] of state changes since the previous poll.
+
+        """
+        with self.__lock:
+            targets = list(self.__sources) + [(id,) for id in self.__manifests]
+            if (self.__executor == None):
+                self.__executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ManifestWatcher')
+
+        events = [event for events in self.__executor.map(self.__poll, targets) for event in events]
+
+        if (self.callback != None):
+            for event in events:
+                try:
+                    self.callback(event)
+                except Exception as e:
+                    logging.warning('Manifest event callback failed for {0}:\n{1}'.format(event, e))
+
+        return events
+
+    def __run(self):
+        """Background thread polling every poll_interval seconds."""
+        while (not self.__stopped.is_set()):
+            self.poll()
+            self.__stopped.wait(self.poll_interval)
+
+    def start(self):
+        """Starts the background thread."""
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.__run, name='ManifestWatcher', daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """Stops the background thread and waits for a running poll to finish."""
+        self.__stopped.set()
+        if (self.__thread != None):
+            self.__thread.join()
+            self.__thread = None
+        with self.__lock:
+            executor, self.__executor = self.__executor, None
+        if (executor != None):
+            executor.shutdown(wait=True)
@@ -0,0 +1,85 @@
+"""Startup benchmark of adenotifier, measuring what a serverless cold start pays before and during the first call.
+
+Each run starts a fresh Python process, which imports the module, calls add_to_manifest once (cold) and again (warm)
+against a local FakeNotifyApi, and reports the times and the heavy modules loaded by the import. Run from the repository root, e.g.:
+
+    python benchmarks/import_benchmark.py --runs 20
+    python benchmarks/import_benchmark.py --budget-ms 60 --json startup.json
+
+With --budget-ms the exit code is 1 if the median import time exceeds the budget or a module listed in --lazy-modules is
+loaded by the import, so that the startup budget can be checked before release.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from adenotifier.testing import FakeNotifyApi
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+LAZY_MODULES = ['requests', 'urllib3', 'asyncio', 'multiprocessing', 'email.utils', 'opentelemetry']
+
+# Runs in the measured process, prints the results as JSON.
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+loaded = [name for name in {lazy_modules!r} if name in sys.modules]
+from adenotifier import notifier
+source = {{'id': 'startup', 'attributes': {{'ade_source_system': 'startup', 'ade_source_entity': 'startup'}}, 'manifest_parameters': {{'format': 'CSV'}}}}
+call_start = time.perf_counter()
+notifier.add_to_manifest('file_0.csv', source, {base_url!r}, 'key', 'secret')
+cold = time.perf_counter()
+notifier.add_to_manifest('file_1.csv', source, {base_url!r}, 'key', 'secret')
+warm = time.perf_counter()
+print(json.dumps({{'import_ms': (imported - start) * 1000, 'cold_call_ms': (cold - call_start) * 1000, 'warm_call_ms': (warm - cold) * 1000, 'loaded': loaded}}))
+'''
+
+def run(base_url, module, runs):
+    """Runs the probe in fresh processes and returns the median times."""
+    samples = []
+    probe = PROBE.format(module=module, lazy_modules=LAZY_MODULES, base_url=base_url)
+
+    for i in range(runs):
+        output = subprocess.run([sys.executable, '-c', probe], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    return {
+        'module': module,
+        'runs': runs,
+        'import_ms': round(statistics.median(sample['import_ms'] for sample in samples), 2),
+        'cold_call_ms': round(statistics.median(sample['cold_call_ms'] for sample in samples), 2),
+        'warm_call_ms': round(statistics.median(sample['warm_call_ms'] for sample in samples), 2),
+        'loaded_by_import': samples[0]['loaded']
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark adenotifier import time and first call latency in fresh processes.')
+    parser.add_argument('--module', default='adenotifier.notifier', help='Module imported by the measured process.')
+    parser.add_argument('--runs', type=int, default=10, help='Number of fresh processes.')
+    parser.add_argument('--budget-ms', type=float, default=None, help='Fail if the median import time exceeds the given milliseconds.')
+    parser.add_argument('--json', help='Write results to the given JSON file.')
+    args = parser.parse_args()
+
+    with FakeNotifyApi() as api:
+        result = run(api.base_url, args.module, args.runs)
+
+    print('{module}: import {import_ms} ms  cold add_to_manifest {cold_call_ms} ms  warm add_to_manifest {warm_call_ms} ms  '
+          'median of {runs} runs'.format(**result))
+    print('Heavy modules loaded by import: {0}'.format(', '.join(result['loaded_by_import']) or 'none'))
+
+    if (args.json != None):
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump({'arguments': vars(args), 'result': result}, file, indent=2)
+
+    if (args.budget_ms != None and (result['import_ms'] > args.budget_ms or result['loaded_by_import'] != [])):
+        print('Startup budget exceeded.')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Load benchmark of the notifier functions against a local FakeNotifyApi.
+
+Measures throughput and latency of add_to_manifest, add_multiple_entries_to_manifest and notify_manifests with concurrent
+workers, and the number of ADE Notify API calls per operation. Run from the repository root, e.g.:
+
+    python benchmarks/notify_benchmark.py --workers 16 --sources 8 --operations 2000 --latency 0.005
+    python benchmarks/notify_benchmark.py --scenario add_to_manifest --throttle-rate 0.05 --json results.json
+
+Compare results of the same arguments between versions to catch performance changes before release.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from adenotifier import notifier
+from adenotifier.cache import ManifestStateCache
+from adenotifier.config import SourceConfig
+from adenotifier.session import configure_sessions
+from adenotifier.testing import FakeNotifyApi
+
+SCENARIOS = ['add_to_manifest', 'add_multiple_entries_to_manifest', 'notify_manifests']
+KEY = 'benchmark'
+SECRET = 'benchmark'
+
+def build_sources(count, max_files_in_manifest=None):
+    """Returns benchmark data source configurations."""
+    sources = []
+    for i in range(count):
+        attributes = {
+            'ade_source_system': 'benchmark',
+            'ade_source_entity': 'entity_{0}'.format(i),
+            'batch_from_file_path_regex': r'batch_(\d+)'
+        }
+        if (max_files_in_manifest != None):
+            attributes['max_files_in_manifest'] = max_files_in_manifest
+        sources.append(SourceConfig({
+            'id': 'benchmark/entity_{0}'.format(i),
+            'attributes': attributes,
+            'manifest_parameters': {'format': 'CSV', 'delim': 'COMMA', 'skiph': 1}
+        }))
+    return sources
+
+def file_url(source, i):
+    return 'https://storage.example.com/{0}/{1}/batch_{2}/file_{2}.csv'.format(source.ade_source_system, source.ade_source_entity, i)
+
+def percentile(sorted_values, q):
+    if (sorted_values == []):
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+def run(api, scenario, operations, workers, sources, entries_per_call, use_cache):
+    """Runs a scenario and returns its results."""
+    cache = ManifestStateCache() if use_cache else None
+
+    if (scenario == 'add_to_manifest'):
+        tasks = [(lambda i=i: notifier.add_to_manifest(file_url(sources[i % len(sources)], i), sources[i % len(sources)], api.base_url, KEY, SECRET, cache=cache))
+                 for i in range(operations)]
+    elif (scenario == 'add_multiple_entries_to_manifest'):
+        tasks = [(lambda i=i: notifier.add_multiple_entries_to_manifest(
+                    [{'sourceFile': file_url(sources[i % len(sources)], i * entries_per_call + j)} for j in range(entries_per_call)],
+                    sources[i % len(sources)], api.base_url, KEY, SECRET))
+                 for i in range(operations)]
+    else:
+        # Open manifests to notify, created before measuring.
+        for i in range(operations):
+            source = sources[i % len(sources)]
+            source.new_manifest(api.base_url, KEY, SECRET).create()
+        tasks = [(lambda source=source: notifier.notify_manifests(source, api.base_url, KEY, SECRET)) for source in sources]
+
+    api.request_counts = {}
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def measure(task):
+        start = time.perf_counter()
+        try:
+            task()
+        except Exception as e:
+            with lock:
+                errors.append(repr(e))
+            return
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(measure, tasks))
+    duration = time.perf_counter() - start
+
+    latencies.sort()
+    requests = sum(api.request_counts.values())
+
+    return {
+        'scenario': scenario,
+        'operations': len(tasks),
+        'workers': workers,
+        'errors': len(errors),
+        'duration_s': round(duration, 3),
+        'throughput_ops_s': round(len(latencies) / duration, 1) if duration > 0 else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        'api_requests': requests,
+        'api_requests_per_op': round(requests / len(tasks), 2) if tasks else None,
+        'api_requests_by_endpoint': dict(sorted(api.request_counts.items())),
+        'sample_errors': errors[:3]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark adenotifier against a local fake ADE Notify API.')
+    parser.add_argument('--scenario', choices=SCENARIOS + ['all'], default='all')
+    parser.add_argument('--operations', type=int, default=1000, help='Number of calls, or open manifests to notify in notify_manifests.')
+    parser.add_argument('--workers', type=int, default=8, help='Number of concurrent worker threads.')
+    parser.add_argument('--sources', type=int, default=4, help='Number of data sources the calls are spread over.')
+    parser.add_argument('--entries-per-call', type=int, default=100, help='Entries per add_multiple_entries_to_manifest call.')
+    parser.add_argument('--max-files-in-manifest', type=int, default=None)
+    parser.add_argument('--cache', action='store_true', help='Use a ManifestStateCache with add_to_manifest.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Server response delay in seconds.')
+    parser.add_argument('--latency-jitter', type=float, default=0.0, help='Random additional server response delay in seconds.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests failed with HTTP 503.')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of requests throttled with HTTP 429.')
+    parser.add_argument('--retry-after', type=float, default=0.1, help='Retry-After of throttled responses in seconds.')
+    parser.add_argument('--max-rps', type=float, default=None, help='Server-side request rate limit, requests above it get HTTP 429.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='Write results to the given JSON file.')
+    args = parser.parse_args()
+
+    configure_sessions(pool_maxsize=max(10, args.workers))
+    sources = build_sources(args.sources, args.max_files_in_manifest)
+    scenarios = SCENARIOS if args.scenario == 'all' else [args.scenario]
+    results = []
+
+    for scenario in scenarios:
+        with FakeNotifyApi(latency=args.latency, latency_jitter=args.latency_jitter, error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                           retry_after=args.retry_after, max_requests_per_second=args.max_rps, seed=args.seed) as api:
+            result = run(api, scenario, args.operations, args.workers, sources, args.entries_per_call, args.cache)
+        results.append(result)
+        print('{scenario:34} {operations:6} ops {throughput_ops_s:>9} ops/s  p50 {p50_ms} ms  p95 {p95_ms} ms  p99 {p99_ms} ms  '
+              '{api_requests_per_op} req/op  {errors} errors'.format(**result))
+
+    if (args.json != None):
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump({'arguments': vars(args), 'results': results}, file, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -16,5 +16,12 @@ setuptools.setup(
     license='MIT',
     packages=['adenotifier'],
     py_modules=['manifest', 'notifier'],
-    install_requires=['requests']
+    install_requires=['requests'],
+    extras_require={
+        'async': ['aiohttp'],
+        'otel': ['opentelemetry-api']
+    },
+    entry_points={
+        'console_scripts': ['adenotifier=adenotifier.cli:main']
+    }
 )
\ No newline at end of file
@@ -0,0 +1,37 @@
+import pytest
+from adenotifier.ratelimit import RetryPolicy
+from adenotifier.session import DEFAULT_RETRY, close_sessions, configure_sessions
+from adenotifier.testing import FakeNotifyApi
+
+KEY = 'test'
+SECRET = 'test'
+
+@pytest.fixture(scope='module')
+def server():
+    with FakeNotifyApi(seed=1) as api:
+        yield api
+
+@pytest.fixture
+def api(server):
+    """Empty FakeNotifyApi without injected errors, with requests failing at once instead of after retries."""
+    configure_sessions(retry=RetryPolicy(total=0))
+    server.reset()
+    yield server
+    # Handlers replaced by a test are set on the instance.
+    server.__dict__.pop('handle', None)
+    server.error_rate = 0
+    close_sessions()
+    configure_sessions(retry=DEFAULT_RETRY)
+
+@pytest.fixture
+def source():
+    return {
+        'id': 'test',
+        'attributes': {
+            'ade_source_system': 'system',
+            'ade_source_entity': 'entity'
+        },
+        'manifest_parameters': {
+            'format': 'CSV'
+        }
+    }
@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+import pytest
+from adenotifier import notifier
+from adenotifier.dedup import BloomDedupStore, DedupIndex, SQLiteDedupStore
+from conftest import KEY, SECRET
+
+FILE_URL = 'azure://container/a.csv'
+
+@pytest.fixture(params=['memory', 'sqlite', 'bloom'])
+def store(request, tmp_path):
+    if (request.param == 'sqlite'):
+        return lambda: SQLiteDedupStore(str(tmp_path / 'dedup.db'))
+    if (request.param == 'bloom'):
+        return lambda: BloomDedupStore(str(tmp_path / 'dedup.bloom'), capacity=1000)
+    return lambda: None
+
+def test_commit_and_discard(source, store):
+    with DedupIndex(store=store()) as dedup:
+        assert dedup.add(source, FILE_URL)
+        dedup.discard(source, FILE_URL)
+
+        # A discarded file is not seen, so that a retried event is added.
+        assert dedup.add(source, FILE_URL)
+        dedup.commit(source, FILE_URL)
+        assert not dedup.add(source, FILE_URL)
+        assert dedup.filter([FILE_URL, 'azure://container/b.csv', 'azure://container/b.csv'], source) == ['azure://container/b.csv']
+        dedup.discard_many(['azure://container/b.csv'], source)
+
+def test_committed_keys_persist(source, store):
+    dedup = DedupIndex(store=store())
+    assert dedup.add(source, FILE_URL)
+    dedup.commit(source, FILE_URL)
+    dedup.close()
+
+    # Keys evicted from the in-memory index or seen by earlier runs are found in the store.
+    reopened = DedupIndex(max_size=0, store=store())
+    assert reopened.add(source, FILE_URL) == (reopened.store == None)
+    reopened.close()
+
+def test_bloom_store_never_records_discarded_keys(source, tmp_path):
+    with DedupIndex(max_size=0, store=BloomDedupStore(str(tmp_path / 'dedup.bloom'), capacity=1000)) as dedup:
+        for _ in range(3):
+            assert dedup.add(source, FILE_URL)
+            dedup.discard(source, FILE_URL)
+        assert dedup.store.count == 0
+
+def test_duplicate_waits_for_reservation(source):
+    dedup = DedupIndex()
+    results = []
+    assert dedup.add(source, FILE_URL)
+
+    thread = threading.Thread(target=lambda: results.append(dedup.add(source, FILE_URL)))
+    thread.start()
+    time.sleep(0.1)
+    assert results == []
+
+    # The duplicate is reserved in turn when the first call fails.
+    dedup.discard(source, FILE_URL)
+    thread.join()
+    assert results == [True]
+
+    thread = threading.Thread(target=lambda: results.append(dedup.add(source, FILE_URL)))
+    thread.start()
+    dedup.commit(source, FILE_URL)
+    thread.join()
+    assert results == [True, False]
+
+def test_duplicate_wait_times_out(source):
+    dedup = DedupIndex(wait_timeout=0.05)
+    assert dedup.add(source, FILE_URL)
+
+    with pytest.raises(TimeoutError):
+        dedup.add(source, FILE_URL)
+
+def test_failed_add_to_manifest_is_retried(api, source):
+    dedup = DedupIndex()
+    api.error_rate = 1
+
+    with pytest.raises(Exception):
+        notifier.add_to_manifest(FILE_URL, source, api.base_url, KEY, SECRET, dedup=dedup)
+
+    api.error_rate = 0
+    notifier.add_to_manifest(FILE_URL, source, api.base_url, KEY, SECRET, dedup=dedup)
+    assert api.entries(api.manifests()[0]['id']) == [{'sourceFile': FILE_URL}]
+
+def test_seed_with_open_manifests(api, source):
+    notifier.add_to_manifest(FILE_URL, source, api.base_url, KEY, SECRET)
+    dedup = DedupIndex()
+
+    assert dedup.seed(source, api.base_url, KEY, SECRET) == 1
+    assert not dedup.add(source, FILE_URL)
+
+def test_bloom_store_keeps_committed_keys_without_close(source, tmp_path):
+    path = str(tmp_path / 'dedup.bloom')
+    store = BloomDedupStore(path)
+    assert os.path.getsize(path) < 4000000
+
+    dedup = DedupIndex(store=store)
+    assert dedup.add(source, FILE_URL)
+    dedup.commit(source, FILE_URL)
+    dedup.filter(['azure://container/{0}.csv'.format(i) for i in range(10000)], source)
+    dedup.commit_many(['azure://container/{0}.csv'.format(i) for i in range(10000)], source)
+
+    # Reopened without closing, e.g. after a crash.
+    reopened = BloomDedupStore(path)
+    assert reopened.contains(DedupIndex.key(source, FILE_URL))
+    assert reopened.contains(DedupIndex.key(source, 'azure://container/9999.csv'))
+    assert reopened.count == store.count == 10001
+    assert not reopened.contains(DedupIndex.key(source, 'azure://container/b.csv'))
+    store.close()
+    reopened.close()
@@ -0,0 +1,112 @@
+import collections.abc
+import json
+from adenotifier.entries import EntryList, ManifestEntry, count_entries, diff_entries
+from adenotifier.manifest import Manifest
+from conftest import KEY, SECRET
+
+ENTRIES = [
+    {'sourceFile': 'azure://container/a.csv', 'batch': 1, 'contentLength': 10},
+    {'sourceFile': 'azure://container/ä.csv'},
+    {'sourceFile': 'azure://container/b.csv', 'batch': None, 'contentLength': 2 ** 70},
+    {'sourceFile': 'azure://container/c.csv', 'batch': 3, 'extra': {'x': [1]}}
+]
+
+def test_round_trip_of_json_and_dicts():
+    raw = json.dumps(ENTRIES).encode('utf-8')
+    entries = EntryList.from_json(raw)
+
+    assert len(entries) == 4
+    assert not entries.decoded
+    assert entries.to_list() == ENTRIES
+    assert entries.decoded
+    assert EntryList(ENTRIES).to_list() == ENTRIES
+    assert entries == EntryList(ENTRIES) == ENTRIES
+    assert json.loads(json.dumps(entries.to_list())) == ENTRIES
+
+def test_sequence_behaviour():
+    entries = EntryList(ENTRIES)
+
+    assert isinstance(entries, collections.abc.Sequence)
+    assert entries[-1]['sourceFile'] == 'azure://container/c.csv'
+    assert [entry['sourceFile'] for entry in entries[1:3]] == ['azure://container/ä.csv', 'azure://container/b.csv']
+    assert list(entries.source_files()) == [entry['sourceFile'] for entry in ENTRIES]
+    assert entries.index(ENTRIES[1]) == 1
+    assert ENTRIES[2] in entries
+    assert list(reversed(entries))[0] == ENTRIES[3]
+
+def test_entry_mapping_behaviour():
+    entries = EntryList(ENTRIES)
+
+    assert isinstance(entries[0], collections.abc.Mapping)
+    assert dict(entries[0]) == ENTRIES[0]
+    assert 'batch' not in entries[1]
+    assert entries[1].get('batch') == None
+    assert entries[1].get('batch', 0) == 0
+
+    # A key with a null value is present and returns None.
+    assert 'batch' in entries[2]
+    assert entries[2]['batch'] == None
+    assert entries[2].get('batch', 0) == None
+    assert entries[2]['contentLength'] == 2 ** 70
+    assert entries[3]['extra'] == {'x': [1]}
+    assert entries[0] == ManifestEntry('azure://container/a.csv', 1, 10)
+
+def test_count_entries():
+    assert count_entries(json.dumps(ENTRIES).encode('utf-8')) == 4
+    assert count_entries(b'[]') == 0
+
+def test_diff_plan():
+    current = EntryList(ENTRIES[:2])
+
+    diff = diff_entries(current, ENTRIES[:2])
+    assert diff.empty and diff.plan() == None
+
+    diff = diff_entries(current, [ENTRIES[2]])
+    assert diff.added == [ENTRIES[2]] and diff.entries == ENTRIES[:3]
+    assert diff.plan() == 'post'
+    assert diff.plan(max_posts=0) == 'put'
+
+    # Each POST costs a request, so adding many entries to a small manifest takes one PUT.
+    diff = diff_entries(current, ENTRIES[2:])
+    assert diff.plan(request_cost=0) == 'post'
+    assert diff.plan() == 'put'
+
+    diff = diff_entries(current, [{'sourceFile': 'azure://container/a.csv', 'batch': 2}])
+    assert diff.changed == [dict(ENTRIES[0], batch=2)]
+    assert diff.plan() == 'put'
+
+    diff = diff_entries(current, [ENTRIES[1]], replace=True)
+    assert diff.removed == [ENTRIES[0]] and diff.entries == [ENTRIES[1]]
+    assert diff.plan() == 'put'
+
+def test_sync_entries_requests(api):
+    manifest = Manifest(api.base_url, 'system', 'entity', 'CSV', KEY, SECRET)
+
+    assert manifest.sync_entries(ENTRIES[:2]).method == 'put'
+    assert api.request_counts == {'create': 1, 'add_entries': 1}
+    assert api.entries(manifest.id) == ENTRIES[:2]
+
+    assert manifest.sync_entries(ENTRIES[:2]).method == None
+    assert manifest.sync_entries(ENTRIES[:3]).method == 'post'
+    assert api.request_counts == {'create': 1, 'add_entries': 1, 'add_entry': 1}
+    assert api.entries(manifest.id) == ENTRIES[:3]
+
+    assert manifest.sync_entries(ENTRIES[1:2], replace=True).method == 'put'
+    assert api.request_counts == {'create': 1, 'add_entries': 2, 'add_entry': 1}
+    assert api.entries(manifest.id) == ENTRIES[1:2]
+
+    # Entries changed by another client are fetched on refresh.
+    Manifest(api.base_url, 'system', 'entity', 'CSV', KEY, SECRET, manifest.id).add_entries(ENTRIES[2:3])
+    assert manifest.sync_entries(ENTRIES[:1], refresh=True).method == 'post'
+    assert api.request_counts['fetch_manifest_entries'] == 1
+    assert api.entries(manifest.id) == [ENTRIES[2], ENTRIES[0]]
+
+def test_manifest_entries_are_dicts(api):
+    manifest = Manifest(api.base_url, 'system', 'entity', 'CSV', KEY, SECRET)
+    manifest.add_entries(ENTRIES)
+    manifest.fetch_manifest_entries()
+
+    assert isinstance(manifest.manifest_entries, list)
+    assert manifest.manifest_entries == ENTRIES
+    assert json.loads(json.dumps(manifest.manifest_entries)) == ENTRIES
+    assert isinstance(manifest.entry_list, EntryList)
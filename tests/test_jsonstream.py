@@ -0,0 +1,33 @@
+import json
+import pytest
+from adenotifier.jsonstream import iter_array
+
+def chunked(raw: bytes, size: int):
+    return [raw[i:i + size] for i in range(0, len(raw), size)]
+
+ITEMS = [{'id': '1', 'name': 'ä€😀'}, 3.5e2, -12, 'a,]b', None, True, [1, [2, {'x': ']'}]], {}]
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64, 65536])
+def test_items_across_chunk_sizes(size):
+    raw = json.dumps(ITEMS, ensure_ascii=False).encode('utf-8')
+    assert list(iter_array(chunked(raw, size))) == ITEMS
+
+@pytest.mark.parametrize('raw', [b'[]', b' [ ] ', b'\n[\n]\n'])
+def test_empty_array(raw):
+    assert list(iter_array(chunked(raw, 1))) == []
+
+def test_number_split_across_chunks():
+    assert list(iter_array([b'[12', b'34.5', b'e2,', b'6]'])) == [123450.0, 6]
+
+def test_number_at_end_of_input_without_bracket_raises():
+    with pytest.raises(ValueError):
+        list(iter_array([b'[1']))
+
+@pytest.mark.parametrize('raw', [b'[1,,2]', b'[1,]', b'[,1]', b'[1 2]', b'{"a": 1}', b'', b'[1, 2'])
+def test_malformed_input_raises(raw):
+    with pytest.raises(ValueError):
+        list(iter_array([raw]))
+
+def test_large_array_is_linear():
+    raw = json.dumps(list(range(100000))).encode('utf-8')
+    assert sum(1 for _ in iter_array(chunked(raw, 65536))) == 100000
@@ -0,0 +1,16 @@
+import subprocess
+import sys
+from adenotifier.metrics import measured
+
+def test_import_does_not_load_optional_modules():
+    probe = "import sys, adenotifier.notifier; print([name for name in ('opentelemetry', 'requests') if name in sys.modules])"
+    output = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == '[]'
+
+def test_measured_keeps_arguments():
+    @measured('test')
+    def function(entries, source, base_url = None):
+        return (entries, source, base_url)
+
+    assert function([], {'id': 'a'}, base_url='url') == ([], {'id': 'a'}, 'url')
+    assert function([], source={'id': 'a'}) == ([], {'id': 'a'}, None)
@@ -0,0 +1,83 @@
+import pytest
+from adenotifier import notifier
+from adenotifier.dedup import DedupIndex
+from conftest import KEY, SECRET
+
+def entries(count: int, start: int = 0):
+    return [{'sourceFile': 'azure://container/file_{0}.csv'.format(i)} for i in range(start, start + count)]
+
+def fail_filling(api, ids):
+    """Fails adding entries to the given manifests, removing entries still succeeds."""
+    handle = api.handle
+
+    def failing(method, system, entity, id, action, query, body):
+        if (method == 'PUT' and id in ids and body != []):
+            return (500, {'message': 'Injected error'})
+        return handle(method, system, entity, id, action, query, body)
+
+    api.handle = failing
+
+def test_chunk_entries():
+    assert notifier.chunk_entries([], 2) == []
+    assert [len(chunk) for chunk in notifier.chunk_entries(entries(5), 2)] == [2, 2, 1]
+    assert [len(chunk) for chunk in notifier.chunk_entries(entries(5), max_payload_bytes=100)] == [2, 2, 1]
+    assert sum(notifier.chunk_entries(entries(5), 3, 1), []) == entries(5)
+
+def test_add_entries_to_manifests_in_entry_order(api, source):
+    manifests = notifier.add_entries_to_manifests(entries(10), source, api.base_url, KEY, SECRET, max_files=3, max_workers=4)
+
+    assert [len(api.entries(manifest.id)) for manifest in manifests] == [3, 3, 3, 1]
+    assert sum((api.entries(manifest.id) for manifest in manifests), []) == entries(10)
+    assert all(manifest['state'] == 'NOTIFIED' for manifest in api.manifests())
+    # Manifests are notified in entry order.
+    assert sorted(api.manifests(), key=lambda manifest: manifest['modified']) == [api.manifests()[int(manifest.id) - 1] for manifest in manifests]
+
+def test_add_entries_to_manifests_uses_max_files_in_manifest(api, source):
+    source['attributes']['max_files_in_manifest'] = 4
+    manifests = notifier.add_entries_to_manifests(entries(10), source, api.base_url, KEY, SECRET, notify=False)
+
+    assert [len(api.entries(manifest.id)) for manifest in manifests] == [4, 4, 2]
+    assert all(manifest['state'] == 'OPEN' for manifest in api.manifests())
+
+def test_failed_chunk_removes_entries_of_all_manifests(api, source):
+    fail_filling(api, {'2'})
+
+    with pytest.raises(Exception):
+        notifier.add_entries_to_manifests(entries(10), source, api.base_url, KEY, SECRET, max_files=2, max_workers=2)
+
+    assert len(api.manifests()) == 5
+    assert all(manifest['state'] == 'OPEN' for manifest in api.manifests())
+    assert all(api.entries(manifest['id']) == [] for manifest in api.manifests())
+
+    # The emptied manifests are never notified.
+    assert notifier.notify_manifests(source, api.base_url, KEY, SECRET) == []
+    assert notifier.notify_sources([source], api.base_url, KEY, SECRET).results == []
+    assert all(manifest['state'] == 'OPEN' for manifest in api.manifests())
+
+    manifests = notifier.add_entries_to_manifests(entries(10), source, api.base_url, KEY, SECRET, max_files=5, notify=False)
+    assert [manifest.id for manifest in notifier.notify_manifests(source, api.base_url, KEY, SECRET)] == [manifest.id for manifest in manifests]
+    assert len(api.manifests(state='OPEN')) == 5
+
+def test_failed_chunk_releases_dedup_keys_for_retry(api, source):
+    dedup = DedupIndex()
+    fail_filling(api, {'1'})
+
+    with pytest.raises(Exception):
+        notifier.add_entries_to_manifests(entries(4), source, api.base_url, KEY, SECRET, max_files=2, dedup=dedup)
+
+    del api.handle
+    manifests = notifier.add_entries_to_manifests(entries(4) + entries(2), source, api.base_url, KEY, SECRET, max_files=2, dedup=dedup)
+
+    assert sum((api.entries(manifest.id) for manifest in manifests), []) == entries(4)
+
+    # Added entries are dropped as duplicates.
+    manifests = notifier.add_entries_to_manifests(entries(3, 2), source, api.base_url, KEY, SECRET, max_files=2, dedup=dedup)
+    assert [api.entries(manifest.id) for manifest in manifests] == [entries(1, 4)]
+
+def test_add_to_manifest_with_dedup(api, source):
+    dedup = DedupIndex()
+
+    notifier.add_to_manifest('azure://container/a.csv', source, api.base_url, KEY, SECRET, dedup=dedup)
+    notifier.add_to_manifest('azure://container/a.csv', source, api.base_url, KEY, SECRET, dedup=dedup)
+
+    assert api.request_counts['add_entry'] == 1
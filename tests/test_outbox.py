@@ -0,0 +1,109 @@
+import pytest
+from adenotifier.outbox import Outbox
+
+def source(entity: str):
+    return {'id': entity, 'attributes': {'ade_source_system': 'system', 'ade_source_entity': entity}, 'manifest_parameters': {'format': 'CSV'}}
+
+def file_urls(entity: str, count: int):
+    return ['azure://container/{0}/file_{1}.csv'.format(entity, i) for i in range(count)]
+
+def fail_filling(api, entities):
+    """Fails adding entries to the manifests of the given source entities until restored."""
+    handle = api.handle
+
+    def failing(method, system, entity, id, action, query, body):
+        if (method == 'PUT' and entity in entities):
+            return (500, {'message': 'Injected error'})
+        return handle(method, system, entity, id, action, query, body)
+
+    api.handle = failing
+    return lambda: setattr(api, 'handle', handle)
+
+@pytest.fixture
+def outbox(tmp_path):
+    with Outbox(str(tmp_path / 'outbox.db')) as outbox:
+        yield outbox
+
+def test_drain_in_batches(api, outbox):
+    outbox.put_many(file_urls('a', 5), 'a')
+    outbox.put(file_urls('b', 1)[0], 'b')
+    assert outbox.pending_count() == 6
+    assert outbox.pending_count('a') == 5
+
+    manifests = outbox.drain({'a': source('a'), 'b': source('b')}, api.base_url, 'key', 'secret', max_files=2)
+
+    assert [len(api.entries(manifest.id)) for manifest in manifests] == [2, 2, 1, 1]
+    assert [entry['sourceFile'] for manifest in manifests[:3] for entry in api.entries(manifest.id)] == file_urls('a', 5)
+    assert all(manifest['state'] == 'NOTIFIED' for manifest in api.manifests())
+    assert outbox.pending_count() == 0
+
+def test_unconfigured_source_is_kept(api, outbox):
+    outbox.put_many(file_urls('a', 2), 'a')
+
+    assert outbox.drain({}, api.base_url, 'key', 'secret') == []
+    assert outbox.pending_count('a') == 2
+
+def test_interrupted_batch_is_replayed_into_its_manifest(api, outbox):
+    outbox.put_many(file_urls('a', 3), 'a')
+    restore = fail_filling(api, {'a'})
+
+    assert outbox.drain({'a': source('a')}, api.base_url, 'key', 'secret') == []
+    assert outbox.pending_count('a') == 3
+    assert len(api.manifests()) == 1
+
+    restore()
+    manifests = outbox.drain({'a': source('a')}, api.base_url, 'key', 'secret')
+
+    assert [manifest.id for manifest in manifests] == [api.manifests()[0]['id']]
+    assert len(api.manifests()) == 1
+    assert [entry['sourceFile'] for entry in api.entries(manifests[0].id)] == file_urls('a', 3)
+    assert outbox.pending_count() == 0
+
+def test_notified_batch_is_completed_on_replay(api, outbox):
+    outbox.put_many(file_urls('a', 3), 'a')
+    notify = api.handle
+
+    def failing(method, system, entity, id, action, query, body):
+        response = notify(method, system, entity, id, action, query, body)
+        # The manifest is notified but the response is lost.
+        return (503, {}) if action == 'notify' else response
+
+    api.handle = failing
+    outbox.drain({'a': source('a')}, api.base_url, 'key', 'secret')
+    api.handle = notify
+
+    assert outbox.pending_count('a') == 3
+    assert outbox.drain({'a': source('a')}, api.base_url, 'key', 'secret')[0].state == 'NOTIFIED'
+    assert outbox.pending_count('a') == 0
+    assert len(api.manifests()) == 1
+
+def test_missing_manifest_of_interrupted_batch_is_replaced(api, outbox):
+    outbox.put_many(file_urls('a', 3), 'a')
+    restore = fail_filling(api, {'a'})
+    outbox.drain({'a': source('a')}, api.base_url, 'key', 'secret')
+    restore()
+    api.reset()
+
+    manifests = outbox.drain({'a': source('a')}, api.base_url, 'key', 'secret')
+
+    assert api.request_counts['fetch_manifest'] == 1
+    assert len(manifests) == 1 and len(api.manifests()) == 1
+    assert [entry['sourceFile'] for entry in api.entries(manifests[0].id)] == file_urls('a', 3)
+
+def test_failing_source_does_not_block_other_sources(api, outbox):
+    outbox.put_many(file_urls('a', 4), 'a')
+    outbox.put_many(file_urls('b', 4), 'b')
+    restore = fail_filling(api, {'a'})
+
+    manifests = outbox.drain({'a': source('a'), 'b': source('b')}, api.base_url, 'key', 'secret', max_files=2)
+
+    assert [manifest.source_entity_name for manifest in manifests] == ['b', 'b']
+    assert outbox.pending_count('a') == 4 and outbox.pending_count('b') == 0
+    # Later batches of a failing source wait for the failed one.
+    assert len(api.manifests(source_entity_name='a')) == 1
+
+    restore()
+    manifests = outbox.drain({'a': source('a'), 'b': source('b')}, api.base_url, 'key', 'secret', max_files=2)
+
+    assert [entry['sourceFile'] for manifest in manifests for entry in api.entries(manifest.id)] == file_urls('a', 4)
+    assert outbox.pending_count() == 0
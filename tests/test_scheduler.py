@@ -0,0 +1,53 @@
+import threading
+import time
+from adenotifier.manifest import Manifest
+from adenotifier.scheduler import NotifySchedule, NotifyScheduler
+from conftest import KEY, SECRET
+
+def test_entries_recorded_during_check_are_checked(api, source):
+    entered = threading.Event()
+    release = threading.Event()
+    handle = api.handle
+
+    def blocking(method, system, entity, id, action, query, body):
+        response = handle(method, system, entity, id, action, query, body)
+        if (method == 'GET' and id == None and not release.is_set()):
+            entered.set()
+            release.wait(10)
+        return response
+
+    scheduler = NotifyScheduler(api.base_url, KEY, SECRET, poll_interval=3600)
+    scheduler.add(source, NotifySchedule(max_entries=1))
+    scheduler.record_entries('test', 'earlier', 1)
+
+    api.handle = blocking
+    running = threading.Thread(target=scheduler.run_once)
+    running.start()
+    assert entered.wait(10)
+
+    # The source becomes due while its check is running.
+    manifest = Manifest(api.base_url, 'system', 'entity', 'CSV', KEY, SECRET)
+    manifest.add_entry('azure://container/a.csv')
+    scheduler.record_entries('test', manifest.id, 1)
+    assert scheduler.run_once() == []
+
+    release.set()
+    running.join()
+
+    results = scheduler.run_once()
+    assert [(result.manifest.id, result.status) for result in results] == [(manifest.id, 'NOTIFIED')]
+    assert api.request_counts['search_manifests'] == 2
+
+def test_empty_manifests_are_not_notified(api, source):
+    empty = Manifest(api.base_url, 'system', 'entity', 'CSV', KEY, SECRET)
+    empty.create()
+    manifest = Manifest(api.base_url, 'system', 'entity', 'CSV', KEY, SECRET)
+    manifest.add_entry('azure://container/a.csv')
+
+    scheduler = NotifyScheduler(api.base_url, KEY, SECRET, poll_interval=0.01)
+    scheduler.add(source, NotifySchedule(max_age=0))
+    time.sleep(0.02)
+
+    results = scheduler.run_once()
+    assert [(result.manifest.id, result.status) for result in results] == [(manifest.id, 'NOTIFIED')]
+    assert [manifest['id'] for manifest in api.manifests(state='OPEN')] == [empty.id]
@@ -0,0 +1,21 @@
+from adenotifier import session
+from adenotifier.ratelimit import RetryPolicy
+from adenotifier.session import DEFAULT_RETRY, configure_sessions, get_retry_policy
+
+def test_endpoint_policies_follow_configured_retry(monkeypatch):
+    monkeypatch.setitem(session._settings, 'endpoint_retries', {})
+    try:
+        configure_sessions(retry=RetryPolicy(total=5, status_forcelist=[404, 503]))
+
+        assert get_retry_policy('create').total == 5
+        assert get_retry_policy('create').status_forcelist == [404, 503]
+        assert get_retry_policy('fetch_manifest').total == 5
+        assert get_retry_policy('fetch_manifest').status_forcelist == [503]
+        assert get_retry_policy('fetch_manifest_entries').status_forcelist == [503]
+
+        # Explicit endpoint policies override the derived ones.
+        configure_sessions(endpoint_retries={'fetch_manifest': RetryPolicy(total=1, status_forcelist=[404])})
+        assert get_retry_policy('fetch_manifest').status_forcelist == [404]
+        assert get_retry_policy('fetch_manifest_entries').status_forcelist == [503]
+    finally:
+        configure_sessions(retry=DEFAULT_RETRY)
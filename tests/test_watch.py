@@ -0,0 +1,78 @@
+from adenotifier.manifest import Manifest
+from adenotifier.watch import ManifestWatcher
+from conftest import KEY, SECRET
+
+def create(api, entity: str = 'entity'):
+    manifest = Manifest(api.base_url, 'system', entity, 'CSV', KEY, SECRET)
+    manifest.create()
+    return manifest
+
+def transitions(events):
+    return sorted((event.id, event.previous_state, event.state) for event in events)
+
+def test_source_transitions(api):
+    existing = create(api)
+    watcher = ManifestWatcher(api.base_url, KEY, SECRET)
+    watcher.watch_source('system', 'entity')
+
+    # Manifests found on the first poll are not reported.
+    assert watcher.poll() == []
+
+    new = create(api)
+    api.set_state(existing.id, 'NOTIFIED')
+    assert transitions(watcher.poll()) == [(existing.id, 'OPEN', 'NOTIFIED'), (new.id, None, 'OPEN')]
+
+    # An unchanged search result is answered without a body and reports nothing.
+    assert watcher.poll() == []
+    assert api.request_counts['search_manifests'] == 3
+
+    api.set_state(existing.id, 'FAILED')
+    assert transitions(watcher.poll()) == [(existing.id, 'NOTIFIED', 'FAILED')]
+
+    watcher.unwatch_source('system', 'entity')
+    api.set_state(new.id, 'NOTIFIED')
+    assert watcher.poll() == []
+
+def test_manifest_leaving_filtered_state_is_fetched(api):
+    manifest = create(api)
+    watcher = ManifestWatcher(api.base_url, KEY, SECRET)
+    watcher.watch_source('system', 'entity', state='open')
+    assert watcher.poll() == []
+
+    api.set_state(manifest.id, 'NOTIFIED')
+
+    assert transitions(watcher.poll()) == [(manifest.id, 'OPEN', 'NOTIFIED')]
+    assert api.request_counts['fetch_manifest'] == 1
+    assert watcher.poll() == []
+
+def test_single_manifest_transitions(api):
+    manifest = create(api)
+    events = []
+    watcher = ManifestWatcher(api.base_url, KEY, SECRET, callback=events.append)
+    watcher.watch(manifest)
+
+    assert watcher.poll() == []
+    api.set_state(manifest.id, 'NOTIFIED')
+    assert transitions(watcher.poll()) == [(manifest.id, 'OPEN', 'NOTIFIED')]
+
+    # Manifests reaching a final state are not watched anymore.
+    api.set_state(manifest.id, 'ARCHIVED')
+    assert transitions(watcher.poll()) == [(manifest.id, 'NOTIFIED', 'ARCHIVED')]
+    api.set_state(manifest.id, 'FAILED')
+    assert watcher.poll() == []
+
+    assert transitions(events) == [(manifest.id, 'NOTIFIED', 'ARCHIVED'), (manifest.id, 'OPEN', 'NOTIFIED')]
+
+def test_failing_source_does_not_stop_polling(api):
+    manifest = create(api)
+    handle = api.handle
+    api.handle = lambda method, system, entity, *args: (500, {}) if entity == 'failing' else handle(method, system, entity, *args)
+    watcher = ManifestWatcher(api.base_url, KEY, SECRET)
+    watcher.watch_source('system', 'failing')
+    watcher.watch(manifest)
+    assert watcher.poll() == []
+
+    api.set_state(manifest.id, 'NOTIFIED')
+
+    assert transitions(watcher.poll()) == [(manifest.id, 'OPEN', 'NOTIFIED')]
+    assert api.request_counts['search_manifests'] == 2